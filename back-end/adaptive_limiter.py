@@ -0,0 +1,112 @@
+"""
+This module contains the adaptive limiter used to find how many requests the
+Yummly API can take at once instead of relying on a fixed pool size.
+"""
+
+import os
+import threading
+import time
+from concurrency_limit_error import ConcurrencyLimitError
+from deadline_exceeded_error import DeadlineExceededError
+
+""" --- Constants ---"""
+ADAPTIVE_CONCURRENCY = os.environ.get('YUMMLY_ADAPTIVE_CONCURRENCY', 'false').lower() == 'true'
+
+DEFAULT_MIN_LIMIT = 1
+
+DEFAULT_MAX_LIMIT = int(os.environ.get('YUMMLY_MAX_CONCURRENCY', 100))
+
+DEFAULT_BACKOFF_RATIO = 0.5
+
+DEFAULT_LATENCY_TOLERANCE = 2.0
+
+DEFAULT_MAX_WAIT = float(os.environ.get('YUMMLY_LIMITER_MAX_WAIT_SECONDS', 1))
+
+OVERLOAD_FAILURES = ['server error', 'connection error']
+
+SHORT_SMOOTHING = 0.2
+
+LONG_SMOOTHING = 0.02
+
+
+"""
+Additive increase, multiplicative decrease limit on the number of requests in
+flight. Each answered request adds 1/limit to the limit while at least half of
+it is in use and latency is stable, so it grows by up to one per round trip.
+Timeouts, connection errors, 5xx responses and short-term latency rising above
+latency_tolerance times the long-term latency, like in a gradient limiter,
+multiply it by backoff_ratio instead, at most once per round trip. Requests
+wait up to max_wait seconds, or until their deadline, for room under the limit
+before being shed with ConcurrencyLimitError
+"""
+class AdaptiveLimiter:
+	def __init__(self, initial_limit=10, min_limit=DEFAULT_MIN_LIMIT, max_limit=DEFAULT_MAX_LIMIT,
+				 backoff_ratio=DEFAULT_BACKOFF_RATIO, latency_tolerance=DEFAULT_LATENCY_TOLERANCE,
+				 max_wait=DEFAULT_MAX_WAIT, clock=time.monotonic):
+		self.limit = float(initial_limit)
+		self.min_limit = min_limit
+		self.max_limit = max_limit
+		self.backoff_ratio = backoff_ratio
+		self.latency_tolerance = latency_tolerance
+		self.max_wait = max_wait
+		self.clock = clock
+		self.in_flight = 0
+		self.short_latency = None
+		self.long_latency = None
+		self.counters = { 'admitted': 0, 'rejected': 0, 'increases': 0, 'decreases': 0 }
+		self._last_decrease_at = None
+		self._condition = threading.Condition()
+
+	def get_limit(self):
+		return max(int(self.limit), self.min_limit)
+
+	def acquire(self, deadline=None):
+		with self._condition:
+			wait_until = self.clock() + self.max_wait
+			while self.in_flight >= self.get_limit():
+				if deadline is not None and deadline.expired():
+					raise DeadlineExceededError(deadline.budget)
+				timeout = wait_until - self.clock()
+				if deadline is not None:
+					timeout = min(timeout, deadline.remaining())
+				if timeout <= 0:
+					self.counters['rejected'] += 1
+					raise ConcurrencyLimitError(self.get_limit())
+				self._condition.wait(timeout)
+			self.in_flight += 1
+			self.counters['admitted'] += 1
+
+	def _record_latency(self, latency):
+		if self.short_latency is None:
+			self.short_latency = self.long_latency = latency
+			return
+		self.short_latency += SHORT_SMOOTHING * (latency - self.short_latency)
+		self.long_latency += LONG_SMOOTHING * (latency - self.long_latency)
+
+	def _decrease(self):
+		now = self.clock()
+		if self._last_decrease_at is not None and now - self._last_decrease_at < self.short_latency:
+			return
+		self._last_decrease_at = now
+		self.limit = max(self.limit * self.backoff_ratio, self.min_limit)
+		self.counters['decreases'] += 1
+
+	def release(self, latency=None, failure=None):
+		with self._condition:
+			in_use = self.in_flight * 2 >= self.get_limit()
+			self.in_flight -= 1
+			if latency is not None:
+				self._record_latency(latency)
+				if failure in OVERLOAD_FAILURES:
+					self._decrease()
+				elif self.short_latency > self.long_latency * self.latency_tolerance:
+					self._decrease()
+				elif failure is None and in_use and self.limit < self.max_limit:
+					self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+					self.counters['increases'] += 1
+			self._condition.notify_all()
+
+	def get_stats(self):
+		with self._condition:
+			return dict(self.counters, limit=self.get_limit(), in_flight=self.in_flight,
+						latency=self.short_latency, baseline_latency=self.long_latency)
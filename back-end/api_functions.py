@@ -2,20 +2,22 @@
 This module contains the functionality needed to query the Yummly API.
 """
 
-import requests
-import os
 import logging
+import os
 import re
-from collections import OrderedDict
+import threading
+import time
+from itertools import islice, combinations
+from concurrent.futures import ThreadPoolExecutor
 from request_error import RequestError
+from deadline_exceeded_error import DeadlineExceededError
+from quota_exhausted_error import QuotaExhaustedError
 from no_match_error import NoMatchError
+from yummly_client import get_default_client
+from shadow_traffic import get_default_shadow, get_outcome
+from recipe_providers import get_default_providers
 
 """ --- Constants ---"""
-HEADERS  = OrderedDict({
-	'X-Yummly-App-ID': os.environ.get("AWS_YUMMLY_APP_ID"),
-	'X-Yummly-App-Key': os.environ.get('AWS_YUMMLY_APP_KEY'),
-	'Connection': 'close',
-})
 
 OPTIONAL_PARAMETERS = ['allergy', 'time', 'excluded_ingredient']
 
@@ -25,9 +27,17 @@ YUMMLY_PARAM_MAPPING = {
 	'excluded_ingredient': 'excludedIngredient[]',
 }
 
-BASE_API_SEARCH_URL = 'http://api.yummly.com/v1/api/recipes'
+DEFAULT_TOP_N = int(os.environ.get('YUMMLY_TOP_N', 1))
+
+DEFAULT_PREFETCH_WORKERS = int(os.environ.get('YUMMLY_PREFETCH_WORKERS', 8))
+
+DEFAULT_FIRST_PAGE_SIZE = int(os.environ.get('YUMMLY_FIRST_PAGE_SIZE', 1))
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('YUMMLY_PAGE_SIZE', 10))
 
-BASE_API_GET_URL = 'http://api.yummly.com/v1/api/recipe/'
+MAX_RELAXED_VARIANTS = int(os.environ.get('YUMMLY_MAX_RELAXED_VARIANTS', 8))
+
+RELAXABLE_PARAMETERS = ['time', 'excluded_ingredient']
 
 LOG_MESSAGE_MAPPING = {
 	'retrieve url': 'Retrieving url for recipe',
@@ -37,6 +47,12 @@ LOG_MESSAGE_MAPPING = {
 	'parsed recipe result': 'Successfuly retreived recipe',
 }
 
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
+_relaxation_executor = None
+_relaxation_executor_lock = threading.Lock()
+
 
 """
 Method to add optional parameters to payload of parameters for search
@@ -58,12 +74,26 @@ def create_payload(search_term, **options):
 	return payload
 
 """
-Method to query Yummly API for recipe based on received parameters
+Method to add the parameters asking for one page of matches to a payload
 """
-def get_search_results(search_term, **options):
+def add_page_parameters(payload, max_result, start=0):
+	payload['maxResult'] = max_result
+	payload['start'] = start
+	return payload
+
+"""
+Method to query Yummly API for recipe based on received parameters; uses the
+shared pooled client unless one is given. Given max_result, only that many
+matches are asked for, starting with the match at index start
+"""
+def get_search_results(search_term, client=None, deadline=None, user_id=None,
+					   priority='interactive', max_result=None, start=0, **options):
 	log_api_event('query', search_term, **options)
 	payload = create_payload(search_term, **options)
-	r = requests.get(BASE_API_SEARCH_URL, headers=HEADERS, params=payload)
+	if max_result is not None:
+		payload = add_page_parameters(payload, max_result, start)
+	client = client or get_default_client()
+	r = client.search(payload, deadline=deadline, user_id=user_id, priority=priority)
 	return r
 
 
@@ -71,36 +101,129 @@ def get_search_results(search_term, **options):
 Method to parse response from Yummly API: if the response has a non 200
 status code, log and return the error; if the response has a 200 status code 
 and the keyword is 'search', log and return the id of the first matching
-recipe; if the response has a 200 status code and the keyword is 'recipe', log
-and return the response body
+recipe; if the keyword is 'search candidates', log and return the ids of the
+first count matching recipes; if the response has a 200 status code and the
+keyword is 'recipe', log and return the response body. The body can be passed
+as json_response if the caller already decoded it
 """
-def parse_response(keyword, response):
+def parse_response(keyword, response, count=1, json_response=None):
 	if response.status_code == 200:
-		if keyword == 'search':
-			json_response = response.json()
+		if keyword in ('search', 'search candidates'):
+			if json_response is None:
+				json_response = response.json()
 			if not json_response['matches']:
-				search_term = json_response['criteria']['q']
-				del json_response['criteria']['q']
-				raise NoMatchError(search_term, **json_response['criteria'])
-			else:
+				criteria = dict(json_response['criteria'])
+				search_term = criteria.pop('q')
+				raise NoMatchError(search_term, **criteria)
+			elif keyword == 'search':
 				recipe_id = json_response['matches'][0]['id']
 				log_api_event('parsed search result', recipe_id)
-			return recipe_id
+				return recipe_id
+			else:
+				recipe_ids = [match['id'] for match in json_response['matches'][:count]]
+				log_api_event('parsed search candidates', recipe_ids)
+				return recipe_ids
 		elif keyword == 'recipe':
 			log_api_event('parsed recipe result')
-			return response.json()
+			return json_response if json_response is not None else response.json()
 	else:
 		raise RequestError(response.status_code)
 
+"""
+Generator of the ids of the recipes matching a search, best match first. The
+first page asks for first_page_size matches and later pages for page_size
+matches, and each page is only requested once the caller has iterated past the
+previous one. Raises NoMatchError if nothing matches at all
+"""
+def iter_search_matches(search_term, client=None, page_size=DEFAULT_PAGE_SIZE,
+						first_page_size=DEFAULT_FIRST_PAGE_SIZE, deadline=None, user_id=None,
+						priority='interactive', **options):
+	client = client or get_default_client()
+	start = 0
+	max_result = first_page_size
+	while True:
+		search_response = get_search_results(search_term, client=client, deadline=deadline,
+											 user_id=user_id, priority=priority,
+											 max_result=max_result, start=start, **options)
+		search_results = search_response.json() if search_response.status_code == 200 else None
+		if start > 0 and search_results is not None and not search_results['matches']:
+			return
+		recipe_ids = parse_and_log_response('search candidates', search_response, max_result,
+											json_response=search_results)
+		for recipe_id in recipe_ids:
+			yield recipe_id
+		start += len(recipe_ids)
+		total_match_count = search_results.get('totalMatchCount')
+		if len(recipe_ids) < max_result or (total_match_count is not None
+											and start >= total_match_count):
+			return
+		max_result = page_size
+
 """
 Method to get recipe based on recipe id
 """
-def get_recipe(recipe_id):
+def get_recipe(recipe_id, client=None, deadline=None, user_id=None, priority='interactive'):
 	log_api_event('get recipe', recipe_id)
-	recipe_base_url = BASE_API_GET_URL + recipe_id
-	r = requests.get(recipe_base_url, headers=HEADERS)
+	client = client or get_default_client()
+	r = client.get_recipe(recipe_id, deadline=deadline, user_id=user_id, priority=priority)
 	return r
 
+"""
+Method to check that a recipe has everything get_recipe_details needs
+"""
+def is_usable_recipe(recipe_response):
+	source = recipe_response.get('source') or {}
+	return bool(recipe_response.get('name')
+				and recipe_response.get('numberOfServings')
+				and recipe_response.get('ingredientLines')
+				and source.get('sourceRecipeUrl'))
+
+"""
+Method to get the thread pool used to fetch candidate recipes concurrently,
+creating it on first use so that it survives between warm Lambda invocations
+"""
+def get_prefetch_executor():
+	global _prefetch_executor
+	if _prefetch_executor is None:
+		with _prefetch_executor_lock:
+			if _prefetch_executor is None:
+				_prefetch_executor = ThreadPoolExecutor(max_workers=DEFAULT_PREFETCH_WORKERS)
+	return _prefetch_executor
+
+"""
+Method to fetch candidate recipes concurrently and return the best ranked one
+that is usable; fetches that have not started once it is found are cancelled
+and the results of those already running are ignored. Returns None if every
+candidate was fetched but none was usable, and raises the first RequestError
+if no candidate was usable and at least one fetch failed. Interactive
+fetches of candidates after the first are sent as speculative
+"""
+def get_first_usable_recipe(recipe_ids, client=None, deadline=None, user_id=None,
+							priority='interactive'):
+	client = client or get_default_client()
+	executor = get_prefetch_executor()
+	fallback_priority = 'speculative' if priority == 'interactive' else priority
+	futures = [executor.submit(get_recipe, recipe_id, client, deadline, user_id,
+							   priority if rank == 0 else fallback_priority)
+			   for rank, recipe_id in enumerate(recipe_ids)]
+	first_request_err = None
+	try:
+		for recipe_id, future in zip(recipe_ids, futures):
+			try:
+				recipe = parse_and_log_response('recipe', future.result())
+			except RequestError as request_err:
+				first_request_err = first_request_err or request_err
+				continue
+			if is_usable_recipe(recipe):
+				return recipe
+			log_api_event('unusable recipe', recipe_id)
+	finally:
+		for future in futures:
+			future.cancel()
+	if first_request_err is not None:
+		raise first_request_err
+	return None
+
 """
 Method to get name of a recipe
 """
@@ -146,28 +269,212 @@ def get_recipe_details(recipe_response, desired_servings):
 	details['recipe_url'] = get_recipe_url(recipe_response)
 	return details
 
+"""
+Method to get the part of a recipe get_recipe_details needs, so that its
+details can be worked out again for other servings without fetching it
+"""
+def get_scaling_basis(recipe_response):
+	return { 'name': recipe_response['name'],
+			 'numberOfServings': recipe_response['numberOfServings'],
+			 'ingredientLines': recipe_response['ingredientLines'],
+			 'source': { 'sourceRecipeUrl': recipe_response['source']['sourceRecipeUrl'] } }
+
 
 """
-Wrapper method to search API and get recipe details based on provided info
+Wrapper method to search API and get recipe details based on provided info.
+Unless a client is given, the request goes to the recipe providers, if any,
+instead of the shared client. A sample of requests is mirrored to the shadow
+backend, if any, once answered. The other options are fetch_recipe_info's
 """
-def get_recipe_info(search_term, desired_servings, **search_options):
-	search_response = get_search_results(search_term, **search_options)
+def get_recipe_info(search_term, desired_servings, client=None, top_n=DEFAULT_TOP_N,
+					deadline=None, user_id=None, priority='interactive', shadow=None,
+					providers=None, with_scaling_basis=False, **search_options):
+	providers = providers or get_default_providers()
+	lookup = lambda lookup_client: fetch_recipe_info(search_term, desired_servings,
+													 client=lookup_client, top_n=top_n,
+													 deadline=deadline, user_id=user_id,
+													 priority=priority,
+													 with_scaling_basis=with_scaling_basis,
+													 **search_options)
+	if client is None and providers is not None:
+		send_request = lambda: providers.send(lookup)
+	else:
+		send_request = lambda: lookup(client)
+	shadow = shadow or get_default_shadow()
+	if shadow is None:
+		return send_request()
+	started_at = time.monotonic()
+	details, error = None, None
 	try:
-		matching_recipe_id = parse_response('search', search_response)
-	except RequestError as request_err:
-		log_api_error(request_err.message())
-		raise 
-	except NoMatchError as match_err:
-		log_api_error(match_err.message())
+		details = send_request()
+		return details
+	except Exception as err:
+		error = err
 		raise
-	recipe_response = get_recipe(matching_recipe_id)
+	finally:
+		shadow_request = lambda secondary_client: fetch_recipe_info(search_term, desired_servings,
+																	client=secondary_client,
+																	top_n=top_n, priority='background',
+																	**search_options)
+		shadow.observe(search_term, shadow_request,
+					   get_outcome(time.monotonic() - started_at, details, error))
+
+"""
+Method to search the API and get the details of the best matching recipe for
+get_recipe_info, without mirroring the request to a shadow backend. The best
+top_n matches are fetched concurrently and the first usable one is kept.
+Requests are bounded by the deadline, count against the quota of user_id and
+are scheduled with priority. With with_scaling_basis, the details include
+what get_recipe_details needs to rescale them for other servings
+"""
+def fetch_recipe_info(search_term, desired_servings, client=None, top_n=DEFAULT_TOP_N,
+					  deadline=None, user_id=None, priority='interactive', with_scaling_basis=False,
+					  **search_options):
+	client = client or get_default_client()
+	matching_recipe_ids = iter_search_matches(search_term, client=client,
+											  first_page_size=max(top_n, DEFAULT_FIRST_PAGE_SIZE),
+											  deadline=deadline, user_id=user_id,
+											  priority=priority, **search_options)
+	if top_n > 1:
+		candidate_ids = list(islice(matching_recipe_ids, top_n))
+		matching_recipe = get_first_usable_recipe(candidate_ids, client=client, deadline=deadline,
+												  user_id=user_id, priority=priority)
+		if matching_recipe is None:
+			match_err = NoMatchError(search_term, **search_options)
+			log_api_error(match_err.message())
+			raise match_err
+	else:
+		matching_recipe_id = next(matching_recipe_ids)
+		recipe_response = get_recipe(matching_recipe_id, client=client, deadline=deadline,
+									 user_id=user_id, priority=priority)
+		matching_recipe = parse_and_log_response('recipe', recipe_response)
+	matching_recipe_details = get_recipe_details(matching_recipe, desired_servings)
+	if with_scaling_basis:
+		matching_recipe_details['scaling_basis'] = get_scaling_basis(matching_recipe)
+	return matching_recipe_details
+
+"""
+Method to get the thread pool used to search relaxed variants of a request
+concurrently, kept apart from the prefetch pool the variants themselves use
+"""
+def get_relaxation_executor():
+	global _relaxation_executor
+	if _relaxation_executor is None:
+		with _relaxation_executor_lock:
+			if _relaxation_executor is None:
+				_relaxation_executor = ThreadPoolExecutor(max_workers=MAX_RELAXED_VARIANTS)
+	return _relaxation_executor
+
+"""
+Method to get the constraints of a request that may be loosened, as (option,
+value) pairs in the order they are given up in: the options in
+RELAXABLE_PARAMETERS in turn, the time limit first and then each excluded
+ingredient. Allergies are never loosened
+"""
+def get_relaxable_constraints(search_options):
+	constraints = []
+	for option in RELAXABLE_PARAMETERS:
+		values = search_options.get(option) or []
+		if not isinstance(values, (list, tuple)):
+			values = [values]
+		constraints.extend((option, value) for value in values)
+	return constraints
+
+"""
+Method to remove loosened constraints from the options of a request
+"""
+def relax_options(search_options, loosened):
+	options = dict(search_options)
+	if any(option == 'time' for option, value in loosened):
+		options.pop('time')
+	loosened_ingredients = [value for option, value in loosened if option == 'excluded_ingredient']
+	if loosened_ingredients:
+		excluded_ingredients = [ingredient for option, ingredient
+								in get_relaxable_constraints(search_options)
+								if option == 'excluded_ingredient'
+								and ingredient not in loosened_ingredients]
+		if excluded_ingredients:
+			options['excluded_ingredient'] = excluded_ingredients
+		else:
+			options.pop('excluded_ingredient')
+	return options
+
+"""
+Method to get the relaxed variants of a request, least relaxed first: each is
+the list of constraints it loosens and the options left. At most max_variants
+are returned
+"""
+def get_relaxed_variants(search_options, max_variants=MAX_RELAXED_VARIANTS):
+	constraints = get_relaxable_constraints(search_options)
+	variants = []
+	for loosened_count in range(1, len(constraints) + 1):
+		for loosened in combinations(constraints, loosened_count):
+			if len(variants) == max_variants:
+				return variants
+			variants.append((list(loosened), relax_options(search_options, loosened)))
+	return variants
+
+"""
+Wrapper method like get_recipe_info that, if nothing matches the request,
+searches relaxed variants of it concurrently and returns the details of the
+least relaxed one that matches. The details list the (option, value)
+constraints that were loosened under 'relaxed_constraints', empty if none
+were. Variants whose requests fail, e.g. when a speculative one is shed or
+gets a 500, are skipped like those that match nothing, unless the deadline
+passed or the quota ran out. Raises the original NoMatchError if no variant
+matches either
+"""
+def get_relaxed_recipe_info(search_term, desired_servings, client=None, top_n=DEFAULT_TOP_N,
+							deadline=None, user_id=None, priority='interactive',
+							with_scaling_basis=False, **search_options):
+	try:
+		details = get_recipe_info(search_term, desired_servings, client=client, top_n=top_n,
+								  deadline=deadline, user_id=user_id, priority=priority,
+								  with_scaling_basis=with_scaling_basis, **search_options)
+		details['relaxed_constraints'] = []
+		return details
+	except NoMatchError as match_err:
+		original_match_err = match_err
+	variants = get_relaxed_variants(search_options)
+	executor = get_relaxation_executor()
+	fallback_priority = 'speculative' if priority == 'interactive' else priority
+	futures = [executor.submit(get_recipe_info, search_term, desired_servings, client=client,
+							   top_n=top_n, deadline=deadline, user_id=user_id,
+							   priority=priority if rank == 0 else fallback_priority,
+							   with_scaling_basis=with_scaling_basis, **options)
+			   for rank, (loosened, options) in enumerate(variants)]
 	try:
-		matching_recipe = parse_response('recipe', recipe_response)
+		for (loosened, options), future in zip(variants, futures):
+			try:
+				details = future.result()
+			except (DeadlineExceededError, QuotaExhaustedError):
+				raise
+			except NoMatchError:
+				continue
+			except RequestError as request_err:
+				log_api_error(request_err.message())
+				continue
+			log_api_event('relaxed search', search_term, loosened)
+			details['relaxed_constraints'] = loosened
+			return details
+	finally:
+		for future in futures:
+			future.cancel()
+	raise original_match_err
+
+"""
+Method to parse a response from the Yummly API, logging any error before
+re-raising it
+"""
+def parse_and_log_response(keyword, response, count=1, json_response=None):
+	try:
+		return parse_response(keyword, response, count, json_response)
 	except RequestError as request_err:
 		log_api_error(request_err.message())
 		raise
-	matching_recipe_details = get_recipe_details(matching_recipe, desired_servings)
-	return matching_recipe_details
+	except NoMatchError as match_err:
+		log_api_error(match_err.message())
+		raise
 
 """
 Method to log events related to API functionality
@@ -181,8 +488,14 @@ def log_api_event(keyword, *term, **criteria):
 			log_message = base_log_message
 	elif keyword == 'parsed search result':
 		log_message = 'Found matching recipe with id ' + term[0]
+	elif keyword == 'parsed search candidates':
+		log_message = 'Found matching recipes with ids ' + ', '.join(term[0])
 	elif keyword == 'get recipe':
 		log_message = 'Getting recipe with id ' + term[0]
+	elif keyword == 'unusable recipe':
+		log_message = 'Skipping incomplete recipe with id ' + term[0]
+	elif keyword == 'relaxed search':
+		log_message = 'Found ' + term[0] + ' recipes after loosening ' + str(term[1])
 	else:
 		log_message = LOG_MESSAGE_MAPPING[keyword]
 	logging.debug(log_message)
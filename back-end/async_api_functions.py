@@ -0,0 +1,95 @@
+"""
+This module contains the asyncio versions of the functions in api_functions
+used to query the Yummly API. Parsing, scaling and error reporting are shared
+with the blocking functions, but the requests go through AsyncYummlyClient, a
+bare transport. They get none of the blocking client's retries, circuit
+breakers, quota, scheduling or caches, nor the relaxed search or recipe
+providers of get_recipe_info.
+"""
+
+import asyncio
+from api_functions import create_payload, add_page_parameters, get_recipe_details, is_usable_recipe
+from api_functions import parse_and_log_response, log_api_event, log_api_error
+from api_functions import DEFAULT_TOP_N, DEFAULT_FIRST_PAGE_SIZE
+from request_error import RequestError
+from no_match_error import NoMatchError
+from async_yummly_client import get_default_async_client
+
+
+"""
+Method to query Yummly API for recipe based on received parameters without
+blocking the event loop
+"""
+async def get_search_results_async(search_term, client=None, deadline=None, max_result=None,
+								   start=0, **options):
+	log_api_event('query', search_term, **options)
+	payload = create_payload(search_term, **options)
+	if max_result is not None:
+		payload = add_page_parameters(payload, max_result, start)
+	client = client or get_default_async_client()
+	return await client.search(payload, deadline=deadline)
+
+"""
+Method to get recipe based on recipe id without blocking the event loop
+"""
+async def get_recipe_async(recipe_id, client=None, deadline=None):
+	log_api_event('get recipe', recipe_id)
+	client = client or get_default_async_client()
+	return await client.get_recipe(recipe_id, deadline=deadline)
+
+"""
+Asyncio version of get_first_usable_recipe: candidate fetches run as tasks and
+those still pending once a usable recipe is found are cancelled
+"""
+async def get_first_usable_recipe_async(recipe_ids, client=None, deadline=None):
+	client = client or get_default_async_client()
+	tasks = [asyncio.ensure_future(get_recipe_async(recipe_id, client=client, deadline=deadline))
+			 for recipe_id in recipe_ids]
+	first_request_err = None
+	try:
+		for recipe_id, task in zip(recipe_ids, tasks):
+			try:
+				recipe = parse_and_log_response('recipe', await task)
+			except RequestError as request_err:
+				first_request_err = first_request_err or request_err
+				continue
+			if is_usable_recipe(recipe):
+				return recipe
+			log_api_event('unusable recipe', recipe_id)
+	finally:
+		for task in tasks:
+			if task.done():
+				if not task.cancelled():
+					task.exception()
+			else:
+				task.cancel()
+	if first_request_err is not None:
+		raise first_request_err
+	return None
+
+"""
+Asyncio version of get_recipe_info: raises the same RequestError and
+NoMatchError and returns the same details as the blocking wrapper
+"""
+async def get_recipe_info_async(search_term, desired_servings, client=None,
+								top_n=DEFAULT_TOP_N, deadline=None, **search_options):
+	client = client or get_default_async_client()
+	search_response = await get_search_results_async(search_term, client=client,
+													 deadline=deadline,
+													 max_result=max(top_n, DEFAULT_FIRST_PAGE_SIZE),
+													 **search_options)
+	if top_n > 1:
+		candidate_ids = parse_and_log_response('search candidates', search_response, top_n)
+		matching_recipe = await get_first_usable_recipe_async(candidate_ids, client=client,
+																	 deadline=deadline)
+		if matching_recipe is None:
+			match_err = NoMatchError(search_term, **search_options)
+			log_api_error(match_err.message())
+			raise match_err
+	else:
+		matching_recipe_id = parse_and_log_response('search', search_response)
+		recipe_response = await get_recipe_async(matching_recipe_id, client=client,
+												 deadline=deadline)
+		matching_recipe = parse_and_log_response('recipe', recipe_response)
+	matching_recipe_details = get_recipe_details(matching_recipe, desired_servings)
+	return matching_recipe_details
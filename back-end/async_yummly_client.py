@@ -0,0 +1,130 @@
+"""
+This module contains the asyncio client used to send requests to the Yummly API,
+so that many conversations can share one event loop instead of one thread each.
+It is a bare transport: unlike YummlyClient it has no retries, circuit
+breakers, quota, scheduler, limiter or caches.
+"""
+
+import asyncio
+import json
+import os
+import aiohttp
+from yummly_client import HEADERS, BASE_API_SEARCH_URL, BASE_API_GET_URL
+from yummly_client import DEFAULT_TIMEOUT, YummlyResponse
+from deadline_exceeded_error import DeadlineExceededError
+from query_key import get_payload_key
+from single_flight import AsyncSingleFlight
+
+""" --- Constants ---"""
+DEFAULT_ASYNC_POOL_SIZE = int(os.environ.get('YUMMLY_ASYNC_POOL_SIZE', 100))
+
+_default_async_client = None
+
+
+"""
+Asyncio client for the Yummly API: owns one aiohttp session whose connector
+keeps up to pool_size connections to Yummly open. The session is bound to the
+event loop it was created on. If the client is used from another loop, it is
+recreated and the previous one closed. Responses are read in full and
+returned as YummlyResponse objects for the blocking client's parse_response.
+Requests time out like the blocking client's, bounded by any deadline given,
+and identical requests in flight at the same time are coalesced into one
+"""
+class AsyncYummlyClient:
+	def __init__(self, pool_size=DEFAULT_ASYNC_POOL_SIZE, headers=HEADERS,
+				 search_url=BASE_API_SEARCH_URL, get_url=BASE_API_GET_URL,
+				 timeout=DEFAULT_TIMEOUT, coalesce=True):
+		self.pool_size = pool_size
+		self.timeout = timeout
+		self.flights = AsyncSingleFlight() if coalesce else None
+		self.headers = { name: value for name, value in headers.items() if value is not None }
+		self.search_url = search_url
+		self.get_url = get_url
+		self._session = None
+		self._loop = None
+
+	async def _get_session(self):
+		loop = asyncio.get_running_loop()
+		if self._session is None or self._session.closed or self._loop is not loop:
+			stale_session, stale_loop = self._session, self._loop
+			connector = aiohttp.TCPConnector(limit=self.pool_size)
+			self._session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+			self._loop = loop
+			if stale_session is not None and not stale_session.closed:
+				await self._close_stale_session(stale_session, stale_loop)
+		return self._session
+
+	async def _close_stale_session(self, session, loop):
+		if loop is not None and loop.is_running():
+			asyncio.run_coroutine_threadsafe(session.close(), loop)
+		else:
+			await session.close()
+
+	async def _get(self, url, params=None, deadline=None):
+		timeout = deadline.get_timeout(self.timeout) if deadline else self.timeout
+		request_timeout = aiohttp.ClientTimeout(total=timeout)
+		session = await self._get_session()
+		async with session.get(url, params=params, timeout=request_timeout) as response:
+			body = await response.read()
+			json_data = json.loads(body) if response.status == 200 else None
+			return YummlyResponse(response.status, json_data)
+
+	async def _get_coalesced(self, key, make_coroutine, deadline=None):
+		if self.flights is None:
+			return await make_coroutine()
+		try:
+			return await self.flights.do(key, make_coroutine,
+										 deadline.remaining() if deadline else None)
+		except asyncio.TimeoutError:
+			if deadline is None or not deadline.expired():
+				raise
+			raise DeadlineExceededError(deadline.budget)
+
+	async def search(self, payload, deadline=None):
+		return await self._get_coalesced(
+			('search', get_payload_key(payload)),
+			lambda: self._get(self.search_url, params=to_query_params(payload), deadline=deadline),
+			deadline)
+
+	async def get_recipe(self, recipe_id, deadline=None):
+		return await self._get_coalesced(
+			('recipe', recipe_id),
+			lambda: self._get(self.get_url + recipe_id, deadline=deadline),
+			deadline)
+
+	async def close(self):
+		if self._session is not None:
+			await self._session.close()
+			self._session = None
+
+
+"""
+Method to flatten a search payload into the list of query parameters aiohttp
+expects: list values become one parameter per item, as requests sends them
+"""
+def to_query_params(payload):
+	params = []
+	for name, value in payload.items():
+		if isinstance(value, (list, tuple)):
+			params.extend((name, str(item)) for item in value)
+		else:
+			params.append((name, str(value)))
+	return params
+
+"""
+Method to get the asyncio client shared by every coroutine in this process
+"""
+def get_default_async_client():
+	global _default_async_client
+	if _default_async_client is None:
+		_default_async_client = AsyncYummlyClient()
+	return _default_async_client
+
+"""
+Method to replace the shared asyncio client
+"""
+def set_default_async_client(client):
+	global _default_async_client
+	previous_client = _default_async_client
+	_default_async_client = client
+	return previous_client
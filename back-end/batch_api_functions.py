@@ -0,0 +1,148 @@
+"""
+This module contains the functionality needed to resolve many recipe requests
+against the Yummly API in one batch.
+"""
+
+import os
+import threading
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from api_functions import get_recipe_info
+from circuit_open_error import CircuitOpenError
+from concurrency_limit_error import ConcurrencyLimitError
+from deadline_exceeded_error import DeadlineExceededError
+from quota_exhausted_error import QuotaExhaustedError
+from query_key import get_payload_key
+from request_error import RequestError
+from request_rejected_error import RequestRejectedError
+from no_match_error import NoMatchError
+from yummly_client import get_default_client
+
+""" --- Constants ---"""
+DEFAULT_BATCH_WORKERS = int(os.environ.get('YUMMLY_BATCH_WORKERS', 8))
+
+BATCH_MEMO_SIZE = int(os.environ.get('YUMMLY_BATCH_MEMO_SIZE', 1024))
+
+TRANSIENT_ERRORS = (CircuitOpenError, ConcurrencyLimitError, DeadlineExceededError,
+					QuotaExhaustedError, RequestRejectedError, requests.RequestException)
+
+"""
+Outcome of one request in a batch: details is set when the recipe was found,
+error holds the RequestError or NoMatchError otherwise
+"""
+BatchResult = namedtuple('BatchResult', ['index', 'search_term', 'desired_servings',
+										 'options', 'details', 'error'])
+
+
+"""
+Client used for the duration of one batch: identical searches and fetches of
+the same recipe id are sent once and every request in the batch that needs
+them waits on that one response. Only the max_responses most recently used
+responses are kept, and error responses and requests failing with one of
+TRANSIENT_ERRORS are only shared by the requests already waiting on them
+"""
+class BatchClient:
+	def __init__(self, client, max_responses=BATCH_MEMO_SIZE):
+		self.client = client
+		self.max_responses = max_responses
+		self.sent_counts = { 'search': 0, 'recipe': 0 }
+		self._responses = OrderedDict()
+		self._lock = threading.Lock()
+
+	def _get_once(self, kind, key, send_request):
+		with self._lock:
+			future = self._responses.get((kind, key))
+			is_owner = future is None
+			if is_owner:
+				future = self._responses[(kind, key)] = Future()
+				self.sent_counts[kind] += 1
+				while len(self._responses) > self.max_responses:
+					self._responses.popitem(last=False)
+			else:
+				self._responses.move_to_end((kind, key))
+		if is_owner:
+			try:
+				response = send_request()
+			except TRANSIENT_ERRORS as err:
+				self._forget(kind, key, future)
+				future.set_exception(err)
+			except Exception as err:
+				future.set_exception(err)
+			else:
+				if response.status_code != 200:
+					self._forget(kind, key, future)
+				future.set_result(response)
+		return future.result()
+
+	def _forget(self, kind, key, future):
+		with self._lock:
+			if self._responses.get((kind, key)) is future:
+				del self._responses[(kind, key)]
+
+	def search(self, payload, **request_options):
+		return self._get_once('search', get_payload_key(payload),
+							  lambda: self.client.search(payload, **request_options))
+
+	def get_recipe(self, recipe_id, **request_options):
+		return self._get_once('recipe', recipe_id,
+							  lambda: self.client.get_recipe(recipe_id, **request_options))
+
+
+"""
+Method to resolve one request of a batch, reporting lookup errors in the
+result instead of raising them; batch requests are scheduled as background
+work so they give way to conversations
+"""
+def resolve_batch_request(index, recipe_request, client, priority='background'):
+	search_term, desired_servings = recipe_request[0], recipe_request[1]
+	options = recipe_request[2] if len(recipe_request) > 2 else {}
+	try:
+		details = get_recipe_info(search_term, desired_servings, client=client,
+								  priority=priority, **options)
+		return BatchResult(index, search_term, desired_servings, options, details, None)
+	except (RequestError, NoMatchError) as lookup_err:
+		return BatchResult(index, search_term, desired_servings, options, None, lookup_err)
+
+"""
+Method to resolve an iterable of (search_term, desired_servings[, options])
+requests with at most max_workers running at once. Results are yielded as
+BatchResult objects in input order, or as soon as each one completes when
+ordered is False. Requests are read from the iterable only as workers free
+up, so arbitrarily long inputs can be streamed through
+"""
+def get_recipe_info_many(recipe_requests, max_workers=DEFAULT_BATCH_WORKERS,
+						 ordered=True, client=None):
+	batch_client = BatchClient(client or get_default_client())
+	numbered_requests = enumerate(recipe_requests)
+	window = max_workers * 2
+	with ThreadPoolExecutor(max_workers=max_workers) as executor:
+		def submit_next():
+			for index, recipe_request in numbered_requests:
+				return executor.submit(resolve_batch_request, index, recipe_request, batch_client)
+			return None
+
+		if ordered:
+			pending = deque()
+			while True:
+				while len(pending) < window:
+					future = submit_next()
+					if future is None:
+						break
+					pending.append(future)
+				if not pending:
+					return
+				yield pending.popleft().result()
+		else:
+			pending = set()
+			while True:
+				while len(pending) < window:
+					future = submit_next()
+					if future is None:
+						break
+					pending.add(future)
+				if not pending:
+					return
+				done, pending = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					yield future.result()
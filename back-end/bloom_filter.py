@@ -0,0 +1,102 @@
+"""
+This module contains the negative cache used to remember searches Yummly had
+no match for, so that users retrying them do not cost a request every time.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+
+""" --- Constants ---"""
+NEGATIVE_CACHE_CAPACITY = int(os.environ.get('YUMMLY_NEGATIVE_CACHE_CAPACITY', 10000))
+
+NEGATIVE_CACHE_ERROR_RATE = float(os.environ.get('YUMMLY_NEGATIVE_CACHE_ERROR_RATE', 0.001))
+
+NEGATIVE_CACHE_TTL = float(os.environ.get('YUMMLY_NEGATIVE_CACHE_TTL_SECONDS', 60 * 60))
+
+HASH_MASK = (1 << 64) - 1
+
+
+"""
+Method to get the number of bits and of hash functions a Bloom filter needs to
+hold capacity keys with a false positive rate of error_rate
+"""
+def get_filter_size(capacity, error_rate):
+	bit_count = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+	hash_count = max(1, int(round(bit_count / capacity * math.log(2))))
+	return bit_count, hash_count
+
+
+"""
+Time-decayed Bloom filter: keys are added to the current of two generations of
+bits and looked up in both. Every ttl / 2 seconds, or as soon as the current
+generation holds capacity keys, the older generation is dropped and a new one
+started, so keys are forgotten between ttl / 2 and ttl seconds after being
+added and the false positive rate stays below about twice error_rate. Keys are
+hashed with BLAKE2, so the same key sets the same bits in every process
+"""
+class TimeDecayedBloomFilter:
+	def __init__(self, capacity=NEGATIVE_CACHE_CAPACITY, error_rate=NEGATIVE_CACHE_ERROR_RATE,
+				 ttl=NEGATIVE_CACHE_TTL, clock=time.monotonic):
+		self.capacity = capacity
+		self.error_rate = error_rate
+		self.ttl = ttl
+		self.clock = clock
+		self.bit_count, self.hash_count = get_filter_size(capacity, error_rate)
+		self.counters = { 'additions': 0, 'lookups': 0, 'hits': 0, 'rotations': 0 }
+		self._generations = [self._new_generation(), self._new_generation()]
+		self._current_count = 0
+		self._started_at = clock()
+		self._lock = threading.Lock()
+
+	def _new_generation(self):
+		return bytearray((self.bit_count + 7) // 8)
+
+	def _bit_indexes(self, key):
+		digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).digest()
+		first_hash = int.from_bytes(digest[:8], 'little')
+		second_hash = int.from_bytes(digest[8:], 'little') | 1
+		return [((first_hash + number * second_hash) & HASH_MASK) % self.bit_count
+				for number in range(self.hash_count)]
+
+	def _rotate_if_due(self):
+		if self.clock() - self._started_at < self.ttl / 2 and self._current_count < self.capacity:
+			return
+		self._generations = [self._generations[1], self._new_generation()]
+		self._current_count = 0
+		self._started_at = self.clock()
+		self.counters['rotations'] += 1
+
+	def add(self, key):
+		indexes = self._bit_indexes(key)
+		with self._lock:
+			self._rotate_if_due()
+			current = self._generations[1]
+			for index in indexes:
+				current[index // 8] |= 1 << (index % 8)
+			self._current_count += 1
+			self.counters['additions'] += 1
+
+	def __contains__(self, key):
+		indexes = self._bit_indexes(key)
+		with self._lock:
+			self._rotate_if_due()
+			self.counters['lookups'] += 1
+			found = any(all(generation[index // 8] & (1 << (index % 8)) for index in indexes)
+						for generation in self._generations)
+			if found:
+				self.counters['hits'] += 1
+			return found
+
+	def clear(self):
+		with self._lock:
+			self._generations = [self._new_generation(), self._new_generation()]
+			self._current_count = 0
+			self._started_at = self.clock()
+
+	def get_stats(self):
+		with self._lock:
+			return dict(self.counters, bits=self.bit_count, hash_functions=self.hash_count,
+						bytes=sum(len(generation) for generation in self._generations))
@@ -0,0 +1,185 @@
+"""
+This module contains the snapshots of the in-process caches written to /tmp,
+so that a Lambda container, or a new one started from a deployment package
+bundling a seed snapshot, starts with the recipes that were popular instead of
+empty caches.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from snapshot_error import SnapshotError
+from tiered_cache import TieredCache
+from yummly_client import get_default_client
+
+""" --- Constants ---"""
+CACHE_SNAPSHOTS = os.environ.get('YUMMLY_CACHE_SNAPSHOTS', 'false').lower() == 'true'
+
+SNAPSHOT_PATH = os.environ.get('YUMMLY_CACHE_SNAPSHOT_PATH', '/tmp/yummly_cache.snapshot')
+
+SEED_SNAPSHOT_PATH = os.environ.get('YUMMLY_CACHE_SEED_PATH',
+									os.path.join(os.path.dirname(os.path.abspath(__file__)),
+												 'cache_seed.snapshot'))
+
+SNAPSHOT_INTERVAL = float(os.environ.get('YUMMLY_CACHE_SNAPSHOT_INTERVAL_SECONDS', 5 * 60))
+
+SNAPSHOT_MAGIC = b'YCSN'
+
+SNAPSHOT_VERSION = 2
+
+DIGEST_SIZE = 32
+
+_default_snapshotter = None
+_default_snapshotter_lock = threading.Lock()
+
+
+"""
+Method to turn a key read back from JSON into the one it was cached under,
+lists having been tuples
+"""
+def get_cache_key(stored_key):
+	if isinstance(stored_key, list):
+		return tuple(get_cache_key(item) for item in stored_key)
+	return stored_key
+
+"""
+Method to write the entries of the caches given by name to path, as a header
+with the format version and a SHA-256 digest followed by the zlib-compressed
+JSON of the entries, each with the wall-clock time it expires at. The snapshot
+is written next to path and then moved over it, so that readers never see
+half of one
+"""
+def write_snapshot(caches, path, clock=time.time):
+	now = clock()
+	snapshot = { 'written_at': now, 'caches': {} }
+	for name, cache in caches.items():
+		snapshot['caches'][name] = [[key, value, now + ttl if ttl is not None else None]
+									for key, value, ttl in cache.get_entries()]
+	body = zlib.compress(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'))
+	temporary_path = path + '.' + str(os.getpid()) + '.tmp'
+	with open(temporary_path, 'wb') as snapshot_file:
+		snapshot_file.write(SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION]))
+		snapshot_file.write(hashlib.sha256(body).digest())
+		snapshot_file.write(body)
+	os.replace(temporary_path, path)
+	return sum(len(entries) for entries in snapshot['caches'].values())
+
+"""
+Method to read a snapshot written by write_snapshot, raising SnapshotError if
+it fails its integrity checks
+"""
+def read_snapshot(path):
+	with open(path, 'rb') as snapshot_file:
+		data = snapshot_file.read()
+	header_size = len(SNAPSHOT_MAGIC) + 1
+	if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+		raise SnapshotError(path, 'not a cache snapshot')
+	if len(data) < header_size + DIGEST_SIZE or data[len(SNAPSHOT_MAGIC)] != SNAPSHOT_VERSION:
+		raise SnapshotError(path, 'unsupported format version')
+	digest, body = data[header_size:header_size + DIGEST_SIZE], data[header_size + DIGEST_SIZE:]
+	if hashlib.sha256(body).digest() != digest:
+		raise SnapshotError(path, 'digest mismatch')
+	try:
+		return json.loads(zlib.decompress(body).decode('utf-8'))
+	except (zlib.error, ValueError):
+		raise SnapshotError(path, 'unreadable entries')
+
+"""
+Method to fill the caches given by name from the first of paths holding a
+valid snapshot, skipping the entries that expired since it was written, and
+return the number of entries restored
+"""
+def restore_caches(caches, paths, clock=time.time):
+	for path in paths:
+		try:
+			snapshot = read_snapshot(path)
+		except (OSError, SnapshotError):
+			continue
+		now = clock()
+		restored = 0
+		for name, entries in snapshot['caches'].items():
+			if name not in caches:
+				continue
+			for key, value, expires_at in entries:
+				if expires_at is not None and expires_at <= now:
+					continue
+				caches[name].put(get_cache_key(key), value,
+								 ttl=expires_at - now if expires_at is not None else None)
+				restored += 1
+		return restored
+	return 0
+
+
+"""
+Writer of snapshots of the caches given by name to path, on demand or, when
+maybe_snapshot is called after each request, at most every interval seconds.
+Lambda freezes containers between invocations, so snapshots are written from
+the request path rather than from a timer thread
+"""
+class CacheSnapshotter:
+	def __init__(self, caches, path=SNAPSHOT_PATH, interval=SNAPSHOT_INTERVAL, clock=time.monotonic):
+		self.caches = caches
+		self.path = path
+		self.interval = interval
+		self.clock = clock
+		self.counters = { 'snapshots': 0, 'failures': 0, 'entries': 0 }
+		self._last_snapshot_at = clock()
+		self._lock = threading.Lock()
+
+	def snapshot(self):
+		with self._lock:
+			self._last_snapshot_at = self.clock()
+			try:
+				self.counters['entries'] = write_snapshot(self.caches, self.path)
+				self.counters['snapshots'] += 1
+			except OSError:
+				self.counters['failures'] += 1
+
+	def maybe_snapshot(self):
+		if self.clock() - self._last_snapshot_at >= self.interval:
+			self.snapshot()
+
+	def get_stats(self):
+		with self._lock:
+			return dict(self.counters)
+
+
+"""
+Method to get the caches of a client that can be snapshotted, by name: its
+in-process caches, or the nearest tier of its tiered ones
+"""
+def get_snapshot_caches(client):
+	caches = { 'recipe': client.recipe_cache, 'search': client.search_cache }
+	for name, cache in caches.items():
+		while isinstance(cache, TieredCache):
+			cache = cache.near
+		caches[name] = cache
+	return { name: cache for name, cache in caches.items() if hasattr(cache, 'get_entries') }
+
+"""
+Method to get the snapshotter of the caches of the default client, restoring
+them on first use from the last snapshot written in /tmp or, in a new
+container, from the seed snapshot bundled with the function
+"""
+def get_default_snapshotter():
+	global _default_snapshotter
+	if _default_snapshotter is None:
+		with _default_snapshotter_lock:
+			if _default_snapshotter is None:
+				caches = get_snapshot_caches(get_default_client())
+				restore_caches(caches, [SNAPSHOT_PATH, SEED_SNAPSHOT_PATH])
+				_default_snapshotter = CacheSnapshotter(caches)
+	return _default_snapshotter
+
+"""
+Method to replace the shared snapshotter, e.g. to snapshot other caches
+"""
+def set_default_snapshotter(snapshotter):
+	global _default_snapshotter
+	with _default_snapshotter_lock:
+		previous_snapshotter = _default_snapshotter
+		_default_snapshotter = snapshotter
+	return previous_snapshotter
@@ -0,0 +1,14 @@
+"""
+Custom exception for requests a replay transport has no recording for
+"""
+class CassetteMissError(Exception):
+	def __init__(self, url, params=None):
+		self.url = url
+		self.params = params
+
+	def message(self):
+		base_message = 'No recorded response for ' + self.url
+		if self.params:
+			return base_message + ' with the following parameters: ' + str(self.params)
+		else:
+			return base_message
@@ -0,0 +1,65 @@
+"""
+This module contains the circuit breaker used to stop sending requests to a
+Yummly API endpoint while it is unhealthy.
+"""
+
+import threading
+import time
+from circuit_open_error import CircuitOpenError
+
+""" --- Constants ---"""
+DEFAULT_FAILURE_THRESHOLD = 5
+
+DEFAULT_RESET_TIMEOUT = 30
+
+
+"""
+Circuit breaker for one endpoint: after failure_threshold consecutive failures
+the circuit opens and requests fail fast with CircuitOpenError for
+reset_timeout seconds; then a single trial request is let through, which
+closes the circuit if it succeeds or reopens it if it fails; a trial cancelled
+before being sent lets the next request through instead. State lives in
+the process, so each warm container or worker tracks Yummly's health itself
+"""
+class CircuitBreaker:
+	def __init__(self, endpoint, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+				 reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+		self.endpoint = endpoint
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.clock = clock
+		self.state = 'closed'
+		self.failure_count = 0
+		self.opened_at = None
+		self._trial_in_flight = False
+		self._lock = threading.Lock()
+
+	def before_request(self):
+		with self._lock:
+			if self.state == 'closed':
+				return
+			retry_after = self.opened_at + self.reset_timeout - self.clock()
+			if self.state == 'open' and retry_after <= 0:
+				self.state = 'half open'
+			if self.state == 'half open' and not self._trial_in_flight:
+				self._trial_in_flight = True
+				return
+			raise CircuitOpenError(self.endpoint, max(retry_after, 0))
+
+	def cancel_request(self):
+		with self._lock:
+			self._trial_in_flight = False
+
+	def record_success(self):
+		with self._lock:
+			self.state = 'closed'
+			self.failure_count = 0
+			self._trial_in_flight = False
+
+	def record_failure(self):
+		with self._lock:
+			self.failure_count += 1
+			if self.state == 'half open' or self.failure_count >= self.failure_threshold:
+				self.state = 'open'
+				self.opened_at = self.clock()
+			self._trial_in_flight = False
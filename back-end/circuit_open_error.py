@@ -0,0 +1,15 @@
+"""
+Custom exception for requests refused because the circuit breaker for a Yummly
+API endpoint is open
+"""
+from request_error import RequestError
+
+class CircuitOpenError(RequestError):
+	def __init__(self, endpoint, retry_after):
+		RequestError.__init__(self, None)
+		self.endpoint = endpoint
+		self.retry_after = retry_after
+
+	def message(self):
+		return ('Yummly ' + self.endpoint + ' requests are failing, not retrying for '
+				+ str(round(self.retry_after, 1)) + ' seconds')
@@ -0,0 +1,131 @@
+"""
+This module contains the compressed cache used as a cold tier behind the
+in-process recipe cache, so that more recipes fit into the memory of a small
+Lambda function.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+	import lz4.frame
+except ImportError:
+	lz4 = None
+
+""" --- Constants ---"""
+COLD_CACHE_BYTES = int(os.environ.get('YUMMLY_COLD_CACHE_BYTES', 0))
+
+CODECS = { 'zlib': (zlib.compress, zlib.decompress) }
+if lz4 is not None:
+	CODECS['lz4'] = (lz4.frame.compress, lz4.frame.decompress)
+
+DEFAULT_CODEC = os.environ.get('YUMMLY_COLD_CACHE_CODEC', 'lz4' if lz4 is not None else 'zlib')
+
+
+class _CompressedEntry:
+	__slots__ = ('data', 'raw_size', 'expires_at')
+
+	def __init__(self, data, raw_size, expires_at):
+		self.data = data
+		self.raw_size = raw_size
+		self.expires_at = expires_at
+
+
+"""
+Thread-safe LRU cache with the same interface as TinyLfuCache, holding JSON
+documents compressed with one of CODECS, lz4 when it is installed and zlib
+otherwise, and decompressing them on every hit. max_bytes bounds the
+compressed size of the documents. Stacked behind a TinyLfuCache in a
+TieredCache that does not write through, it only compresses the documents the
+uncompressed tier evicts or rejects, and those requested again move back into
+it. Stats report the memory saved and the time spent decompressing, to tune
+the size of both tiers
+"""
+class CompressedCache:
+	def __init__(self, max_bytes, ttl=None, codec=DEFAULT_CODEC, clock=time.monotonic):
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+		self.codec = codec
+		self.compress, self.decompress = CODECS[codec]
+		self.clock = clock
+		self.counters = { 'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+						  'decompression_seconds': 0.0 }
+		self._entries = OrderedDict()
+		self._bytes = 0
+		self._raw_bytes = 0
+		self._lock = threading.Lock()
+
+	def _remove(self, key):
+		entry = self._entries.pop(key, None)
+		if entry is not None:
+			self._bytes -= len(entry.data)
+			self._raw_bytes -= entry.raw_size
+		return entry
+
+	def get(self, key):
+		return self.get_with_ttl(key)[0]
+
+	def get_with_ttl(self, key):
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				self.counters['misses'] += 1
+				return None, None
+			now = self.clock()
+			if entry.expires_at is not None and entry.expires_at <= now:
+				self._remove(key)
+				self.counters['expirations'] += 1
+				self.counters['misses'] += 1
+				return None, None
+			self._entries.move_to_end(key)
+			self.counters['hits'] += 1
+		started_at = time.perf_counter()
+		value = json.loads(self.decompress(entry.data).decode('utf-8'))
+		with self._lock:
+			self.counters['decompression_seconds'] += time.perf_counter() - started_at
+		return value, entry.expires_at - now if entry.expires_at is not None else None
+
+	def put(self, key, value, ttl=None):
+		raw = json.dumps(value, separators=(',', ':')).encode('utf-8')
+		data = self.compress(raw)
+		ttl = ttl if ttl is not None else self.ttl
+		with self._lock:
+			self._remove(key)
+			if len(data) > self.max_bytes:
+				return
+			expires_at = self.clock() + ttl if ttl is not None else None
+			self._entries[key] = _CompressedEntry(data, len(raw), expires_at)
+			self._bytes += len(data)
+			self._raw_bytes += len(raw)
+			while self._bytes > self.max_bytes:
+				self._remove(next(iter(self._entries)))
+				self.counters['evictions'] += 1
+
+	def delete(self, key):
+		with self._lock:
+			self._remove(key)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self._bytes = 0
+			self._raw_bytes = 0
+
+	def __len__(self):
+		with self._lock:
+			return len(self._entries)
+
+	def get_stats(self):
+		with self._lock:
+			stats = dict(self.counters, codec=self.codec, entries=len(self._entries),
+						 bytes=self._bytes, raw_bytes=self._raw_bytes)
+		requests = stats['hits'] + stats['misses']
+		stats['hit_rate'] = stats['hits'] / requests if requests else 0.0
+		stats['compression_ratio'] = stats['raw_bytes'] / stats['bytes'] if stats['bytes'] else 0.0
+		stats['mean_decompression_seconds'] = (stats['decompression_seconds'] / stats['hits']
+											   if stats['hits'] else 0.0)
+		return stats
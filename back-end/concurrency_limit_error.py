@@ -0,0 +1,14 @@
+"""
+Custom exception for requests to the Yummly API shed by the adaptive
+concurrency limiter because too many are already in flight
+"""
+from request_error import RequestError
+
+class ConcurrencyLimitError(RequestError):
+	def __init__(self, limit):
+		RequestError.__init__(self, None)
+		self.limit = limit
+
+	def message(self):
+		return ('Shed request to Yummly with the limit of ' + str(self.limit)
+				+ ' requests in flight reached')
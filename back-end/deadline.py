@@ -0,0 +1,48 @@
+"""
+This module contains the deadline used to bound the time spent answering one
+request, so upstream calls can be cut short before Lambda kills the function.
+"""
+
+import os
+import time
+from deadline_exceeded_error import DeadlineExceededError
+
+""" --- Constants ---"""
+DEFAULT_BUDGET = float(os.environ.get('RECIPE_BOT_BUDGET_SECONDS', 8))
+
+DEFAULT_RESERVE = float(os.environ.get('RECIPE_BOT_RESERVE_SECONDS', 0.5))
+
+
+"""
+Point in time by which a request must be answered. Upstream calls take their
+timeout from the time remaining, and DeadlineExceededError is raised once none
+is left
+"""
+class Deadline:
+	def __init__(self, budget, clock=time.monotonic):
+		self.budget = budget
+		self.clock = clock
+		self.expires_at = clock() + budget
+
+	def remaining(self):
+		return max(self.expires_at - self.clock(), 0)
+
+	def expired(self):
+		return self.remaining() <= 0
+
+	def get_timeout(self, cap=None):
+		remaining = self.remaining()
+		if remaining <= 0:
+			raise DeadlineExceededError(self.budget)
+		return remaining if cap is None else min(remaining, cap)
+
+
+"""
+Method to create the deadline for a Lambda invocation from the time Lambda
+says is left, keeping reserve seconds to build the reply; outside Lambda the
+configured budget is used
+"""
+def get_deadline(context=None, reserve=DEFAULT_RESERVE, budget=DEFAULT_BUDGET):
+	if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+		budget = context.get_remaining_time_in_millis() / 1000 - reserve
+	return Deadline(max(budget, 0))
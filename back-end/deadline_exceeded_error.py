@@ -0,0 +1,13 @@
+"""
+Custom exception for requests that cannot complete before the deadline of the
+conversation turn they serve
+"""
+from request_error import RequestError
+
+class DeadlineExceededError(RequestError):
+	def __init__(self, budget):
+		RequestError.__init__(self, None)
+		self.budget = budget
+
+	def message(self):
+		return 'Ran out of time to answer within ' + str(round(self.budget, 2)) + ' seconds'
@@ -0,0 +1,98 @@
+"""
+This module contains the memo of the answers the bot gave, so that popular
+recipe requests are answered again without searching, fetching, scaling or
+rendering anything.
+"""
+
+import os
+import threading
+from api_functions import get_recipe_details
+from query_key import get_canonical_value
+from tiny_lfu_cache import TinyLfuCache
+
+""" --- Constants ---"""
+FULFILLMENT_MEMO_BYTES = int(os.environ.get('RECIPE_BOT_FULFILLMENT_MEMO_BYTES', 1024 * 1024))
+
+FULFILLMENT_MEMO_TTL = float(os.environ.get('RECIPE_BOT_FULFILLMENT_MEMO_TTL_SECONDS', 15 * 60))
+
+RECIPE_LAYER_RATIO = 0.5
+
+_default_memo = None
+_default_memo_lock = threading.Lock()
+
+
+"""
+Method to get the key a recipe request is memoized under whatever its
+servings: the recipe type and search options, ignoring case, whitespace and
+the order of allergies and restrictions
+"""
+def get_request_key(search_term, search_options):
+	return (get_canonical_value(search_term),
+			tuple((name, get_canonical_value(value)) for name, value in sorted(search_options.items())))
+
+
+"""
+Memo of the answers to recipe requests in two layers: the rendered answer,
+keyed by the request and its servings, and the details of the recipe found,
+keyed by the request alone. When only the servings of a request differ from
+an earlier one, the recipe found for it is scaled and rendered again without
+searching or fetching anything. Entries expire after ttl seconds, and requests
+that fail are not memoized
+"""
+class FulfillmentMemo:
+	def __init__(self, max_bytes=FULFILLMENT_MEMO_BYTES, ttl=FULFILLMENT_MEMO_TTL):
+		recipe_bytes = int(max_bytes * RECIPE_LAYER_RATIO)
+		self.answers = TinyLfuCache(max_bytes - recipe_bytes, ttl=ttl)
+		self.recipes = TinyLfuCache(recipe_bytes, ttl=ttl)
+		self.counters = { 'answered': 0, 'rescaled': 0, 'looked_up': 0 }
+		self._lock = threading.Lock()
+
+	def _count(self, counter):
+		with self._lock:
+			self.counters[counter] += 1
+
+	def fulfill(self, request_key, servings, look_up, render):
+		answer = self.answers.get((request_key, servings))
+		if answer is not None:
+			self._count('answered')
+			return answer
+		details = self.recipes.get(request_key)
+		if details is not None:
+			details = dict(details, **get_recipe_details(details['scaling_basis'], servings))
+			self._count('rescaled')
+		else:
+			details = look_up()
+			if 'scaling_basis' in details:
+				self.recipes.put(request_key, details)
+			self._count('looked_up')
+		answer = render(details)
+		self.answers.put((request_key, servings), answer)
+		return answer
+
+	def get_stats(self):
+		with self._lock:
+			return dict(self.counters, answers=self.answers.get_stats(),
+						recipes=self.recipes.get_stats())
+
+
+"""
+Method to get the memo shared by every request in this process, or None if
+memoizing is turned off
+"""
+def get_default_memo():
+	global _default_memo
+	if _default_memo is None and FULFILLMENT_MEMO_BYTES > 0:
+		with _default_memo_lock:
+			if _default_memo is None:
+				_default_memo = FulfillmentMemo()
+	return _default_memo
+
+"""
+Method to replace the shared memo, e.g. to clear it
+"""
+def set_default_memo(memo):
+	global _default_memo
+	with _default_memo_lock:
+		previous_memo = _default_memo
+		_default_memo = memo
+	return previous_memo
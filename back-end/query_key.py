@@ -0,0 +1,21 @@
+"""
+This module contains the functionality needed to identify equivalent queries
+to the Yummly API.
+"""
+
+"""
+Method to get the canonical form of one value of a search parameter: text in
+lower case with runs of whitespace made single spaces, lists sorted
+"""
+def get_canonical_value(value):
+	if isinstance(value, (list, tuple)):
+		return tuple(sorted(set(get_canonical_value(item) for item in value)))
+	return ' '.join(str(value).lower().split())
+
+"""
+Method to get a hashable key identifying a search payload, so that searches
+that only differ in case, whitespace or the order of list parameters share one
+request and one cached result
+"""
+def get_payload_key(payload):
+	return tuple(sorted((name, get_canonical_value(value)) for name, value in payload.items()))
@@ -0,0 +1,18 @@
+"""
+Custom exception for requests refused before reaching Yummly because they would
+exceed the number of API calls in our plan
+"""
+from request_error import RequestError
+
+class QuotaExhaustedError(RequestError):
+	def __init__(self, retry_after, user_id=None):
+		RequestError.__init__(self, 409)
+		self.retry_after = retry_after
+		self.user_id = user_id
+
+	def message(self):
+		if self.user_id is not None:
+			base_message = 'User ' + str(self.user_id) + ' has used their share of our API calls'
+		else:
+			base_message = 'Our bot has used up the API calls in our plan'
+		return base_message + ', try again in ' + str(round(self.retry_after, 1)) + ' seconds'
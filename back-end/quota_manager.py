@@ -0,0 +1,114 @@
+"""
+This module contains the quota manager used to keep requests to the Yummly API
+within the number of calls in our plan.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from quota_exhausted_error import QuotaExhaustedError
+
+""" --- Constants ---"""
+CALLS_PER_MINUTE = os.environ.get('YUMMLY_CALLS_PER_MINUTE')
+
+USER_CALLS_PER_MINUTE = os.environ.get('YUMMLY_USER_CALLS_PER_MINUTE')
+
+DEFAULT_COOLDOWN = float(os.environ.get('YUMMLY_QUOTA_COOLDOWN_SECONDS', 60))
+
+MAX_TRACKED_USERS = 10000
+
+
+"""
+Token bucket holding up to capacity tokens and refilling at rate tokens per
+second
+"""
+class TokenBucket:
+	def __init__(self, rate, capacity, clock=time.monotonic):
+		self.rate = rate
+		self.capacity = capacity
+		self.clock = clock
+		self.tokens = capacity
+		self.updated_at = clock()
+
+	def _refill(self):
+		now = self.clock()
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+		self.updated_at = now
+
+	def try_take(self):
+		self._refill()
+		if self.tokens >= 1:
+			self.tokens -= 1
+			return True
+		return False
+
+	def give_back(self):
+		self.tokens = min(self.capacity, self.tokens + 1)
+
+	def get_wait(self):
+		self._refill()
+		return max(1 - self.tokens, 0) / self.rate
+
+
+"""
+Quota manager in front of the Yummly client: every call takes a token from a
+bucket sized to the plan and one from the calling user's own, smaller bucket,
+so one chatty user cannot use up everyone's calls. After Yummly answers 409
+all calls are refused for cooldown seconds. Refused calls raise
+QuotaExhaustedError straight away instead of waiting. Limits left as None are
+not enforced
+"""
+class QuotaManager:
+	def __init__(self, calls_per_minute=None, user_calls_per_minute=None,
+				 cooldown=DEFAULT_COOLDOWN, clock=time.monotonic):
+		self.cooldown = cooldown
+		self.clock = clock
+		self.user_calls_per_minute = user_calls_per_minute
+		self.bucket = None
+		if calls_per_minute is not None:
+			self.bucket = TokenBucket(calls_per_minute / 60, max(calls_per_minute / 6, 1), clock)
+		self.cooldown_until = None
+		self.refused_count = 0
+		self._user_buckets = OrderedDict()
+		self._lock = threading.Lock()
+
+	@classmethod
+	def from_environment(cls):
+		return cls(float(CALLS_PER_MINUTE) if CALLS_PER_MINUTE else None,
+				   float(USER_CALLS_PER_MINUTE) if USER_CALLS_PER_MINUTE else None)
+
+	def _get_user_bucket(self, user_id):
+		bucket = self._user_buckets.pop(user_id, None)
+		if bucket is None:
+			rate = self.user_calls_per_minute / 60
+			bucket = TokenBucket(rate, max(self.user_calls_per_minute / 6, 1), self.clock)
+		self._user_buckets[user_id] = bucket
+		if len(self._user_buckets) > MAX_TRACKED_USERS:
+			self._user_buckets.popitem(last=False)
+		return bucket
+
+	def _refuse(self, retry_after, user_id=None):
+		self.refused_count += 1
+		raise QuotaExhaustedError(retry_after, user_id)
+
+	def acquire(self, user_id=None):
+		with self._lock:
+			if self.cooldown_until is not None:
+				retry_after = self.cooldown_until - self.clock()
+				if retry_after > 0:
+					self._refuse(retry_after)
+				self.cooldown_until = None
+			user_bucket = None
+			if user_id is not None and self.user_calls_per_minute is not None:
+				user_bucket = self._get_user_bucket(user_id)
+				if not user_bucket.try_take():
+					self._refuse(user_bucket.get_wait(), user_id)
+			if self.bucket is not None and not self.bucket.try_take():
+				if user_bucket is not None:
+					user_bucket.give_back()
+				self._refuse(self.bucket.get_wait())
+
+	def record_rate_limited(self):
+		with self._lock:
+			self.cooldown_until = self.clock() + self.cooldown
@@ -6,7 +6,13 @@ recipe Lex bot.
 from __future__ import print_function
 import json
 import logging
-from api_functions import get_recipe_info
+import os
+from api_functions import get_recipe_info, get_relaxed_recipe_info
+from cache_snapshot import CACHE_SNAPSHOTS, get_default_snapshotter
+from fulfillment_memo import get_default_memo, get_request_key
+from deadline import get_deadline
+from deadline_exceeded_error import DeadlineExceededError
+from quota_exhausted_error import QuotaExhaustedError
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
@@ -25,6 +31,15 @@ ALLERGIES_LIST = {
     'wheat free': 'Wheat-Free'
 }
 RESTRICTIONS = []
+TIMEOUT_MESSAGE = 'Sorry, finding a recipe is taking longer than usual. ' \
+                  'Please try again in a moment.'
+QUOTA_MESSAGE = 'Sorry, I am handling too many recipe requests right now. ' \
+                'Please try again in a few minutes.'
+RELAX_CONSTRAINTS = os.environ.get('RECIPE_BOT_RELAX_CONSTRAINTS', 'false').lower() == 'true'
+
+if CACHE_SNAPSHOTS:
+    # Restore the warm caches during the container's init phase
+    get_default_snapshotter()
 
 def get_slots(intent_request):
     """
@@ -139,7 +154,8 @@ def get_bot_response(details):
     name = details['name']
     ingredients = details['scaled_ingredients']
     url = details['recipe_url']
-    response = f'Here is a recipe called {name}. ' \
+    response = get_relaxation_note(details.get('relaxed_constraints'))
+    response += f'Here is a recipe called {name}. ' \
                f'The full instructions are available at: {url}. \n' \
                'Based on the desired servings, you will need: \n'
     for ingredient in ingredients:
@@ -148,9 +164,29 @@ def get_bot_response(details):
     return response
 
 
-def find_recipe(intent_request):
+def get_relaxation_note(relaxed_constraints):
+    """
+    Called by get_bot_response to tell the user which of their constraints
+    were loosened to find a recipe.
+    """
+    if not relaxed_constraints:
+        return ''
+    loosened = []
+    for option, value in relaxed_constraints:
+        if option == 'time':
+            loosened.append('without your time limit')
+        else:
+            loosened.append(f'with {value} allowed')
+    return 'I could not find a recipe matching all of your restrictions, ' \
+           f'so here is one {" and ".join(loosened)}. '
+
+
+def find_recipe(intent_request, deadline=None):
     """
-    Called by dispatch to handle a recipe request intent.
+    Called by dispatch to handle a recipe request intent. Yummly requests are
+    given whatever time is left before the deadline; if it runs out the user
+    is told to try again instead of the invocation timing out. The same
+    happens straight away when our Yummly API quota is used up.
     """
     # Get invocation source and slots
     source = intent_request['invocationSource']
@@ -170,59 +206,72 @@ def find_recipe(intent_request):
     # Make API calls based on slots elicited from user
     recipe = slots['RecipeType']
     servings = int(slots['Servings'])
-    if not ALLERGIES and not RESTRICTIONS and not slots['RecipeTime']:
-        response = get_recipe_info(recipe, servings)
-    elif slots['RecipeTime']:
-        time = parse_time(slots['RecipeTime'])
-        if not ALLERGIES and not RESTRICTIONS:
-            response = get_recipe_info(recipe, servings, time=time)
-        elif not ALLERGIES:
-            response = get_recipe_info(
-                recipe, 
-                servings,
-                time=time, 
-                excluded_ingredient=RESTRICTIONS
-            )
-        elif not RESTRICTIONS:
-            response = get_recipe_info(
-                recipe,
-                servings,
-                time=time,
-                allergy=ALLERGIES
-            )
-        else:
-            response = get_recipe_info(
-                recipe,
-                servings,
-                time=time,
-                allergy=ALLERGIES,
-                excluded_ingredient=RESTRICTIONS
-            )
-    elif RESTRICTIONS:
-        if not ALLERGIES:
-            response = get_recipe_info(
-                recipe,
-                servings,
-                excluded_ingredient=RESTRICTIONS
-            )
-        else:
-            response = get_recipe_info(
-                recipe,
-                servings,
-                allergy=ALLERGIES,
-                excluded_ingredient=RESTRICTIONS
-            )
-    elif ALLERGIES:
-        response = get_recipe_info(
-            recipe,
-            servings,
-            allergy=ALLERGIES
-        )
+    try:
+        content = get_fulfillment(recipe, servings, slots, deadline,
+                                  intent_request.get('userId'))
+    except DeadlineExceededError as deadline_err:
+        logger.error(deadline_err.message())
+        return close(intent_request['sessionAttributes'],
+                     'Failed',
+                     {'contentType': 'PlainText', 'content': TIMEOUT_MESSAGE})
+    except QuotaExhaustedError as quota_err:
+        logger.error(quota_err.message())
+        return close(intent_request['sessionAttributes'],
+                     'Failed',
+                     {'contentType': 'PlainText', 'content': QUOTA_MESSAGE})
     return close(intent_request['sessionAttributes'],
                  'Fulfilled',
-                 {'contentType': 'PlainText', 'content': get_bot_response(response)})
+                 {'contentType': 'PlainText', 'content': content})
+
+
+def get_search_options(slots):
+    """
+    Called by get_recipe_response and get_fulfillment to get the search
+    options matching the elicited slots.
+    """
+    options = {}
+    if slots['RecipeTime']:
+        options['time'] = parse_time(slots['RecipeTime'])
+    if ALLERGIES:
+        options['allergy'] = ALLERGIES
+    if RESTRICTIONS:
+        options['excluded_ingredient'] = RESTRICTIONS
+    return options
+
+
+def get_fulfillment(recipe, servings, slots, deadline, user_id=None):
+    """
+    Called by find_recipe to get the answer to a recipe request. Answers are
+    memoized by recipe type, servings, allergies, restrictions and time, and
+    the recipe found separately without the servings, so repeated requests
+    cost nothing and requests differing only in servings are only rescaled.
+    """
+    memo = get_default_memo()
+    if memo is None:
+        return get_bot_response(get_recipe_response(recipe, servings, slots, deadline, user_id))
+    look_up = lambda: get_recipe_response(recipe, servings, slots, deadline, user_id,
+                                          with_scaling_basis=True)
+    request_key = get_request_key(recipe, get_search_options(slots))
+    return memo.fulfill(request_key, servings, look_up, get_bot_response)
+
 
-def dispatch(intent_request):
+def get_recipe_response(recipe, servings, slots, deadline, user_id=None,
+                        with_scaling_basis=False):
+    """
+    Called by find_recipe to look up a recipe matching the elicited slots.
+    With RECIPE_BOT_RELAX_CONSTRAINTS set to true, the time limit and excluded
+    ingredients are loosened if nothing matches them all; allergies never are.
+    With with_scaling_basis, the details can be rescaled to other servings.
+    """
+    options = get_search_options(slots)
+    if RELAX_CONSTRAINTS:
+        return get_relaxed_recipe_info(recipe, servings, deadline=deadline, user_id=user_id,
+                                       with_scaling_basis=with_scaling_basis, **options)
+    return get_recipe_info(recipe, servings, deadline=deadline, user_id=user_id,
+                           with_scaling_basis=with_scaling_basis, **options)
+
+
+def dispatch(intent_request, deadline=None):
     """
     Called when the user specifies an intent for this bot.
     """
@@ -230,14 +279,21 @@ def dispatch(intent_request):
     intent_name = intent_request['currentIntent']['name']
     # Dispatch to your bot's intent handlers
     if intent_name == 'FindRecipe':
-        return find_recipe(intent_request)
+        return find_recipe(intent_request, deadline)
     raise Exception('Intent with name ' + intent_name + ' not supported')
 
 """ --- Main handler --- """
-def handler(event, contex):
+def handler(event, context):
     """
-    Handle incoming recipe requests by passing event to dispatch function
+    Handle incoming recipe requests by passing event to dispatch function,
+    along with a deadline taken from the time Lambda has left to run, then
+    snapshot the warm caches to /tmp if cache snapshots are on and one is due
     """
     print("Received recipe request: " + json.dumps(event, indent=2))
     logger.debug('event.bot.name={}'.format(event['bot']['name']))
-    return dispatch(event)
+    try:
+        return dispatch(event, get_deadline(context))
+    finally:
+        if CACHE_SNAPSHOTS:
+            get_default_snapshotter().maybe_snapshot()
+
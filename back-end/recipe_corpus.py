@@ -0,0 +1,77 @@
+"""
+This module contains the fixture corpus of recipes that searches and recipe
+requests can be answered from without the Yummly API, by the simulator used to
+load test the bot and by the corpus recipe provider.
+"""
+
+import json
+import os
+
+""" --- Constants ---"""
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures',
+								   'yummly_corpus.json')
+
+DEFAULT_MAX_RESULT = 10
+
+
+"""
+Method to load a fixture corpus: a JSON list of recipes shaped like the
+responses of the recipe endpoint, each with an id
+"""
+def load_corpus(path=DEFAULT_CORPUS_PATH):
+	with open(path) as corpus_file:
+		return json.load(corpus_file)
+
+"""
+Method to check whether a recipe in the corpus satisfies the search parameters
+"""
+def matches_search(recipe, params):
+	name = recipe['name'].lower()
+	for word in ' '.join(params.get('q', [])).lower().split():
+		if word not in name:
+			return False
+	allowed_allergies = [allergy.lower() for allergy in recipe.get('allowedAllergy', [])]
+	for allergy in params.get('allowedAllergy[]', []):
+		if allergy.lower() not in allowed_allergies:
+			return False
+	ingredient_lines = ' '.join(recipe['ingredientLines']).lower()
+	for ingredient in params.get('excludedIngredient[]', []):
+		if ingredient.lower() in ingredient_lines:
+			return False
+	max_time = params.get('maxTotalTimeInSeconds')
+	if max_time and recipe.get('totalTimeInSeconds', 0) > int(max_time[0]):
+		return False
+	return True
+
+
+"""
+Corpus of recipes answering search parameters, given as lists of strings like
+parse_qs returns them, and recipe ids with bodies shaped like Yummly's
+"""
+class RecipeCorpus:
+	def __init__(self, corpus=None):
+		self.recipes = { recipe['id']: recipe for recipe in (corpus or load_corpus()) }
+
+	def search(self, params):
+		matches = [recipe for recipe in self.recipes.values() if matches_search(recipe, params)]
+		start = int(params.get('start', ['0'])[0])
+		max_result = int(params.get('maxResult', [DEFAULT_MAX_RESULT])[0])
+		criteria = { name: values if name.endswith('[]') else values[0]
+					 for name, values in params.items() if name not in ('start', 'maxResult') }
+		criteria.setdefault('q', '')
+		return { 'criteria': criteria,
+				 'totalMatchCount': len(matches),
+				 'matches': [{ 'id': recipe['id'],
+							   'recipeName': recipe['name'],
+							   'rating': recipe.get('rating'),
+							   'totalTimeInSeconds': recipe.get('totalTimeInSeconds'),
+							   'sourceDisplayName': recipe['source'].get('sourceDisplayName') }
+							 for recipe in matches[start:start + max_result]] }
+
+	def get_recipe(self, recipe_id):
+		recipe = self.recipes.get(recipe_id)
+		if recipe is None:
+			return None
+		recipe = dict(recipe)
+		recipe.pop('allowedAllergy', None)
+		return recipe
@@ -0,0 +1,208 @@
+"""
+This module contains the recipe providers get_recipe_info can look recipes up
+from, so that an outage of one recipe source does not take the bot down.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from circuit_breaker import CircuitBreaker
+from circuit_open_error import CircuitOpenError
+from deadline_exceeded_error import DeadlineExceededError
+from no_match_error import NoMatchError
+from recipe_corpus import RecipeCorpus
+from request_error import RequestError
+from transports import YummlyResponse
+from yummly_client import YummlyClient, get_default_client
+
+""" --- Constants ---"""
+SECONDARY_PROVIDER = os.environ.get('RECIPE_BOT_SECONDARY_PROVIDER')
+
+DEFAULT_PROVIDER_MODE = os.environ.get('RECIPE_BOT_PROVIDER_MODE', 'failover')
+
+DEFAULT_RACE_DELAY = float(os.environ.get('RECIPE_BOT_RACE_DELAY_SECONDS', 0.5))
+
+PROVIDER_MODES = ['failover', 'race']
+
+PROVIDER_FAILURES = (RequestError, requests.RequestException)
+
+_default_providers = None
+_default_providers_lock = threading.Lock()
+
+
+"""
+Client answering searches and recipe requests from a fixture corpus in the
+process, with the same interface and response shapes as YummlyClient
+"""
+class CorpusClient:
+	def __init__(self, corpus=None):
+		self.corpus = RecipeCorpus(corpus)
+
+	def search(self, payload, **request_options):
+		params = { name: [str(item) for item in value] if isinstance(value, (list, tuple)) else [str(value)]
+				   for name, value in payload.items() }
+		return YummlyResponse(200, self.corpus.search(params))
+
+	def get_recipe(self, recipe_id, **request_options):
+		recipe = self.corpus.get_recipe(recipe_id)
+		if recipe is None:
+			return YummlyResponse(404)
+		return YummlyResponse(200, recipe)
+
+	def close(self):
+		pass
+
+
+"""
+Ordered set of recipe providers, each a name and a client. A lookup is a
+function sending the whole request to one provider's client, since recipe ids
+only mean something to the provider that returned them. In 'failover' mode
+providers are tried in order until one answers; in 'race' mode the next
+provider is also started whenever the ones running have not answered within
+race_delay seconds or have failed, and the first match wins. No match counts
+as an answer, but in a race it only wins once every provider started before
+it has answered or failed. Each provider has a circuit breaker, so traffic leaves a provider
+after failure_threshold failures in a row and a trial lookup is let back
+through reset_timeout seconds later
+"""
+class RecipeProviders:
+	def __init__(self, providers, mode=DEFAULT_PROVIDER_MODE, race_delay=DEFAULT_RACE_DELAY,
+				 failure_threshold=3, reset_timeout=30, clock=time.monotonic):
+		if mode not in PROVIDER_MODES:
+			raise ValueError('Unknown provider mode ' + mode)
+		self.providers = list(providers)
+		self.mode = mode
+		self.race_delay = race_delay
+		self.breakers = { name: CircuitBreaker(name, failure_threshold, reset_timeout, clock)
+						  for name, client in self.providers }
+		self.counters = { name: { 'lookups': 0, 'failures': 0, 'answers': 0, 'latency': 0.0 }
+						  for name, client in self.providers }
+		self._lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=4 * len(self.providers))
+
+	def _run(self, name, client, lookup):
+		started_at = time.monotonic()
+		try:
+			result = lookup(client)
+		except NoMatchError:
+			self._record(name, time.monotonic() - started_at, True)
+			raise
+		except Exception:
+			self._record(name, time.monotonic() - started_at, False)
+			raise
+		self._record(name, time.monotonic() - started_at, True)
+		return result
+
+	def _record(self, name, latency, answered):
+		if answered:
+			self.breakers[name].record_success()
+		else:
+			self.breakers[name].record_failure()
+		with self._lock:
+			provider_counters = self.counters[name]
+			provider_counters['lookups'] += 1
+			provider_counters['answers' if answered else 'failures'] += 1
+			provider_counters['latency'] += latency
+
+	def _available(self, errors):
+		for name, client in self.providers:
+			try:
+				self.breakers[name].before_request()
+			except CircuitOpenError as open_err:
+				errors.append(open_err)
+				continue
+			yield name, client
+
+	def send(self, lookup):
+		if self.mode == 'race':
+			return self._race(lookup)
+		return self._failover(lookup)
+
+	def _failover(self, lookup):
+		errors = []
+		for name, client in self._available(errors):
+			try:
+				return self._run(name, client, lookup)
+			except DeadlineExceededError:
+				raise
+			except PROVIDER_FAILURES as provider_err:
+				errors.append(provider_err)
+		raise errors[0]
+
+	def _race(self, lookup):
+		errors = []
+		available = self._available(errors)
+		started = []
+		pending = set()
+		def start_next():
+			for name, client in available:
+				future = self._executor.submit(self._run, name, client, lookup)
+				started.append(future)
+				pending.add(future)
+				return True
+			return False
+		start_next()
+		while pending:
+			done, pending = wait(pending, timeout=self.race_delay, return_when=FIRST_COMPLETED)
+			if not done:
+				start_next()
+				continue
+			for future in done:
+				error = future.exception()
+				if error is None:
+					return future.result()
+				if not isinstance(error, NoMatchError):
+					errors.append(error)
+			for future in started:
+				if not future.done():
+					break
+				if isinstance(future.exception(), NoMatchError):
+					raise future.exception()
+			if not pending:
+				start_next()
+		raise errors[0]
+
+	def get_stats(self):
+		with self._lock:
+			return { name: { 'lookups': provider_counters['lookups'],
+							 'answers': provider_counters['answers'],
+							 'failures': provider_counters['failures'],
+							 'mean_latency': (provider_counters['latency'] / provider_counters['lookups']
+											  if provider_counters['lookups'] else None),
+							 'state': self.breakers[name].state }
+					 for name, provider_counters in self.counters.items() }
+
+
+"""
+Method to get the providers configured for this process, or None if only
+Yummly is used. Set RECIPE_BOT_SECONDARY_PROVIDER to 'corpus' to fall back on
+the fixture corpus, or to the base url of a Yummly compatible API, which our
+Yummly credentials are never sent to
+"""
+def get_default_providers():
+	global _default_providers
+	if _default_providers is None and SECONDARY_PROVIDER:
+		with _default_providers_lock:
+			if _default_providers is None:
+				if SECONDARY_PROVIDER == 'corpus':
+					secondary_client = CorpusClient()
+				else:
+					base_url = SECONDARY_PROVIDER.rstrip('/')
+					secondary_client = YummlyClient(headers={},
+													search_url=base_url + '/v1/api/recipes',
+													get_url=base_url + '/v1/api/recipe/')
+				_default_providers = RecipeProviders([('yummly', get_default_client()),
+													  ('secondary', secondary_client)])
+	return _default_providers
+
+"""
+Method to replace the providers used by get_recipe_info
+"""
+def set_default_providers(providers):
+	global _default_providers
+	with _default_providers_lock:
+		previous_providers = _default_providers
+		_default_providers = providers
+	return previous_providers
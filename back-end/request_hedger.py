@@ -0,0 +1,121 @@
+"""
+This module contains the request hedger used to cut the tail latency of
+requests to the Yummly API by racing a duplicate against slow requests.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from request_error import RequestError
+
+""" --- Constants ---"""
+DEFAULT_MAX_EXTRA_LOAD = 0.05
+
+DEFAULT_LATENCY_WINDOW = 200
+
+MIN_LATENCY_SAMPLES = 20
+
+
+"""
+Hedger for requests to one client: if a request has not answered after the
+hedge delay, a duplicate is sent and whichever answers first is used, the
+other being left to finish in the background and ignored. The delay is either
+fixed or, once enough requests have been seen, the given percentile of recent
+latencies for the endpoint. Hedges are paid for from a budget that grows by
+max_extra_load for every request, so they never add more than that fraction of
+extra load on Yummly. Given acquire_hedge, it is called before a duplicate is
+sent, e.g. to count it against a quota, and no duplicate is sent if it raises
+a RequestError.
+"""
+class RequestHedger:
+	def __init__(self, delay=None, percentile=None, max_extra_load=DEFAULT_MAX_EXTRA_LOAD,
+				 max_workers=20, latency_window=DEFAULT_LATENCY_WINDOW):
+		self.delay = delay
+		self.percentile = percentile
+		self.max_extra_load = max_extra_load
+		self.latency_window = latency_window
+		self.counters = {}
+		self._latencies = {}
+		self._budget = 0.0
+		self._lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+	def _count(self, endpoint, counter):
+		endpoint_counters = self.counters.setdefault(endpoint, { 'requests': 0, 'hedged': 0,
+																 'hedge_wins': 0 })
+		endpoint_counters[counter] += 1
+
+	def get_hedge_delay(self, endpoint):
+		with self._lock:
+			latencies = sorted(self._latencies.get(endpoint, ()))
+		if self.percentile is not None and len(latencies) >= MIN_LATENCY_SAMPLES:
+			index = min(int(len(latencies) * self.percentile / 100), len(latencies) - 1)
+			return latencies[index]
+		return self.delay
+
+	def _record_latency(self, endpoint, latency):
+		with self._lock:
+			latencies = self._latencies.setdefault(endpoint, deque(maxlen=self.latency_window))
+			latencies.append(latency)
+
+	def _take_hedge_budget(self, acquire_hedge=None):
+		with self._lock:
+			if self._budget < 1:
+				return False
+			self._budget -= 1
+		if acquire_hedge is None:
+			return True
+		try:
+			acquire_hedge()
+		except RequestError:
+			with self._lock:
+				self._budget += 1
+			return False
+		return True
+
+	def _timed(self, send_request):
+		started_at = time.monotonic()
+		response = send_request()
+		return response, time.monotonic() - started_at
+
+	def send(self, endpoint, send_request, acquire_hedge=None):
+		with self._lock:
+			self._count(endpoint, 'requests')
+			self._budget = min(self._budget + self.max_extra_load, 1 + self.max_extra_load)
+		hedge_delay = self.get_hedge_delay(endpoint)
+		if hedge_delay is None:
+			response, latency = self._timed(send_request)
+			self._record_latency(endpoint, latency)
+			return response
+		primary = self._executor.submit(self._timed, send_request)
+		done, _ = wait([primary], timeout=hedge_delay)
+		if done or not self._take_hedge_budget(acquire_hedge):
+			response, latency = primary.result()
+			self._record_latency(endpoint, latency)
+			return response
+		hedge = self._executor.submit(self._timed, send_request)
+		with self._lock:
+			self._count(endpoint, 'hedged')
+		pending = [primary, hedge]
+		winner = None
+		while pending and winner is None:
+			done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+			for future in (primary, hedge):
+				if future in done and future.exception() is None:
+					winner = future
+					break
+			pending = list(not_done)
+		if winner is None:
+			return primary.result()[0]
+		if winner is hedge:
+			with self._lock:
+				self._count(endpoint, 'hedge_wins')
+		response, latency = winner.result()
+		self._record_latency(endpoint, latency)
+		return response
+
+	def get_stats(self):
+		with self._lock:
+			return { endpoint: dict(endpoint_counters)
+					 for endpoint, endpoint_counters in self.counters.items() }
@@ -0,0 +1,15 @@
+"""
+Custom exception for lower priority requests to the Yummly API dropped by the
+scheduler while it is under pressure
+"""
+from request_error import RequestError
+
+class RequestRejectedError(RequestError):
+	def __init__(self, priority, queue_depth):
+		RequestError.__init__(self, None)
+		self.priority = priority
+		self.queue_depth = queue_depth
+
+	def message(self):
+		return ('Dropped ' + self.priority + ' request to Yummly with '
+				+ str(self.queue_depth) + ' requests already waiting')
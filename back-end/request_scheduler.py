@@ -0,0 +1,106 @@
+"""
+This module contains the scheduler deciding which requests to the Yummly API
+may use a connection when more are waiting than there are connections.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from deadline_exceeded_error import DeadlineExceededError
+from request_rejected_error import RequestRejectedError
+
+""" --- Constants ---"""
+PRIORITIES = ['interactive', 'speculative', 'background']
+
+DEFAULT_CLASS_SHARES = {
+	'interactive': 1.0,
+	'speculative': 0.75,
+	'background': 0.5,
+}
+
+DEFAULT_MAX_QUEUE_DEPTHS = {
+	'interactive': None,
+	'speculative': 10,
+	'background': 100,
+}
+
+
+"""
+Priority scheduler for up to max_concurrent requests in flight. Waiting
+requests start in priority order, interactive first, then by arrival. Lower
+classes are throttled by only being allowed to start while fewer than their
+share of max_concurrent requests are in flight, which keeps room free for
+interactive requests, and are dropped with RequestRejectedError when their
+queue is full. Waiting is bounded by the request's deadline, if given
+"""
+class RequestScheduler:
+	def __init__(self, max_concurrent, class_shares=DEFAULT_CLASS_SHARES,
+				 max_queue_depths=DEFAULT_MAX_QUEUE_DEPTHS, clock=time.monotonic):
+		self.max_concurrent = max_concurrent
+		self.class_limits = { priority: max(int(max_concurrent * share), 1)
+							  for priority, share in class_shares.items() }
+		self.max_queue_depths = max_queue_depths
+		self.clock = clock
+		self.in_flight = 0
+		self.stats = { priority: { 'queue_depth': 0, 'max_queue_depth': 0, 'admitted': 0,
+								   'dropped': 0, 'total_wait': 0.0 }
+					   for priority in PRIORITIES }
+		self._waiting = []
+		self._sequence = itertools.count()
+		self._condition = threading.Condition()
+
+	def _can_start(self, priority):
+		return self.in_flight < self.class_limits[priority]
+
+	def _admit(self, priority, started_at):
+		self.in_flight += 1
+		class_stats = self.stats[priority]
+		class_stats['admitted'] += 1
+		class_stats['total_wait'] += self.clock() - started_at
+
+	def acquire(self, priority='interactive', deadline=None):
+		with self._condition:
+			started_at = self.clock()
+			class_stats = self.stats[priority]
+			if not self._waiting and self._can_start(priority):
+				self._admit(priority, started_at)
+				return
+			max_queue_depth = self.max_queue_depths.get(priority)
+			if max_queue_depth is not None and class_stats['queue_depth'] >= max_queue_depth:
+				class_stats['dropped'] += 1
+				raise RequestRejectedError(priority, class_stats['queue_depth'])
+			ticket = [PRIORITIES.index(priority), next(self._sequence)]
+			heapq.heappush(self._waiting, ticket)
+			class_stats['queue_depth'] += 1
+			class_stats['max_queue_depth'] = max(class_stats['max_queue_depth'],
+												 class_stats['queue_depth'])
+			try:
+				while not (self._waiting[0] is ticket and self._can_start(priority)):
+					if deadline is not None and deadline.expired():
+						raise DeadlineExceededError(deadline.budget)
+					self._condition.wait(deadline.remaining() if deadline else None)
+			except BaseException:
+				self._waiting.remove(ticket)
+				heapq.heapify(self._waiting)
+				class_stats['queue_depth'] -= 1
+				self._condition.notify_all()
+				raise
+			heapq.heappop(self._waiting)
+			class_stats['queue_depth'] -= 1
+			self._admit(priority, started_at)
+			self._condition.notify_all()
+
+	def release(self):
+		with self._condition:
+			self.in_flight -= 1
+			self._condition.notify_all()
+
+	def get_stats(self):
+		with self._condition:
+			stats = {}
+			for priority, class_stats in self.stats.items():
+				stats[priority] = dict(class_stats)
+				admitted = class_stats['admitted']
+				stats[priority]['mean_wait'] = class_stats['total_wait'] / admitted if admitted else 0.0
+			return stats
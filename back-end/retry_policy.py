@@ -0,0 +1,41 @@
+"""
+This module contains the retry policies applied to requests to the Yummly API.
+"""
+
+import random
+
+"""
+Policy for retrying one kind of failure: waits are drawn uniformly between 0 and
+an exponentially growing cap ("full jitter"), so that retries from many
+containers do not hit Yummly in lockstep
+"""
+class RetryPolicy:
+	def __init__(self, max_retries, base_delay, max_delay, multiplier=2):
+		self.max_retries = max_retries
+		self.base_delay = base_delay
+		self.max_delay = max_delay
+		self.multiplier = multiplier
+
+	def get_delay(self, retry_number):
+		cap = min(self.max_delay, self.base_delay * self.multiplier ** (retry_number - 1))
+		return random.uniform(0, cap)
+
+
+""" --- Constants ---"""
+DEFAULT_RETRY_POLICIES = {
+	'server error': RetryPolicy(max_retries=2, base_delay=0.1, max_delay=1),
+	'rate limit': RetryPolicy(max_retries=1, base_delay=1, max_delay=2),
+	'connection error': RetryPolicy(max_retries=2, base_delay=0.05, max_delay=0.5),
+}
+
+
+"""
+Method to get the kind of failure a response status code represents, or None
+if the request should not be retried
+"""
+def classify_status(status_code):
+	if status_code >= 500:
+		return 'server error'
+	elif status_code == 409:
+		return 'rate limit'
+	return None
@@ -0,0 +1,153 @@
+"""
+This module contains the shadow traffic mode used to compare the Yummly API
+with an alternative recipe backend under live load, without the alternative
+backend's answers or latency ever reaching users.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from yummly_client import YummlyClient
+
+""" --- Constants ---"""
+SHADOW_BASE_URL = os.environ.get('YUMMLY_SHADOW_BASE_URL')
+
+DEFAULT_SAMPLE_RATE = float(os.environ.get('YUMMLY_SHADOW_SAMPLE_RATE', 0.05))
+
+DEFAULT_METRICS_PATH = os.environ.get('YUMMLY_SHADOW_METRICS_PATH',
+									  '/tmp/yummly_shadow_metrics.jsonl')
+
+DEFAULT_MAX_IN_FLIGHT = 4
+
+_default_shadow = None
+_default_shadow_lock = threading.Lock()
+
+
+"""
+Method to describe the outcome of one backend's attempt at a request
+"""
+def get_outcome(latency, details=None, error=None):
+	outcome = { 'latency': round(latency, 4), 'error': None, 'recipe_url': None }
+	if error is not None:
+		outcome['error'] = type(error).__name__
+	elif details is not None:
+		outcome['recipe_url'] = details.get('recipe_url')
+	return outcome
+
+
+"""
+Shadow traffic for one secondary backend: a sample_rate fraction of the
+requests observed are sent again to the secondary client from a background
+thread once the primary has answered, so users never wait for it. Each
+comparison is appended to the metrics file as one JSON object per line with
+the latency, error and recipe url of both backends and whether they agree.
+Shadow requests are dropped rather than queued once max_in_flight are running
+"""
+class ShadowTraffic:
+	def __init__(self, secondary_client, sample_rate=DEFAULT_SAMPLE_RATE,
+				 metrics_path=DEFAULT_METRICS_PATH, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+				 rng=None):
+		self.secondary_client = secondary_client
+		self.sample_rate = sample_rate
+		self.metrics_path = metrics_path
+		self.max_in_flight = max_in_flight
+		self.counters = { 'sampled': 0, 'dropped': 0, 'compared': 0 }
+		self._random = rng or random.Random()
+		self._in_flight = 0
+		self._lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+	def _take_slot(self):
+		with self._lock:
+			if self._random.random() >= self.sample_rate:
+				return False
+			self.counters['sampled'] += 1
+			if self._in_flight >= self.max_in_flight:
+				self.counters['dropped'] += 1
+				return False
+			self._in_flight += 1
+			return True
+
+	def observe(self, search_term, send_request, primary_outcome):
+		if not self._take_slot():
+			return None
+		return self._executor.submit(self._compare, search_term, send_request, primary_outcome)
+
+	def _compare(self, search_term, send_request, primary_outcome):
+		started_at = time.monotonic()
+		details, error = None, None
+		try:
+			details = send_request(self.secondary_client)
+		except Exception as err:
+			error = err
+		secondary_outcome = get_outcome(time.monotonic() - started_at, details, error)
+		comparison = { 'time': time.time(),
+					   'search_term': search_term,
+					   'primary': primary_outcome,
+					   'secondary': secondary_outcome,
+					   'agree': (primary_outcome['recipe_url'] == secondary_outcome['recipe_url']
+								 and primary_outcome['error'] == secondary_outcome['error']) }
+		line = json.dumps(comparison, separators=(',', ':')) + '\n'
+		with self._lock:
+			try:
+				with open(self.metrics_path, 'a') as metrics_file:
+					metrics_file.write(line)
+				self.counters['compared'] += 1
+			finally:
+				self._in_flight -= 1
+		return comparison
+
+	def get_stats(self):
+		with self._lock:
+			return dict(self.counters)
+
+
+"""
+Method to sum up a metrics file: for each backend the number of requests,
+error rate and median and 95th percentile latency of the requests that did not
+fail, and the fraction of requests both backends agreed on
+"""
+def summarize_metrics(metrics_path=DEFAULT_METRICS_PATH):
+	with open(metrics_path) as metrics_file:
+		comparisons = [json.loads(line) for line in metrics_file if line.strip()]
+	summary = { 'requests': len(comparisons),
+				'agreement_rate': (sum(comparison['agree'] for comparison in comparisons)
+								   / len(comparisons)) if comparisons else None }
+	for backend in ('primary', 'secondary'):
+		outcomes = [comparison[backend] for comparison in comparisons]
+		latencies = sorted(outcome['latency'] for outcome in outcomes if outcome['error'] is None)
+		errors = sum(outcome['error'] is not None for outcome in outcomes)
+		summary[backend] = { 'error_rate': errors / len(outcomes) if outcomes else None,
+							 'p50_latency': latencies[int(len(latencies) * 0.5)] if latencies else None,
+							 'p95_latency': latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+											if latencies else None }
+	return summary
+
+"""
+Method to get the shadow traffic configured for this process, or None if
+YUMMLY_SHADOW_BASE_URL is not set, creating it on first use; our Yummly
+credentials are never sent to the shadow backend
+"""
+def get_default_shadow():
+	global _default_shadow
+	if _default_shadow is None and SHADOW_BASE_URL:
+		with _default_shadow_lock:
+			if _default_shadow is None:
+				base_url = SHADOW_BASE_URL.rstrip('/')
+				secondary_client = YummlyClient(headers={}, search_url=base_url + '/v1/api/recipes',
+												get_url=base_url + '/v1/api/recipe/')
+				_default_shadow = ShadowTraffic(secondary_client)
+	return _default_shadow
+
+"""
+Method to replace the shadow traffic used by get_recipe_info
+"""
+def set_default_shadow(shadow):
+	global _default_shadow
+	with _default_shadow_lock:
+		previous_shadow = _default_shadow
+		_default_shadow = shadow
+	return previous_shadow
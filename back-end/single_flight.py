@@ -0,0 +1,62 @@
+"""
+This module contains the single-flight groups used to coalesce identical
+requests to the Yummly API that are in flight at the same time.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+"""
+Single-flight group for threaded callers: the first caller for a key runs the
+request and callers arriving while it is in flight wait for it and share its
+result or exception. Once it completes, the next caller starts a new request
+"""
+class SingleFlight:
+	def __init__(self):
+		self.shared_count = 0
+		self._calls = {}
+		self._lock = threading.Lock()
+
+	def do(self, key, function, timeout=None):
+		with self._lock:
+			future = self._calls.get(key)
+			is_owner = future is None
+			if is_owner:
+				future = self._calls[key] = Future()
+			else:
+				self.shared_count += 1
+		if is_owner:
+			try:
+				future.set_result(function())
+			except Exception as err:
+				future.set_exception(err)
+			finally:
+				with self._lock:
+					del self._calls[key]
+		return future.result(timeout)
+
+
+"""
+Single-flight group for coroutines on one event loop: the request runs as a
+task that callers await through a shield, so a caller being cancelled does not
+cancel the request for the others
+"""
+class AsyncSingleFlight:
+	def __init__(self):
+		self.shared_count = 0
+		self._calls = {}
+
+	def _forget(self, key, task):
+		if self._calls.get(key) is task:
+			del self._calls[key]
+
+	async def do(self, key, make_coroutine, timeout=None):
+		task = self._calls.get(key)
+		if task is None:
+			task = asyncio.ensure_future(make_coroutine())
+			self._calls[key] = task
+			task.add_done_callback(lambda done_task: self._forget(key, done_task))
+		else:
+			self.shared_count += 1
+		return await asyncio.wait_for(asyncio.shield(task), timeout)
@@ -0,0 +1,11 @@
+"""
+Custom exception for cache snapshots that cannot be restored because they are
+truncated, corrupted or written in another format
+"""
+class SnapshotError(Exception):
+	def __init__(self, path, reason):
+		self.path = path
+		self.reason = reason
+
+	def message(self):
+		return 'Could not restore the cache snapshot ' + self.path + ': ' + self.reason
@@ -0,0 +1,211 @@
+"""
+This module contains the persistent cache shared by the worker processes and
+batch jobs running on one machine, so that a document fetched by one of them
+does not have to be fetched again by the others.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+""" --- Constants ---"""
+SHARED_CACHE_PATH = os.environ.get('YUMMLY_SHARED_CACHE_PATH')
+
+SHARED_CACHE_BYTES = int(os.environ.get('YUMMLY_SHARED_CACHE_BYTES', 64 * 1024 * 1024))
+
+SCHEMA_VERSION = 2
+
+BUSY_TIMEOUT = 5
+
+VACUUM_RATIO = 0.9
+
+SIZE_CHECK_INTERVAL = 100
+
+
+"""
+Method to get the text a cache key is stored under, the same in every process
+"""
+def get_stored_key(key):
+	return json.dumps(key, separators=(',', ':'))
+
+
+"""
+Cache with the same interface as TinyLfuCache, keeping JSON documents in a
+SQLite database in WAL mode, so that any number of processes can read it while
+one of them writes. Each process, and each thread in it, opens its own
+connection. Entries are stored under a namespace, e.g. 'recipe' or 'search',
+so that one database can back several caches, and expire ttl seconds after
+being stored, if given, or after the ttl they are put with, as measured by the
+wall clock shared by the processes.
+Each cache keeps a running total of the bytes stored, measured again once it
+passes max_bytes or every SIZE_CHECK_INTERVAL puts, since other processes
+write to the database too. Once the documents stored take more than max_bytes,
+expired entries and then the oldest ones are deleted until they take less than VACUUM_RATIO of it, and
+the pages they freed are given back to the file system. A database written with
+another SCHEMA_VERSION is emptied and recreated. Errors from SQLite, such as
+the database staying locked for more than BUSY_TIMEOUT seconds, are counted
+and treated as misses instead of failing the request
+"""
+class SqliteCache:
+	def __init__(self, path, namespace='default', ttl=None, max_bytes=SHARED_CACHE_BYTES,
+				 clock=time.time):
+		self.path = path
+		self.namespace = namespace
+		self.ttl = ttl
+		self.max_bytes = max_bytes
+		self.clock = clock
+		self.counters = { 'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'errors': 0 }
+		self._local = threading.local()
+		self._counters_lock = threading.Lock()
+		self._bytes_estimate = None
+		self._puts_since_check = 0
+		self._create_schema()
+
+	def _connect(self):
+		connection = getattr(self._local, 'connection', None)
+		if connection is None:
+			connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+			connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+			connection.execute('PRAGMA journal_mode=WAL')
+			connection.execute('PRAGMA synchronous=NORMAL')
+			self._local.connection = connection
+		return connection
+
+	def _create_schema(self):
+		connection = self._connect()
+		connection.execute('BEGIN IMMEDIATE')
+		try:
+			connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+			row = connection.execute("SELECT value FROM meta WHERE name = 'schema_version'").fetchone()
+			if row is not None and row[0] != SCHEMA_VERSION:
+				connection.execute('DROP TABLE IF EXISTS entries')
+			connection.execute('CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, '
+							   'value TEXT, size INTEGER, stored_at REAL, expires_at REAL, '
+							   'PRIMARY KEY (namespace, key))')
+			connection.execute('CREATE INDEX IF NOT EXISTS entries_by_age ON entries (stored_at)')
+			connection.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)",
+							   (SCHEMA_VERSION,))
+			connection.execute('COMMIT')
+		except BaseException:
+			connection.execute('ROLLBACK')
+			raise
+
+	def _count(self, counter, amount=1):
+		with self._counters_lock:
+			self.counters[counter] += amount
+
+	def get(self, key):
+		return self.get_with_ttl(key)[0]
+
+	def get_with_ttl(self, key):
+		try:
+			row = self._connect().execute('SELECT value, expires_at FROM entries '
+										  'WHERE namespace = ? AND key = ?',
+										  (self.namespace, get_stored_key(key))).fetchone()
+		except sqlite3.Error:
+			self._count('errors')
+			return None, None
+		if row is None:
+			self._count('misses')
+			return None, None
+		value, expires_at = row
+		now = self.clock()
+		if expires_at is not None and expires_at <= now:
+			self._count('expirations')
+			self._count('misses')
+			self.delete(key)
+			return None, None
+		self._count('hits')
+		return json.loads(value), expires_at - now if expires_at is not None else None
+
+	def put(self, key, value, ttl=None):
+		document = json.dumps(value, separators=(',', ':'))
+		size = len(document.encode('utf-8'))
+		if self.max_bytes is not None and size > self.max_bytes:
+			return
+		ttl = ttl if ttl is not None else self.ttl
+		now = self.clock()
+		expires_at = now + ttl if ttl is not None else None
+		try:
+			connection = self._connect()
+			connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+							   (self.namespace, get_stored_key(key), document, size, now, expires_at))
+			if self.max_bytes is not None and self._is_over_size(connection, size):
+				self._vacuum(connection)
+		except sqlite3.Error:
+			self._count('errors')
+
+	def _get_bytes(self, connection):
+		return connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+	def _is_over_size(self, connection, size):
+		with self._counters_lock:
+			self._puts_since_check += 1
+			if self._bytes_estimate is not None:
+				self._bytes_estimate += size
+				if (self._bytes_estimate <= self.max_bytes
+						and self._puts_since_check < SIZE_CHECK_INTERVAL):
+					return False
+			self._puts_since_check = 0
+		total = self._get_bytes(connection)
+		with self._counters_lock:
+			self._bytes_estimate = total
+		return total > self.max_bytes
+
+	def _vacuum(self, connection):
+		target = self.max_bytes * VACUUM_RATIO
+		connection.execute('BEGIN IMMEDIATE')
+		try:
+			expired = connection.execute('DELETE FROM entries WHERE expires_at <= ?',
+										 (self.clock(),)).rowcount
+			evicted = 0
+			total = self._get_bytes(connection)
+			for namespace, key, size in connection.execute('SELECT namespace, key, size FROM entries '
+														   'ORDER BY stored_at').fetchall():
+				if total <= target:
+					break
+				connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?',
+								   (namespace, key))
+				total -= size
+				evicted += 1
+			connection.execute('COMMIT')
+		except BaseException:
+			connection.execute('ROLLBACK')
+			raise
+		with self._counters_lock:
+			self._bytes_estimate = total
+		self._count('expirations', expired)
+		self._count('evictions', evicted)
+		connection.execute('PRAGMA incremental_vacuum')
+
+	def delete(self, key):
+		try:
+			self._connect().execute('DELETE FROM entries WHERE namespace = ? AND key = ?',
+									(self.namespace, get_stored_key(key)))
+		except sqlite3.Error:
+			self._count('errors')
+
+	def clear(self):
+		self._connect().execute('DELETE FROM entries WHERE namespace = ?', (self.namespace,))
+
+	def __len__(self):
+		return self._connect().execute('SELECT COUNT(*) FROM entries WHERE namespace = ?',
+									   (self.namespace,)).fetchone()[0]
+
+	def get_stats(self):
+		with self._counters_lock:
+			stats = dict(self.counters)
+		requests = stats['hits'] + stats['misses']
+		stats['hit_rate'] = stats['hits'] / requests if requests else 0.0
+		stats['entries'], stats['bytes'] = self._connect().execute(
+			'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?',
+			(self.namespace,)).fetchone()
+		return stats
+
+	def close(self):
+		connection = getattr(self._local, 'connection', None)
+		if connection is not None:
+			connection.close()
+			self._local.connection = None
@@ -0,0 +1,23 @@
+"""
+This module contains the fakes shared by the test suites.
+"""
+from unittest.mock import Mock
+
+"""
+Clock that only moves when told to
+"""
+class FakeClock:
+	def __init__(self, now=100):
+		self.now = now
+
+	def __call__(self):
+		return self.now
+
+
+"""
+Method to build a mocked response like the ones the Yummly client returns
+"""
+def mocked_response(status_code, json_data=None, headers=None):
+	response = Mock(status_code=status_code, headers=headers or {})
+	response.json.return_value = json_data
+	return response
@@ -0,0 +1,130 @@
+"""
+This is the test suite for adapting the number of requests in flight to how
+the Yummly API is coping.
+"""
+import threading
+import unittest
+from unittest import mock
+import requests
+from adaptive_limiter import AdaptiveLimiter
+from concurrency_limit_error import ConcurrencyLimitError
+from deadline import Deadline
+from deadline_exceeded_error import DeadlineExceededError
+from request_error import RequestError
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+"""
+Test methods related to the adaptive limiter
+"""
+class TestAdaptiveLimiter(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+
+	def fill(self, limiter):
+		for _ in range(limiter.get_limit()):
+			limiter.acquire()
+
+	# Test that the limit grows while latency is stable
+	def test_additive_increase(self):
+		limiter = AdaptiveLimiter(initial_limit=4, clock=self.clock)
+		for _ in range(4):
+			self.fill(limiter)
+			for _ in range(limiter.get_limit()):
+				limiter.release(0.1)
+		self.assertTrue(5 <= limiter.get_limit() <= 8)
+		self.assertEqual(0, limiter.get_stats()['decreases'])
+
+	# Test that the limit does not grow while it is not in use
+	def test_no_increase_when_idle(self):
+		limiter = AdaptiveLimiter(initial_limit=10, clock=self.clock)
+		for _ in range(50):
+			limiter.acquire()
+			limiter.release(0.1)
+		self.assertEqual(10, limiter.get_limit())
+
+	# Test that the limit is cut on 5xx responses and timeouts, once per round trip
+	def test_multiplicative_decrease(self):
+		limiter = AdaptiveLimiter(initial_limit=16, clock=self.clock)
+		self.fill(limiter)
+		limiter.release(0.1, 'server error')
+		limiter.release(0.1, 'connection error')
+		self.assertEqual(8, limiter.get_limit())
+		self.clock.now += 1
+		limiter.release(0.1, 'connection error')
+		self.assertEqual(4, limiter.get_limit())
+		self.assertEqual(2, limiter.get_stats()['decreases'])
+
+	# Test that the limit is cut when latency rises
+	def test_decrease_on_rising_latency(self):
+		limiter = AdaptiveLimiter(initial_limit=8, clock=self.clock)
+		self.fill(limiter)
+		for _ in range(4):
+			limiter.release(0.1)
+		for _ in range(4):
+			limiter.release(1)
+		self.assertTrue(limiter.get_limit() < 8)
+
+	# Test that the limit never leaves its bounds
+	def test_bounds(self):
+		limiter = AdaptiveLimiter(initial_limit=2, min_limit=2, max_limit=3, clock=self.clock)
+		self.fill(limiter)
+		limiter.release(0.1, 'server error')
+		limiter.release(0.1)
+		self.assertEqual(2, limiter.get_limit())
+		for _ in range(20):
+			self.fill(limiter)
+			for _ in range(limiter.get_limit()):
+				limiter.release(0.1)
+		self.assertEqual(3, limiter.get_limit())
+
+	# Test that requests over the limit are shed and counted
+	def test_rejection(self):
+		limiter = AdaptiveLimiter(initial_limit=1, max_wait=0)
+		limiter.acquire()
+		with self.assertRaises(ConcurrencyLimitError) as context:
+			limiter.acquire()
+		self.assertIsInstance(context.exception, RequestError)
+		self.assertEqual({ 'admitted': 1, 'rejected': 1, 'limit': 1, 'in_flight': 1 },
+						 { name: value for name, value in limiter.get_stats().items()
+						   if name in ('admitted', 'rejected', 'limit', 'in_flight') })
+		self.assertRaises(DeadlineExceededError, AdaptiveLimiter(initial_limit=0, min_limit=0).acquire,
+						  Deadline(0))
+
+	# Test that a waiting request starts when another is released
+	def test_wait_for_room(self):
+		limiter = AdaptiveLimiter(initial_limit=1, max_wait=5)
+		limiter.acquire()
+		thread = threading.Thread(target=limiter.acquire)
+		thread.start()
+		limiter.release()
+		thread.join()
+		self.assertEqual(1, limiter.in_flight)
+
+	# Test that the client reports its attempts to the limiter
+	def test_client_uses_limiter(self):
+		limiter = AdaptiveLimiter(initial_limit=4)
+		client = YummlyClient(limiter=limiter, retry_policies={ 'search': {}, 'recipe': {} })
+		with mock.patch.object(client.transport.session, 'get', return_value=mock.Mock(status_code=500)):
+			client.get_recipe('a')
+		with mock.patch.object(client.transport.session, 'get', side_effect=requests.Timeout()):
+			self.assertRaises(requests.Timeout, client.get_recipe, 'b')
+		stats = limiter.get_stats()
+		self.assertEqual(0, stats['in_flight'])
+		self.assertEqual(2, stats['admitted'])
+		self.assertTrue(stats['limit'] <= 2)
+
+	# Test that the time spent waiting for the limiter is taken off the request's timeout
+	def test_client_timeout_after_wait(self):
+		limiter = AdaptiveLimiter(initial_limit=1, max_wait=1)
+		client = YummlyClient(limiter=limiter, retry_policies={ 'search': {}, 'recipe': {} })
+		limiter.acquire()
+		threading.Timer(0.3, limiter.release).start()
+		with mock.patch.object(client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=404)) as mock_get:
+			client.get_recipe('a', deadline=Deadline(0.5))
+		self.assertTrue(mock_get.call_args[1]['timeout'] <= 0.21)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -6,6 +6,14 @@ from unittest import mock
 from api_functions import get_recipe_info
 from request_error import RequestError
 from no_match_error import NoMatchError
+from yummly_client import YummlyClient, set_default_client
+
+"""
+Start from a fresh shared client so circuit breaker state left by other test
+modules does not leak into these tests
+"""
+def setUpModule():
+	set_default_client(YummlyClient())
 
 """
 Mock for requests.get
@@ -364,8 +372,8 @@ def mocked_requests_get(*args, **kwargs):
 """
 Test the wrapper method for retreiving info from the API
 """
-#Patch requests.get to mock API call
-@mock.patch('api_functions.requests.get', side_effect=mocked_requests_get)
+#Patch the pooled session's get to mock API call
+@mock.patch('yummly_client.requests.Session.get', side_effect=mocked_requests_get)
 class TestAPIWrapper(unittest.TestCase):
 
 	def setUp(self):
@@ -478,8 +486,8 @@ class TestAPIWrapper(unittest.TestCase):
 """
 Test that the wrapper method for retreiving info from the API raises exceptions
 """
-#Patch requests.get to mock API call
-@mock.patch('api_functions.requests.get', side_effect=mocked_requests_get)
+#Patch the pooled session's get to mock API call
+@mock.patch('yummly_client.requests.Session.get', side_effect=mocked_requests_get)
 class TestAPIWrapperExceptions(unittest.TestCase):
 
 	def setUp(self):
@@ -0,0 +1,119 @@
+"""
+This is the test suite for the asyncio versions of the Yummly API methods.
+"""
+import asyncio
+import unittest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from async_api_functions import get_recipe_info_async
+from async_yummly_client import AsyncYummlyClient, to_query_params
+from request_error import RequestError
+from no_match_error import NoMatchError
+
+MOCK_RECIPE_DATA = { 'name': 'Easy French Onion Soup',
+					 'numberOfServings': 4,
+					 'ingredientLines': ['3 tbsps butter', '1 package McCormick® Au Jus Gravy Mix'],
+					 'source': { 'sourceRecipeUrl': 'https://www.mccormick.com/recipes/soups-stews/easy-french-onion-soup' } }
+
+"""
+Handler standing in for the Yummly search endpoint
+"""
+async def mocked_search(request):
+	search_term = request.query['q']
+	if search_term == 'butterbeer':
+		return web.Response(status=500)
+	if search_term == 'hamster food':
+		return web.json_response({ 'criteria': { 'q': search_term, 'excludedIngredient': None },
+								   'matches': [] })
+	return web.json_response({ 'criteria': { 'q': search_term },
+							   'matches': [{ 'id': 'Easy-French-Onion-Soup-2038937',
+											 'allergies': request.query.getall('allowedAllergy[]', []) }] })
+
+"""
+Handler standing in for the Yummly recipe endpoint
+"""
+async def mocked_recipe(request):
+	return web.json_response(MOCK_RECIPE_DATA)
+
+"""
+Method to run a coroutine against a local server standing in for Yummly
+"""
+def run_against_mock_api(coroutine_function):
+	async def run():
+		app = web.Application()
+		app.router.add_get('/v1/api/recipes', mocked_search)
+		app.router.add_get('/v1/api/recipe/{recipe_id}', mocked_recipe)
+		server = TestServer(app)
+		await server.start_server()
+		base_url = str(server.make_url('/v1/api/'))
+		client = AsyncYummlyClient(pool_size=4, search_url=base_url + 'recipes',
+								   get_url=base_url + 'recipe/')
+		try:
+			return await coroutine_function(client)
+		finally:
+			await client.close()
+			await server.close()
+	return asyncio.run(run())
+
+
+"""
+Test the asyncio wrapper method for retrieving info from the API
+"""
+class TestAsyncAPIWrapper(unittest.TestCase):
+
+	# Test a simple search with scaling
+	def test_api_wrapper_async(self):
+		expected_recipe_info = { 'name': 'Easy French Onion Soup',
+								 'scaled_ingredients': [ '6.0 tbsps butter',
+														 '2.0 package McCormick® Au Jus Gravy Mix' ],
+								 'recipe_url': 'https://www.mccormick.com/recipes/soups-stews/easy-french-onion-soup' }
+		recipe_info = run_against_mock_api(
+			lambda client: get_recipe_info_async('onion soup', 8, client=client))
+		self.assertEqual(expected_recipe_info, recipe_info)
+
+	# Test many concurrent lookups sharing one loop and one client
+	def test_concurrent_lookups(self):
+		async def lookups(client):
+			return await asyncio.gather(*[
+				get_recipe_info_async('onion soup', 4, client=client, allergy=['Gluten-Free'])
+				for _ in range(50)])
+		results = run_against_mock_api(lookups)
+		self.assertEqual(50, len(results))
+		self.assertTrue(all(result == results[0] for result in results))
+
+	# Test that RequestError is raised if an error is returned for the search
+	def test_requesterror_search(self):
+		with self.assertRaises(RequestError):
+			run_against_mock_api(lambda client: get_recipe_info_async('butterbeer', 4, client=client))
+
+	# Test that NoMatchError is raised if no matches are returned for the search
+	def test_nomatcherror_search(self):
+		with self.assertRaises(NoMatchError):
+			run_against_mock_api(lambda client: get_recipe_info_async('hamster food', 4, client=client))
+
+	# Test that the session of a previous event loop is closed when the client moves loops
+	def test_session_closed_on_new_loop(self):
+		client = AsyncYummlyClient()
+		first_session = asyncio.run(client._get_session())
+		second_session = asyncio.run(client._get_session())
+		self.assertIsNot(first_session, second_session)
+		self.assertTrue(first_session.closed)
+		self.assertFalse(second_session.closed)
+		asyncio.run(client.close())
+
+
+"""
+Test methods related to building query parameters for the asyncio client
+"""
+class TestQueryParams(unittest.TestCase):
+
+	# Test that list values are repeated like requests does
+	def test_list_parameters(self):
+		payload = { 'q': 'onion soup', 'allowedAllergy[]': ['Gluten-Free', 'Seafood-Free'] }
+		expected_params = [ ('q', 'onion soup'),
+							('allowedAllergy[]', 'Gluten-Free'),
+							('allowedAllergy[]', 'Seafood-Free') ]
+		self.assertEqual(expected_params, to_query_params(payload))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,117 @@
+"""
+This is the test suite for resolving many recipe requests in one batch.
+"""
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+from batch_api_functions import BatchClient, get_recipe_info_many
+import requests
+from circuit_open_error import CircuitOpenError
+from quota_exhausted_error import QuotaExhaustedError
+from request_error import RequestError
+from no_match_error import NoMatchError
+from fakes import mocked_response
+
+"""
+Fake client counting the requests it receives; searches for 'slow' dishes
+take longer to answer
+"""
+class FakeClient:
+	def __init__(self):
+		self.search_count = 0
+		self.recipe_count = 0
+		self.lock = threading.Lock()
+
+	def search(self, payload, **request_options):
+		with self.lock:
+			self.search_count += 1
+		search_term = payload['q']
+		if search_term.startswith('slow'):
+			time.sleep(0.05)
+		if search_term == 'butterbeer':
+			return mocked_response(500)
+		if search_term == 'hamster food':
+			return mocked_response(200, { 'criteria': { 'q': search_term }, 'matches': [] })
+		recipe_id = 'lasagna' if 'lasagna' in search_term else search_term
+		return mocked_response(200, { 'criteria': { 'q': search_term },
+									  'matches': [{ 'id': recipe_id }] })
+
+	def get_recipe(self, recipe_id, **request_options):
+		with self.lock:
+			self.recipe_count += 1
+		return mocked_response(200, { 'name': recipe_id,
+									  'numberOfServings': 4,
+									  'ingredientLines': ['2 cups water'],
+									  'source': { 'sourceRecipeUrl': 'https://example.com' } })
+
+
+"""
+Test methods related to resolving recipe requests in batches
+"""
+class TestRecipeInfoMany(unittest.TestCase):
+
+	# Test that results come back in input order with errors reported per item
+	def test_ordered_results(self):
+		client = FakeClient()
+		recipe_requests = [ ('slow chili', 4),
+							('butterbeer', 4),
+							('hamster food', 2),
+							('onion soup', 8, { 'allergy': ['Gluten-Free'] }) ]
+		results = list(get_recipe_info_many(recipe_requests, max_workers=2, client=client))
+		self.assertEqual([0, 1, 2, 3], [result.index for result in results])
+		self.assertEqual('slow chili', results[0].details['name'])
+		self.assertIsInstance(results[1].error, RequestError)
+		self.assertIsInstance(results[2].error, NoMatchError)
+		self.assertEqual(['4.0 cups water'], results[3].details['scaled_ingredients'])
+
+	# Test that results can be yielded as soon as they complete
+	def test_completion_order(self):
+		client = FakeClient()
+		recipe_requests = [('slow chili', 4), ('onion soup', 4)]
+		results = list(get_recipe_info_many(recipe_requests, max_workers=2,
+											ordered=False, client=client))
+		self.assertEqual([1, 0], [result.index for result in results])
+
+	# Test that identical searches and recipe ids are only requested once
+	def test_deduplication(self):
+		client = FakeClient()
+		recipe_requests = [('lasagna', 4)] * 20 + [('vegetable lasagna', 2)] * 5
+		results = list(get_recipe_info_many(recipe_requests, max_workers=4, client=client))
+		self.assertEqual(25, len(results))
+		self.assertEqual(2, client.search_count)
+		self.assertEqual(1, client.recipe_count)
+
+	# Test streaming a long generator of requests
+	def test_streams_generator(self):
+		client = FakeClient()
+		recipe_requests = (('dish {}'.format(index), 4) for index in range(200))
+		count = sum(1 for _ in get_recipe_info_many(recipe_requests, max_workers=3, client=client))
+		self.assertEqual(200, count)
+
+	# Test that only the most recently used responses are kept
+	def test_bounded_responses(self):
+		client = FakeClient()
+		batch_client = BatchClient(client, max_responses=2)
+		for recipe_id in ('a', 'b', 'a', 'c', 'b'):
+			batch_client.get_recipe(recipe_id)
+		self.assertEqual(4, client.recipe_count)
+		self.assertEqual(2, len(batch_client._responses))
+
+	# Test that transient errors and error responses are not shared with later requests
+	def test_transient_errors(self):
+		client = FakeClient()
+		client.get_recipe = Mock(side_effect=[CircuitOpenError('recipe', 1), QuotaExhaustedError(30),
+											  requests.ConnectionError(), requests.Timeout(),
+											  mocked_response(500), mocked_response(200)])
+		batch_client = BatchClient(client)
+		for error_class in (CircuitOpenError, QuotaExhaustedError, requests.ConnectionError,
+							requests.Timeout):
+			self.assertRaises(error_class, batch_client.get_recipe, 'a')
+		self.assertEqual(500, batch_client.get_recipe('a').status_code)
+		self.assertEqual(200, batch_client.get_recipe('a').status_code)
+		self.assertEqual(200, batch_client.get_recipe('a').status_code)
+		self.assertEqual(6, batch_client.sent_counts['recipe'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,78 @@
+"""
+This is the test suite for remembering searches Yummly had no match for.
+"""
+import unittest
+from unittest import mock
+from api_functions import get_recipe_info
+from bloom_filter import TimeDecayedBloomFilter, get_filter_size
+from no_match_error import NoMatchError
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+def mocked_no_match_response():
+	response = mock.Mock(status_code=200)
+	response.json.return_value = { 'criteria': { 'q': 'hamster food', 'excludedIngredient': None },
+								   'totalMatchCount': 0, 'matches': [] }
+	return response
+
+
+"""
+Test methods related to the time-decayed Bloom filter
+"""
+class TestTimeDecayedBloomFilter(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+
+	# Test that the filter is sized for its capacity and error rate
+	def test_filter_size(self):
+		self.assertEqual((9586, 7), get_filter_size(1000, 0.01))
+
+	# Test that added keys are found and others mostly are not
+	def test_membership(self):
+		bloom_filter = TimeDecayedBloomFilter(capacity=1000, error_rate=0.01, clock=self.clock)
+		for number in range(1000):
+			bloom_filter.add(('q', 'query ' + str(number)))
+		self.assertTrue(all(('q', 'query ' + str(number)) in bloom_filter for number in range(1000)))
+		false_positives = sum(('q', 'other ' + str(number)) in bloom_filter for number in range(10000))
+		self.assertTrue(false_positives < 300)
+
+	# Test that keys are forgotten between half the ttl and the ttl after being added
+	def test_expiry(self):
+		bloom_filter = TimeDecayedBloomFilter(capacity=100, ttl=60, clock=self.clock)
+		bloom_filter.add('hamster food')
+		self.clock.now += 30
+		self.assertIn('hamster food', bloom_filter)
+		self.clock.now += 30
+		self.assertNotIn('hamster food', bloom_filter)
+		self.assertEqual(2, bloom_filter.get_stats()['rotations'])
+
+	# Test that a full generation is rotated out early to bound false positives
+	def test_rotation_at_capacity(self):
+		bloom_filter = TimeDecayedBloomFilter(capacity=10, ttl=60, clock=self.clock)
+		for number in range(21):
+			bloom_filter.add(number)
+		self.assertNotIn(0, bloom_filter)
+		self.assertIn(20, bloom_filter)
+
+
+"""
+Test methods related to answering searches known to have no match
+"""
+class TestNegativeCache(unittest.TestCase):
+
+	# Test that a repeat search without matches raises NoMatchError without a request
+	def test_repeat_no_match(self):
+		negative_cache = TimeDecayedBloomFilter(capacity=100)
+		client = YummlyClient(negative_cache=negative_cache, retry_policies={ 'search': {}, 'recipe': {} })
+		with mock.patch.object(client.transport.session, 'get',
+							   return_value=mocked_no_match_response()) as mock_get:
+			self.assertRaises(NoMatchError, get_recipe_info, 'hamster food', 4, client=client)
+			with self.assertRaises(NoMatchError) as context:
+				get_recipe_info('Hamster  Food', 4, client=client)
+		self.assertEqual(1, mock_get.call_count)
+		self.assertEqual('Hamster  Food', context.exception.search_term)
+		self.assertEqual(1, negative_cache.get_stats()['hits'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,91 @@
+"""
+This is the test suite for snapshotting warm caches and restoring them in a
+new container.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from cache_snapshot import (CacheSnapshotter, write_snapshot, read_snapshot, restore_caches,
+							get_snapshot_caches)
+from snapshot_error import SnapshotError
+from tiny_lfu_cache import TinyLfuCache
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+"""
+Test methods related to cache snapshots
+"""
+class TestCacheSnapshot(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'cache.snapshot')
+		self.clock = FakeClock()
+		self.search_key = (('maxResult', '1'), ('q', 'onion soup'))
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def warm_caches(self):
+		recipe_cache = TinyLfuCache(10000, ttl=600, clock=self.clock)
+		recipe_cache.put('a', { 'name': 'Lasagna' })
+		recipe_cache.put('b', { 'name': 'Chili' }, ttl=60)
+		search_cache = TinyLfuCache(10000, clock=self.clock)
+		search_cache.put(self.search_key, { 'matches': [{ 'id': 'a' }] })
+		return { 'recipe': recipe_cache, 'search': search_cache }
+
+	# Test that restored caches hold the same entries under the same keys
+	def test_round_trip(self):
+		self.assertEqual(3, write_snapshot(self.warm_caches(), self.path, clock=self.clock))
+		caches = { 'recipe': TinyLfuCache(10000), 'search': TinyLfuCache(10000) }
+		self.assertEqual(3, restore_caches(caches, [self.path], clock=self.clock))
+		self.assertEqual({ 'name': 'Lasagna' }, caches['recipe'].get('a'))
+		self.assertEqual({ 'matches': [{ 'id': 'a' }] }, caches['search'].get(self.search_key))
+
+	# Test that entries expired since the snapshot are not restored
+	def test_ttl_revalidation(self):
+		write_snapshot(self.warm_caches(), self.path, clock=self.clock)
+		self.clock.now += 120
+		caches = { 'recipe': TinyLfuCache(10000, clock=self.clock) }
+		self.assertEqual(1, restore_caches(caches, [self.path], clock=self.clock))
+		self.assertIsNone(caches['recipe'].get('b'))
+		self.clock.now += 480
+		self.assertIsNone(caches['recipe'].get('a'))
+
+	# Test that corrupted snapshots are rejected and the next path is tried
+	def test_integrity(self):
+		write_snapshot(self.warm_caches(), self.path, clock=self.clock)
+		seed_path = os.path.join(self.directory, 'seed.snapshot')
+		shutil.copy(self.path, seed_path)
+		with open(self.path, 'r+b') as snapshot_file:
+			snapshot_file.seek(-5, os.SEEK_END)
+			snapshot_file.write(b'xxxxx')
+		with self.assertRaises(SnapshotError) as context:
+			read_snapshot(self.path)
+		self.assertIn('digest mismatch', context.exception.message())
+		caches = { 'recipe': TinyLfuCache(10000) }
+		missing_path = os.path.join(self.directory, 'missing.snapshot')
+		self.assertEqual(2, restore_caches(caches, [missing_path, self.path, seed_path],
+										   clock=self.clock))
+
+	# Test that snapshots are only written once the interval has passed
+	def test_interval(self):
+		snapshotter = CacheSnapshotter(self.warm_caches(), self.path, interval=300, clock=self.clock)
+		snapshotter.maybe_snapshot()
+		self.assertFalse(os.path.exists(self.path))
+		self.clock.now += 300
+		snapshotter.maybe_snapshot()
+		self.assertEqual({ 'snapshots': 1, 'failures': 0, 'entries': 2 }, snapshotter.get_stats())
+		snapshotter.path = os.path.join(self.directory, 'missing', 'cache.snapshot')
+		snapshotter.snapshot()
+		self.assertEqual(1, snapshotter.get_stats()['failures'])
+
+	# Test that only the in-process caches of a client are snapshotted
+	def test_snapshot_caches(self):
+		recipe_cache = TinyLfuCache(10000)
+		client = YummlyClient(recipe_cache=recipe_cache)
+		self.assertEqual({ 'recipe': recipe_cache }, get_snapshot_caches(client))
+
+if __name__ == '__main__':
+	unittest.main()
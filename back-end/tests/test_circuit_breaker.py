@@ -0,0 +1,107 @@
+"""
+This is the test suite for the circuit breaker guarding Yummly API endpoints.
+"""
+import unittest
+from unittest import mock
+import requests
+from circuit_breaker import CircuitBreaker
+from circuit_open_error import CircuitOpenError
+from request_error import RequestError
+from retry_policy import RetryPolicy, classify_status
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+"""
+Test methods related to opening and closing the circuit
+"""
+class TestCircuitBreaker(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock(0)
+		self.breaker = CircuitBreaker('recipe', failure_threshold=3, reset_timeout=10,
+									  clock=self.clock)
+
+	# Test that the circuit opens after consecutive failures
+	def test_opens_after_threshold(self):
+		for _ in range(3):
+			self.breaker.before_request()
+			self.breaker.record_failure()
+		self.assertEqual('open', self.breaker.state)
+		self.assertRaises(CircuitOpenError, self.breaker.before_request)
+
+	# Test that a success resets the failure count
+	def test_success_resets_failures(self):
+		self.breaker.record_failure()
+		self.breaker.record_failure()
+		self.breaker.record_success()
+		self.breaker.record_failure()
+		self.assertEqual('closed', self.breaker.state)
+
+	# Test that one trial request is let through after the reset timeout
+	def test_half_open_trial(self):
+		for _ in range(3):
+			self.breaker.record_failure()
+		self.clock.now = 10
+		self.breaker.before_request()
+		self.assertEqual('half open', self.breaker.state)
+		self.assertRaises(CircuitOpenError, self.breaker.before_request)
+		self.breaker.record_success()
+		self.assertEqual('closed', self.breaker.state)
+		self.breaker.before_request()
+
+	# Test that a failed trial reopens the circuit
+	def test_failed_trial_reopens(self):
+		for _ in range(3):
+			self.breaker.record_failure()
+		self.clock.now = 10
+		self.breaker.before_request()
+		self.breaker.record_failure()
+		self.assertEqual('open', self.breaker.state)
+		self.assertRaises(CircuitOpenError, self.breaker.before_request)
+
+	# Test that a trial ending in an unexpected error does not keep the circuit open
+	def test_trial_released_on_error(self):
+		for _ in range(3):
+			self.breaker.record_failure()
+		self.clock.now = 10
+		client = YummlyClient(breakers={ 'search': CircuitBreaker('search'), 'recipe': self.breaker },
+							  retry_policies={ 'search': {}, 'recipe': {} })
+		with mock.patch.object(client.transport.session, 'get',
+							   side_effect=requests.exceptions.ChunkedEncodingError()):
+			self.assertRaises(requests.exceptions.ChunkedEncodingError, client.get_recipe, 'a')
+		self.assertEqual('open', self.breaker.state)
+		self.clock.now = 20
+		with mock.patch.object(client.transport.session, 'get', return_value=mock.Mock(status_code=404)):
+			self.assertEqual(404, client.get_recipe('a').status_code)
+		self.assertEqual('closed', self.breaker.state)
+
+	# Test that an open circuit is reported as a distinct request error
+	def test_error_message(self):
+		err = CircuitOpenError('search', 12.34)
+		self.assertIsInstance(err, RequestError)
+		self.assertEqual('Yummly search requests are failing, not retrying for 12.3 seconds',
+						 err.message())
+
+
+"""
+Test methods related to retry policies
+"""
+class TestRetryPolicy(unittest.TestCase):
+
+	# Test that retry delays are jittered below an exponentially growing cap
+	def test_delays(self):
+		policy = RetryPolicy(max_retries=5, base_delay=0.1, max_delay=0.3)
+		for retry_number, cap in [(1, 0.1), (2, 0.2), (3, 0.3), (4, 0.3)]:
+			for _ in range(20):
+				self.assertTrue(0 <= policy.get_delay(retry_number) <= cap)
+
+	# Test classifying response status codes
+	def test_classify_status(self):
+		self.assertEqual('server error', classify_status(500))
+		self.assertEqual('server error', classify_status(503))
+		self.assertEqual('rate limit', classify_status(409))
+		self.assertIsNone(classify_status(400))
+		self.assertIsNone(classify_status(200))
+
+if __name__ == '__main__':
+	unittest.main()
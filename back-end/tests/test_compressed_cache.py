@@ -0,0 +1,93 @@
+"""
+This is the test suite for the compressed cold tier of the recipe cache.
+"""
+import unittest
+from cache_snapshot import get_snapshot_caches
+from compressed_cache import CompressedCache
+from tiered_cache import TieredCache
+from tiny_lfu_cache import TinyLfuCache, get_json_size
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+def make_recipe(name):
+	return { 'name': name, 'numberOfServings': 4,
+			 'ingredientLines': ['2 cups flour', '1 tbsp butter'],
+			 'nutritionEstimates': [{ 'attribute': 'NUTRIENT_' + str(number), 'value': number * 0.5,
+									  'unit': { 'name': 'gram', 'abbreviation': 'g',
+												'plural': 'grams', 'pluralAbbreviation': 'grams' } }
+									for number in range(40)],
+			 'flavors': { 'Salty': 0.5, 'Sour': 0.1, 'Sweet': 0.3, 'Bitter': 0.2, 'Meaty': 0.8 },
+			 'attribution': { 'url': 'http://www.yummly.co/recipe/' + name,
+							  'text': name + ' recipe information powered by Yummly' } }
+
+
+"""
+Test methods related to the compressed cache
+"""
+class TestCompressedCache(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+
+	# Test that documents are returned as stored and take less memory
+	def test_round_trip(self):
+		cache = CompressedCache(100000, codec='zlib', clock=self.clock)
+		cache.put('a', make_recipe('Lasagna'))
+		self.assertEqual(make_recipe('Lasagna'), cache.get('a'))
+		self.assertIsNone(cache.get('b'))
+		stats = cache.get_stats()
+		self.assertEqual(get_json_size(make_recipe('Lasagna')), stats['raw_bytes'])
+		self.assertTrue(stats['compression_ratio'] > 4)
+		self.assertEqual((1, 1), (stats['hits'], stats['misses']))
+		self.assertTrue(stats['decompression_seconds'] > 0)
+
+	# Test that the least recently used documents are evicted past max_bytes
+	def test_size_bound(self):
+		cache = CompressedCache(2000, codec='zlib', clock=self.clock)
+		for number in range(20):
+			cache.put(number, make_recipe('Recipe ' + str(number)))
+		stats = cache.get_stats()
+		self.assertTrue(stats['bytes'] <= 2000)
+		self.assertTrue(stats['evictions'] > 0)
+		self.assertIsNone(cache.get(0))
+		self.assertEqual(make_recipe('Recipe 19'), cache.get(19))
+
+	# Test that documents expire after the ttl
+	def test_ttl(self):
+		cache = CompressedCache(100000, ttl=60, codec='zlib', clock=self.clock)
+		cache.put('a', 'lasagna')
+		self.clock.now += 60
+		self.assertIsNone(cache.get('a'))
+		self.assertEqual(0, len(cache))
+
+	# Test that only the documents the uncompressed tier turns away are compressed
+	def test_victims(self):
+		hot = TinyLfuCache(get_json_size(make_recipe('Lasagna')) * 2, window_ratio=0.5)
+		cache = TieredCache(hot, CompressedCache(100000, codec='zlib'), write_through=False)
+		for name in ('Lasagna', 'Chili'):
+			cache.put(name, make_recipe(name))
+		self.assertEqual(0, len(cache.far))
+		cache.put('Soup', make_recipe('Soup'))
+		self.assertEqual((2, 1), (len(hot), len(cache.far)))
+		self.assertEqual(3, len(cache))
+
+	# Test that hot documents move back into the uncompressed tier
+	def test_promotion(self):
+		hot = TinyLfuCache(get_json_size(make_recipe('Lasagna')) * 2, window_ratio=0.5)
+		cache = TieredCache(hot, CompressedCache(100000, codec='zlib'), write_through=False)
+		for name in ('Lasagna', 'Chili', 'Soup'):
+			cache.put(name, make_recipe(name))
+		self.assertIsNone(hot.get('Chili'))
+		self.assertEqual(make_recipe('Chili'), cache.get('Chili'))
+		self.assertEqual(make_recipe('Chili'), hot.get('Chili'))
+		self.assertEqual(1, cache.far.get_stats()['hits'])
+		self.assertEqual(3, len(cache))
+
+	# Test that the uncompressed tier of a client's cache is the one snapshotted
+	def test_snapshot_caches(self):
+		hot = TinyLfuCache(10000)
+		client = YummlyClient(recipe_cache=TieredCache(hot, CompressedCache(10000, codec='zlib')))
+		self.assertEqual({ 'recipe': hot }, get_snapshot_caches(client))
+
+if __name__ == '__main__':
+	unittest.main()
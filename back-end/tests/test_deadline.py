@@ -0,0 +1,103 @@
+"""
+This is the test suite for the deadline bounding the time spent on a request.
+"""
+import unittest
+from unittest import mock
+import requests
+import recipe_bot
+from deadline import Deadline, get_deadline
+from deadline_exceeded_error import DeadlineExceededError
+from request_error import RequestError
+from retry_policy import RetryPolicy
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+"""
+Test methods related to creating and using deadlines
+"""
+class TestDeadline(unittest.TestCase):
+
+	# Test that timeouts shrink with the time remaining
+	def test_get_timeout(self):
+		clock = FakeClock()
+		deadline = Deadline(3, clock=clock)
+		self.assertEqual(2, deadline.get_timeout(cap=2))
+		clock.now = 102
+		self.assertEqual(1, deadline.get_timeout(cap=2))
+		clock.now = 103
+		self.assertTrue(deadline.expired())
+		self.assertRaises(DeadlineExceededError, deadline.get_timeout)
+
+	# Test creating a deadline from the Lambda context
+	def test_deadline_from_context(self):
+		context = mock.Mock()
+		context.get_remaining_time_in_millis.return_value = 3000
+		deadline = get_deadline(context, reserve=0.5)
+		self.assertAlmostEqual(2.5, deadline.budget)
+
+	# Test falling back to the configured budget outside Lambda
+	def test_deadline_without_context(self):
+		self.assertEqual(4, get_deadline(None, budget=4).budget)
+
+	# Test that running out of time is reported as a request error
+	def test_error_message(self):
+		err = DeadlineExceededError(2.5)
+		self.assertIsInstance(err, RequestError)
+		self.assertEqual('Ran out of time to answer within 2.5 seconds', err.message())
+
+
+"""
+Test methods related to bounding client requests by a deadline
+"""
+class TestClientDeadline(unittest.TestCase):
+
+	def setUp(self):
+		policies = { 'connection error': RetryPolicy(max_retries=3, base_delay=10, max_delay=10) }
+		self.client = YummlyClient(timeout=5, retry_policies={ 'search': policies, 'recipe': policies })
+
+	# Test that requests get their timeout from the deadline
+	def test_timeout_from_deadline(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=200)) as mock_get:
+			self.client.get_recipe('a', deadline=Deadline(1.5))
+			self.assertTrue(mock_get.call_args[1]['timeout'] <= 1.5)
+			self.client.get_recipe('a')
+			self.assertEqual(5, mock_get.call_args[1]['timeout'])
+
+	# Test that no request is sent once the deadline has passed
+	def test_expired_deadline(self):
+		with mock.patch.object(self.client.transport.session, 'get') as mock_get:
+			self.assertRaises(DeadlineExceededError, self.client.get_recipe, 'a',
+							  deadline=Deadline(0))
+			mock_get.assert_not_called()
+
+	# Test that retries that cannot finish in time are not attempted
+	@mock.patch('retry_policy.random.uniform', side_effect=lambda low, high: high)
+	def test_no_retry_past_deadline(self, mock_uniform):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   side_effect=requests.Timeout()) as mock_get:
+			self.assertRaises(DeadlineExceededError, self.client.search, { 'q': 'chili' },
+							  deadline=Deadline(2))
+			self.assertEqual(1, mock_get.call_count)
+
+
+"""
+Test that the bot answers gracefully when it runs out of time
+"""
+class TestHandlerDeadline(unittest.TestCase):
+
+	# Test that an exhausted deadline closes the conversation with a message
+	@mock.patch('recipe_bot.get_recipe_info', side_effect=DeadlineExceededError(2.5))
+	def test_find_recipe_out_of_time(self, mock_get_recipe_info):
+		intent = { 'invocationSource': 'FulfillmentCodeHook',
+				   'sessionAttributes': {},
+				   'currentIntent': { 'name': 'FindRecipe',
+									  'slots': { 'RecipeType': 'lasagna', 'Servings': '4',
+												 'Restrictions': None, 'RecipeTime': None } } }
+		result = recipe_bot.find_recipe(intent, Deadline(2.5))
+		self.assertEqual('Failed', result['dialogAction']['fulfillmentState'])
+		self.assertEqual(recipe_bot.TIMEOUT_MESSAGE, result['dialogAction']['message']['content'])
+		self.assertIsInstance(mock_get_recipe_info.call_args[1]['deadline'], Deadline)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,87 @@
+"""
+This is the test suite for memoizing the answers the bot gives to recipe
+requests.
+"""
+import unittest
+from unittest import mock
+import recipe_bot
+from api_functions import get_scaling_basis
+from fulfillment_memo import FulfillmentMemo, get_request_key, set_default_memo
+from no_match_error import NoMatchError
+
+RECIPE = { 'name': 'Lasagna', 'numberOfServings': 4,
+		   'ingredientLines': ['2 cups ricotta', 'salt'],
+		   'source': { 'sourceRecipeUrl': 'https://example.com/lasagna' } }
+
+
+def get_details(servings):
+	return { 'name': 'Lasagna', 'scaled_ingredients': [str(servings / 2) + ' cups ricotta', 'salt'],
+			 'recipe_url': 'https://example.com/lasagna', 'scaling_basis': get_scaling_basis(RECIPE) }
+
+
+"""
+Test methods related to the fulfillment memo
+"""
+class TestFulfillmentMemo(unittest.TestCase):
+
+	def setUp(self):
+		self.memo = FulfillmentMemo()
+		self.look_up = mock.Mock(return_value=get_details(4))
+		self.request_key = get_request_key('lasagna', {})
+
+	# Test that requests only differing in case, whitespace or order share a key
+	def test_request_key(self):
+		self.assertEqual(get_request_key('Vegetable  Lasagna', { 'allergy': ['Egg-Free', 'Dairy-Free'],
+																 'time': '1800' }),
+						 get_request_key('vegetable lasagna', { 'time': '1800',
+																'allergy': ['dairy-free', 'egg-free'] }))
+		self.assertNotEqual(get_request_key('lasagna', {}),
+							get_request_key('lasagna', { 'excluded_ingredient': ['cheese'] }))
+
+	# Test that a repeated request is answered without looking it up or rendering it
+	def test_repeat(self):
+		render = mock.Mock(return_value='Here is a recipe called Lasagna.')
+		for _ in range(3):
+			self.assertEqual('Here is a recipe called Lasagna.',
+							 self.memo.fulfill(self.request_key, 4, self.look_up, render))
+		self.assertEqual(1, self.look_up.call_count)
+		self.assertEqual(1, render.call_count)
+		self.assertEqual(2, self.memo.get_stats()['answered'])
+
+	# Test that a request for other servings is only rescaled and rendered again
+	def test_other_servings(self):
+		render = lambda details: details['scaled_ingredients']
+		self.memo.fulfill(self.request_key, 4, self.look_up, render)
+		self.assertEqual(['4.0 cups ricotta', 'salt'],
+						 self.memo.fulfill(self.request_key, 8, self.look_up, render))
+		self.assertEqual(1, self.look_up.call_count)
+		self.assertEqual(1, self.memo.get_stats()['rescaled'])
+
+	# Test that failed requests are not memoized
+	def test_failure(self):
+		self.look_up.side_effect = NoMatchError('lasagna')
+		self.assertRaises(NoMatchError, self.memo.fulfill, self.request_key, 4, self.look_up, str)
+		self.assertRaises(NoMatchError, self.memo.fulfill, self.request_key, 4, self.look_up, str)
+		self.assertEqual(2, self.look_up.call_count)
+
+	# Test that the bot answers repeated and rescaled requests from the memo
+	@mock.patch('recipe_bot.get_recipe_info')
+	def test_find_recipe(self, mock_get_recipe_info):
+		mock_get_recipe_info.return_value = get_details(4)
+		previous_memo = set_default_memo(self.memo)
+		self.addCleanup(set_default_memo, previous_memo)
+		intent = { 'invocationSource': 'FulfillmentCodeHook',
+				   'sessionAttributes': {},
+				   'currentIntent': { 'name': 'FindRecipe',
+									  'slots': { 'RecipeType': 'memo lasagna', 'Servings': '4',
+												 'Restrictions': None, 'RecipeTime': None } } }
+		first = recipe_bot.find_recipe(intent)
+		self.assertEqual(first, recipe_bot.find_recipe(intent))
+		intent['currentIntent']['slots']['Servings'] = '8'
+		content = recipe_bot.find_recipe(intent)['dialogAction']['message']['content']
+		self.assertIn('- 4.0 cups ricotta', content)
+		self.assertEqual(1, mock_get_recipe_info.call_count)
+		self.assertTrue(mock_get_recipe_info.call_args[1]['with_scaling_basis'])
+
+if __name__ == '__main__':
+	unittest.main()
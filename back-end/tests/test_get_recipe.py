@@ -8,6 +8,14 @@ from unittest.mock import Mock, patch
 from api_functions import get_scaled_ingredients, get_recipe_url
 from api_functions import get_recipe, get_recipe_name
 from api_functions import get_recipe_details, parse_response
+from yummly_client import YummlyClient, set_default_client
+
+"""
+Start from a fresh shared client so circuit breaker state left by other test
+modules does not leak into these tests
+"""
+def setUpModule():
+	set_default_client(YummlyClient())
 
 """
 Mock for requests.get
@@ -320,8 +328,8 @@ def mocked_requests_get(*args, **kwargs):
 """
 Test methods related to getting recipe info
 """
-#Patch requests.get to mock API call
-@patch('api_functions.requests.get', side_effect=mocked_requests_get)
+#Patch the pooled session's get to mock API call
+@patch('yummly_client.requests.Session.get', side_effect=mocked_requests_get)
 class TestGettingRecipeInfo(unittest.TestCase):
 	def test_get_recipe(self, mock_get):
 		recipe_id = 'Easy-French-Onion-Soup-2038937'
@@ -0,0 +1,125 @@
+"""
+This is the test suite for keeping Yummly API calls within our plan's quota.
+"""
+import unittest
+from unittest import mock
+import recipe_bot
+from quota_manager import QuotaManager, TokenBucket
+from quota_exhausted_error import QuotaExhaustedError
+from circuit_open_error import CircuitOpenError
+from request_error import RequestError
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+"""
+Test methods related to token buckets
+"""
+class TestTokenBucket(unittest.TestCase):
+
+	# Test that tokens run out and refill over time
+	def test_take_and_refill(self):
+		clock = FakeClock(0)
+		bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+		self.assertTrue(bucket.try_take())
+		self.assertTrue(bucket.try_take())
+		self.assertFalse(bucket.try_take())
+		self.assertAlmostEqual(1, bucket.get_wait())
+		clock.now = 1
+		self.assertTrue(bucket.try_take())
+
+
+"""
+Test methods related to managing the quota
+"""
+class TestQuotaManager(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock(0)
+
+	# Test that the plan's calls are shared out fairly between users
+	def test_user_fair_share(self):
+		quota = QuotaManager(calls_per_minute=600, user_calls_per_minute=12, clock=self.clock)
+		quota.acquire('chatty')
+		quota.acquire('chatty')
+		with self.assertRaises(QuotaExhaustedError) as context:
+			quota.acquire('chatty')
+		self.assertEqual('chatty', context.exception.user_id)
+		quota.acquire('quiet')
+
+	# Test that the plan's limit applies to all users together
+	def test_global_limit(self):
+		quota = QuotaManager(calls_per_minute=6, clock=self.clock)
+		quota.acquire('a')
+		self.assertRaises(QuotaExhaustedError, quota.acquire, 'b')
+		self.assertEqual(1, quota.refused_count)
+
+	# Test that calls are refused during the cooldown after a 409
+	def test_cooldown(self):
+		quota = QuotaManager(cooldown=60, clock=self.clock)
+		quota.acquire()
+		quota.record_rate_limited()
+		self.assertRaises(QuotaExhaustedError, quota.acquire)
+		self.clock.now = 60
+		quota.acquire()
+
+	# Test that a 409 from Yummly puts the client's quota into cooldown
+	def test_client_records_rate_limit(self):
+		client = YummlyClient(quota=QuotaManager(clock=self.clock),
+							  retry_policies={ 'search': {}, 'recipe': {} })
+		with mock.patch.object(client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=409)) as mock_get:
+			self.assertEqual(409, client.search({ 'q': 'chili' }).status_code)
+			self.assertRaises(QuotaExhaustedError, client.search, { 'q': 'chili' })
+			self.assertEqual(1, mock_get.call_count)
+
+	# Test that a 409 is not retried while the quota is cooling down
+	def test_client_no_rate_limit_retry(self):
+		client = YummlyClient(quota=QuotaManager(clock=self.clock))
+		with mock.patch.object(client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=409)) as mock_get, \
+			 mock.patch('yummly_client.time.sleep') as mock_sleep:
+			self.assertEqual(409, client.search({ 'q': 'chili' }).status_code)
+		self.assertEqual(1, mock_get.call_count)
+		mock_sleep.assert_not_called()
+
+	# Test that attempts refused before being sent do not use up the quota
+	def test_open_circuit_keeps_tokens(self):
+		quota = QuotaManager(calls_per_minute=6, clock=self.clock)
+		client = YummlyClient(quota=quota, retry_policies={ 'search': {}, 'recipe': {} })
+		for _ in range(client.breakers['search'].failure_threshold):
+			client.breakers['search'].record_failure()
+		for _ in range(3):
+			self.assertRaises(CircuitOpenError, client.search, { 'q': 'chili' })
+		quota.acquire()
+		self.assertEqual(0, quota.refused_count)
+
+	# Test the message for an exhausted quota
+	def test_error_message(self):
+		err = QuotaExhaustedError(30)
+		self.assertIsInstance(err, RequestError)
+		self.assertEqual(409, err.status_code)
+		self.assertEqual('Our bot has used up the API calls in our plan, try again in 30 seconds',
+						 err.message())
+
+
+"""
+Test that the bot answers straight away when the quota is used up
+"""
+class TestHandlerQuota(unittest.TestCase):
+
+	# Test that the user's id is passed along and a refusal closes the conversation
+	@mock.patch('recipe_bot.get_recipe_info', side_effect=QuotaExhaustedError(30))
+	def test_find_recipe_quota_exhausted(self, mock_get_recipe_info):
+		intent = { 'invocationSource': 'FulfillmentCodeHook',
+				   'sessionAttributes': {},
+				   'userId': 'slack-user',
+				   'currentIntent': { 'name': 'FindRecipe',
+									  'slots': { 'RecipeType': 'chili', 'Servings': '4',
+												 'Restrictions': None, 'RecipeTime': None } } }
+		result = recipe_bot.find_recipe(intent)
+		self.assertEqual('Failed', result['dialogAction']['fulfillmentState'])
+		self.assertEqual(recipe_bot.QUOTA_MESSAGE, result['dialogAction']['message']['content'])
+		self.assertEqual('slack-user', mock_get_recipe_info.call_args[1]['user_id'])
+
+if __name__ == '__main__':
+	unittest.main()
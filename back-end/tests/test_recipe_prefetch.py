@@ -0,0 +1,107 @@
+"""
+This is the test suite for fetching the top matching recipes concurrently and
+falling back when the first match is unusable.
+"""
+import asyncio
+import unittest
+from api_functions import get_recipe_info, is_usable_recipe, parse_response
+from async_api_functions import get_recipe_info_async
+from request_error import RequestError
+from no_match_error import NoMatchError
+from fakes import mocked_response
+
+USABLE_RECIPE = { 'name': 'Easy French Onion Soup',
+				  'numberOfServings': 4,
+				  'ingredientLines': ['3 tbsps butter'],
+				  'source': { 'sourceRecipeUrl': 'https://www.mccormick.com' } }
+
+"""
+Fake client returning canned search matches and recipes by id
+"""
+class FakeClient:
+	def __init__(self, recipes):
+		self.recipes = recipes
+		self.requested_ids = []
+
+	def search_response(self):
+		matches = [{ 'id': recipe_id } for recipe_id in self.recipes]
+		return mocked_response(200, { 'criteria': { 'q': 'onion soup' }, 'matches': matches })
+
+	def recipe_response(self, recipe_id):
+		self.requested_ids.append(recipe_id)
+		recipe = self.recipes[recipe_id]
+		if recipe is None:
+			return mocked_response(500)
+		return mocked_response(200, dict(recipe))
+
+	def search(self, payload, **request_options):
+		return self.search_response()
+
+	def get_recipe(self, recipe_id, **request_options):
+		return self.recipe_response(recipe_id)
+
+"""
+Asyncio version of the fake client
+"""
+class FakeAsyncClient(FakeClient):
+	async def search(self, payload, **request_options):
+		return self.search_response()
+
+	async def get_recipe(self, recipe_id, **request_options):
+		return self.recipe_response(recipe_id)
+
+
+"""
+Test methods related to choosing a usable recipe among the top matches
+"""
+class TestRecipePrefetch(unittest.TestCase):
+
+	def setUp(self):
+		self.recipes = { 'no-servings': dict(USABLE_RECIPE, numberOfServings=None),
+						 'server-error': None,
+						 'no-ingredients': dict(USABLE_RECIPE, ingredientLines=[]),
+						 'no-source': dict(USABLE_RECIPE, source={}),
+						 'usable': USABLE_RECIPE,
+						 'also-usable': dict(USABLE_RECIPE, name='Other Onion Soup') }
+
+	# Test the checks made on a recipe before using it
+	def test_is_usable_recipe(self):
+		self.assertTrue(is_usable_recipe(USABLE_RECIPE))
+		self.assertFalse(is_usable_recipe(self.recipes['no-servings']))
+		self.assertFalse(is_usable_recipe(self.recipes['no-ingredients']))
+		self.assertFalse(is_usable_recipe(self.recipes['no-source']))
+
+	# Test parsing several candidate ids from a search response
+	def test_parse_search_candidates(self):
+		response = FakeClient(self.recipes).search_response()
+		self.assertEqual(['no-servings', 'server-error'],
+						 parse_response('search candidates', response, 2))
+
+	# Test that the best ranked usable recipe is returned
+	def test_falls_back_to_usable_recipe(self):
+		client = FakeClient(self.recipes)
+		recipe_info = get_recipe_info('onion soup', 4, client=client, top_n=6)
+		self.assertEqual('Easy French Onion Soup', recipe_info['name'])
+
+	# Test that only the top n matches are fetched
+	def test_only_top_n_fetched(self):
+		client = FakeClient(self.recipes)
+		self.assertRaises(RequestError, get_recipe_info, 'onion soup', 4,
+						  client=client, top_n=4)
+		self.assertEqual(4, len(client.requested_ids))
+
+	# Test that NoMatchError is raised when every candidate is incomplete
+	def test_no_usable_recipe(self):
+		client = FakeClient({ 'no-servings': self.recipes['no-servings'],
+							  'no-source': self.recipes['no-source'] })
+		self.assertRaises(NoMatchError, get_recipe_info, 'onion soup', 4,
+						  client=client, top_n=2)
+
+	# Test the asyncio version of the fallback
+	def test_falls_back_to_usable_recipe_async(self):
+		client = FakeAsyncClient(self.recipes)
+		recipe_info = asyncio.run(get_recipe_info_async('onion soup', 4, client=client, top_n=6))
+		self.assertEqual('Easy French Onion Soup', recipe_info['name'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,136 @@
+"""
+This is the test suite for looking recipes up from several providers.
+"""
+import time
+import unittest
+from unittest import mock
+import recipe_providers
+from api_functions import get_recipe_info
+from no_match_error import NoMatchError
+from recipe_providers import CorpusClient, RecipeProviders
+from request_error import RequestError
+from fakes import mocked_response
+
+"""
+Fake provider client answering every search with one recipe, no match or an
+error status, after an optional delay
+"""
+class FakeProvider:
+	def __init__(self, recipe_url, status_code=200, delay=0, matches=True):
+		self.recipe_url = recipe_url
+		self.status_code = status_code
+		self.delay = delay
+		self.matches = [{ 'id': 'soup' }] if matches else []
+		self.searches = 0
+
+	def search(self, payload, **request_options):
+		self.searches += 1
+		time.sleep(self.delay)
+		return mocked_response(self.status_code, { 'criteria': { 'q': payload['q'] },
+												   'matches': self.matches })
+
+	def get_recipe(self, recipe_id, **request_options):
+		return mocked_response(200, { 'name': 'Soup', 'numberOfServings': 4,
+									  'ingredientLines': ['1 onion'],
+									  'source': { 'sourceRecipeUrl': self.recipe_url } })
+
+
+"""
+Test methods related to recipe providers
+"""
+class TestRecipeProviders(unittest.TestCase):
+
+	# Test that a failing provider fails over to the next one
+	def test_failover(self):
+		providers = RecipeProviders([('yummly', FakeProvider('yummly', status_code=500)),
+									 ('corpus', FakeProvider('corpus'))])
+		details = get_recipe_info('soup', 4, providers=providers)
+		self.assertEqual('corpus', details['recipe_url'])
+		stats = providers.get_stats()
+		self.assertEqual(1, stats['yummly']['failures'])
+		self.assertEqual(1, stats['corpus']['answers'])
+
+	# Test that the first error is raised when every provider fails
+	def test_all_providers_fail(self):
+		providers = RecipeProviders([('yummly', FakeProvider('yummly', status_code=500)),
+									 ('corpus', FakeProvider('corpus', status_code=400))])
+		with self.assertRaises(RequestError) as context:
+			get_recipe_info('soup', 4, providers=providers)
+		self.assertEqual(500, context.exception.status_code)
+
+	# Test that traffic leaves a provider that keeps failing
+	def test_degraded_provider_skipped(self):
+		yummly = FakeProvider('yummly', status_code=500)
+		providers = RecipeProviders([('yummly', yummly), ('corpus', FakeProvider('corpus'))],
+									failure_threshold=2)
+		for _ in range(4):
+			get_recipe_info('soup', 4, providers=providers)
+		self.assertEqual(2, yummly.searches)
+		self.assertEqual('open', providers.get_stats()['yummly']['state'])
+
+	# Test that a slow primary is raced against the secondary
+	def test_race(self):
+		providers = RecipeProviders([('yummly', FakeProvider('yummly', delay=0.3)),
+									 ('corpus', FakeProvider('corpus'))], mode='race', race_delay=0.02)
+		started_at = time.monotonic()
+		details = get_recipe_info('soup', 4, providers=providers)
+		self.assertTrue(time.monotonic() - started_at < 0.2)
+		self.assertEqual('corpus', details['recipe_url'])
+
+	# Test that a quick no match does not beat a slow primary's match
+	def test_race_no_match_waits(self):
+		providers = RecipeProviders([('yummly', FakeProvider('yummly', delay=0.3)),
+									 ('corpus', FakeProvider('corpus', matches=False))],
+									mode='race', race_delay=0.02)
+		self.assertEqual('yummly', get_recipe_info('soup', 4, providers=providers)['recipe_url'])
+
+	# Test that a no match is raised once the providers before it have failed
+	def test_race_no_match_after_failure(self):
+		providers = RecipeProviders([('yummly', FakeProvider('yummly', status_code=500, delay=0.1)),
+									 ('corpus', FakeProvider('corpus', matches=False))],
+									mode='race', race_delay=0.02)
+		self.assertRaises(NoMatchError, get_recipe_info, 'soup', 4, providers=providers)
+
+	# Test that a fast primary wins the race alone
+	def test_race_primary_wins(self):
+		corpus = FakeProvider('corpus')
+		providers = RecipeProviders([('yummly', FakeProvider('yummly')), ('corpus', corpus)],
+									mode='race', race_delay=0.5)
+		self.assertEqual('yummly', get_recipe_info('soup', 4, providers=providers)['recipe_url'])
+		self.assertEqual(0, corpus.searches)
+
+	# Test that no match is an answer, not a failure
+	def test_no_match_is_answer(self):
+		corpus = FakeProvider('corpus')
+		providers = RecipeProviders([('corpus', CorpusClient()), ('fake', corpus)])
+		self.assertRaises(NoMatchError, get_recipe_info, 'hamster food', 4, providers=providers)
+		self.assertEqual(0, corpus.searches)
+
+	# Test that the fixture corpus can serve the whole pipeline
+	def test_corpus_client(self):
+		details = get_recipe_info('lasagna', 4, client=CorpusClient(), allergy=['Egg-Free'])
+		self.assertEqual('Vegetable Lasagna', details['name'])
+
+	# Test that an explicit client bypasses the providers
+	def test_client_bypasses_providers(self):
+		yummly = FakeProvider('yummly')
+		providers = RecipeProviders([('yummly', yummly)])
+		get_recipe_info('soup', 4, client=FakeProvider('client'), providers=providers)
+		self.assertEqual(0, yummly.searches)
+
+	# Test that unknown modes are refused
+	def test_unknown_mode(self):
+		self.assertRaises(ValueError, RecipeProviders, [], mode='fastest')
+
+	# Test that our Yummly credentials are not sent to a secondary provider
+	def test_no_credentials(self):
+		previous_providers = recipe_providers.set_default_providers(None)
+		self.addCleanup(recipe_providers.set_default_providers, previous_providers)
+		with mock.patch('recipe_providers.SECONDARY_PROVIDER', 'http://recipes.example.com'):
+			providers = recipe_providers.get_default_providers()
+		secondary_client = dict(providers.providers)['secondary']
+		self.assertNotIn('X-Yummly-App-ID', secondary_client.transport.session.headers)
+		self.assertNotIn('X-Yummly-App-Key', secondary_client.transport.session.headers)
+
+if __name__ == '__main__':
+	unittest.main()
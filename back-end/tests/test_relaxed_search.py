@@ -0,0 +1,113 @@
+"""
+This is the test suite for loosening the constraints of a request that has no
+matching recipe.
+"""
+import threading
+import unittest
+from unittest import mock
+import recipe_bot
+from api_functions import get_relaxed_recipe_info, get_relaxed_variants
+from no_match_error import NoMatchError
+from fakes import mocked_response
+
+RECIPE = { 'name': 'Weeknight Beef Chili',
+		   'numberOfServings': 6,
+		   'ingredientLines': ['2 pounds ground beef'],
+		   'source': { 'sourceRecipeUrl': 'https://www.seriouseats.com/weeknight-beef-chili' } }
+
+"""
+Fake client whose searches only match when the payload passes a check
+"""
+class FakeClient:
+	def __init__(self, matches):
+		self.matches = matches
+		self.payloads = []
+		self.lock = threading.Lock()
+
+	def search(self, payload, **request_options):
+		with self.lock:
+			self.payloads.append(payload)
+		matches = [{ 'id': 'chili' }] if self.matches(payload) else []
+		return mocked_response(200, { 'criteria': dict(payload), 'matches': matches })
+
+	def get_recipe(self, recipe_id, **request_options):
+		return mocked_response(200, RECIPE)
+
+
+"""
+Test methods related to relaxing constraints
+"""
+class TestRelaxedSearch(unittest.TestCase):
+
+	# Test that variants drop as few constraints as possible first
+	def test_variant_order(self):
+		variants = get_relaxed_variants({ 'time': '1800', 'excluded_ingredient': ['beans', 'corn'],
+										  'allergy': ['Egg-Free'] })
+		self.assertEqual([[('time', '1800')], [('excluded_ingredient', 'beans')],
+						  [('excluded_ingredient', 'corn')]], [loosened for loosened, options in variants[:3]])
+		self.assertEqual(7, len(variants))
+		self.assertEqual({ 'excluded_ingredient': ['corn'], 'allergy': ['Egg-Free'] }, variants[3][1])
+		self.assertTrue(all(options['allergy'] == ['Egg-Free'] for loosened, options in variants))
+
+	# Test that allergies alone are never relaxed
+	def test_allergies_not_relaxed(self):
+		self.assertEqual([], get_relaxed_variants({ 'allergy': ['Egg-Free', 'Dairy-Free'] }))
+		client = FakeClient(lambda payload: False)
+		self.assertRaises(NoMatchError, get_relaxed_recipe_info, 'chili', 6, client=client,
+						  allergy=['Egg-Free'])
+		self.assertEqual(1, len(client.payloads))
+
+	# Test that the least relaxed matching variant is returned
+	def test_least_relaxed_variant(self):
+		client = FakeClient(lambda payload: 'beans' not in payload.get('excludedIngredient[]', []))
+		details = get_relaxed_recipe_info('chili', 6, client=client, time='1800',
+										  excluded_ingredient=['beans', 'corn'], allergy=['Egg-Free'])
+		self.assertEqual([('excluded_ingredient', 'beans')], details['relaxed_constraints'])
+		self.assertEqual('Weeknight Beef Chili', details['name'])
+		self.assertTrue(all(payload['allowedAllergy[]'] == ['Egg-Free'] for payload in client.payloads))
+
+	# Test that nothing is relaxed when the request matches
+	def test_no_relaxation_needed(self):
+		client = FakeClient(lambda payload: True)
+		details = get_relaxed_recipe_info('chili', 6, client=client, time='1800')
+		self.assertEqual([], details['relaxed_constraints'])
+		self.assertEqual(1, len(client.payloads))
+
+	# Test that the original error is raised when no variant matches
+	def test_no_variant_matches(self):
+		client = FakeClient(lambda payload: False)
+		with self.assertRaises(NoMatchError) as context:
+			get_relaxed_recipe_info('chili', 6, client=client, time='1800')
+		self.assertEqual('1800', context.exception.search_criteria['maxTotalTimeInSeconds'])
+
+	# Test that variants whose requests fail are skipped like those that match nothing
+	def test_failed_variant_skipped(self):
+		client = FakeClient(lambda payload: 'beans' not in payload.get('excludedIngredient[]', []))
+		search = client.search
+		client.search = lambda payload, **request_options: (
+			mocked_response(500) if 'maxTotalTimeInSeconds' not in payload else search(payload))
+		details = get_relaxed_recipe_info('chili', 6, client=client, time='1800',
+										  excluded_ingredient=['beans'])
+		self.assertEqual([('excluded_ingredient', 'beans')], details['relaxed_constraints'])
+
+	# Test that the user is told which constraints were loosened
+	def test_bot_response(self):
+		details = { 'name': 'Weeknight Beef Chili', 'scaled_ingredients': [], 'recipe_url': 'url',
+					'relaxed_constraints': [('time', '1800'), ('excluded_ingredient', 'beans')] }
+		self.assertTrue(recipe_bot.get_bot_response(details).startswith(
+			'I could not find a recipe matching all of your restrictions, so here is one '
+			'without your time limit and with beans allowed. Here is a recipe called'))
+
+	# Test that the bot only relaxes constraints when enabled
+	@mock.patch('recipe_bot.get_relaxed_recipe_info')
+	@mock.patch('recipe_bot.get_recipe_info')
+	def test_bot_opt_in(self, mock_get_recipe_info, mock_get_relaxed_recipe_info):
+		slots = { 'RecipeTime': None }
+		recipe_bot.get_recipe_response('chili', 4, slots, None)
+		mock_get_relaxed_recipe_info.assert_not_called()
+		with mock.patch('recipe_bot.RELAX_CONSTRAINTS', True):
+			recipe_bot.get_recipe_response('chili', 4, slots, None)
+		mock_get_relaxed_recipe_info.assert_called_once()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,94 @@
+"""
+This is the test suite for hedging slow requests to the Yummly API.
+"""
+import threading
+import time
+import unittest
+from unittest import mock
+from quota_exhausted_error import QuotaExhaustedError
+from request_hedger import RequestHedger
+from yummly_client import YummlyClient
+
+"""
+Fake request whose first call is slow and whose later calls are fast
+"""
+class SlowFirstRequest:
+	def __init__(self, slow_delay):
+		self.slow_delay = slow_delay
+		self.calls = 0
+		self.lock = threading.Lock()
+
+	def __call__(self):
+		with self.lock:
+			self.calls += 1
+			call_number = self.calls
+		if call_number == 1:
+			time.sleep(self.slow_delay)
+			return 'slow'
+		return 'fast'
+
+
+"""
+Test methods related to hedging requests
+"""
+class TestRequestHedger(unittest.TestCase):
+
+	# Test that no duplicate is sent when acquiring it is refused
+	def test_hedge_refused(self):
+		hedger = RequestHedger(delay=0.01, max_extra_load=1)
+		acquire_hedge = mock.Mock(side_effect=QuotaExhaustedError(30))
+		self.assertEqual('slow', hedger.send('recipe', SlowFirstRequest(0.05), acquire_hedge))
+		acquire_hedge.assert_called_once_with()
+		self.assertEqual(0, hedger.get_stats()['recipe']['hedged'])
+
+	# Test that a slow request is raced against a duplicate
+	def test_hedge_wins(self):
+		hedger = RequestHedger(delay=0.01, max_extra_load=1)
+		self.assertEqual('fast', hedger.send('recipe', SlowFirstRequest(0.3)))
+		self.assertEqual({ 'recipe': { 'requests': 1, 'hedged': 1, 'hedge_wins': 1 } },
+						 hedger.get_stats())
+
+	# Test that fast requests are not hedged
+	def test_no_hedge_when_fast(self):
+		hedger = RequestHedger(delay=0.5, max_extra_load=1)
+		self.assertEqual('fast', hedger.send('search', lambda: 'fast'))
+		self.assertEqual(0, hedger.get_stats()['search']['hedged'])
+
+	# Test that hedges are limited to the extra load allowed
+	def test_extra_load_cap(self):
+		hedger = RequestHedger(delay=0, max_extra_load=0.25)
+		for _ in range(8):
+			hedger.send('recipe', lambda: time.sleep(0.01) or 'slow')
+		self.assertEqual(2, hedger.get_stats()['recipe']['hedged'])
+
+	# Test that the hedge delay follows observed latencies
+	def test_percentile_delay(self):
+		hedger = RequestHedger(percentile=90)
+		self.assertIsNone(hedger.get_hedge_delay('search'))
+		for latency in range(100):
+			hedger._record_latency('search', latency / 1000)
+		self.assertAlmostEqual(0.09, hedger.get_hedge_delay('search'))
+
+	# Test that a failing request does not win the race
+	def test_failed_request_loses(self):
+		hedger = RequestHedger(delay=0.01, max_extra_load=1)
+		calls = []
+		def flaky_request():
+			calls.append(1)
+			if len(calls) == 1:
+				time.sleep(0.05)
+				raise ConnectionError()
+			return 'ok'
+		self.assertEqual('ok', hedger.send('recipe', flaky_request))
+
+	# Test that the client sends its requests through the hedger
+	def test_client_hedging(self):
+		hedger = RequestHedger(delay=0.01, max_extra_load=1)
+		client = YummlyClient(hedger=hedger)
+		responses = iter([mock.Mock(status_code=200)])
+		with mock.patch.object(client.transport.session, 'get', side_effect=lambda *args, **kwargs: next(responses)):
+			self.assertEqual(200, client.get_recipe('a').status_code)
+		self.assertEqual(1, hedger.get_stats()['recipe']['requests'])
+
+if __name__ == '__main__':
+	unittest.main()
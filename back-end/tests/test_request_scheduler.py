@@ -0,0 +1,118 @@
+"""
+This is the test suite for scheduling Yummly API requests by priority.
+"""
+import threading
+import time
+import unittest
+from unittest import mock
+from deadline import Deadline
+from deadline_exceeded_error import DeadlineExceededError
+from request_error import RequestError
+from request_rejected_error import RequestRejectedError
+from request_scheduler import RequestScheduler
+from yummly_client import YummlyClient
+
+"""
+Method to start a thread that acquires a slot and records when it got one
+"""
+def start_waiter(scheduler, priority, order):
+	def wait_for_slot():
+		scheduler.acquire(priority)
+		order.append(priority)
+		scheduler.release()
+	thread = threading.Thread(target=wait_for_slot)
+	thread.start()
+	return thread
+
+"""
+Method to wait until a number of requests are queued for a priority class
+"""
+def wait_until_queued(scheduler, priority, count):
+	while scheduler.get_stats()[priority]['queue_depth'] < count:
+		time.sleep(0.001)
+
+
+"""
+Test methods related to scheduling requests
+"""
+class TestRequestScheduler(unittest.TestCase):
+
+	# Test that interactive requests are served before lower classes
+	def test_priority_order(self):
+		scheduler = RequestScheduler(1)
+		scheduler.acquire('interactive')
+		order = []
+		threads = [start_waiter(scheduler, 'background', order)]
+		wait_until_queued(scheduler, 'background', 1)
+		threads.append(start_waiter(scheduler, 'speculative', order))
+		wait_until_queued(scheduler, 'speculative', 1)
+		threads.append(start_waiter(scheduler, 'interactive', order))
+		wait_until_queued(scheduler, 'interactive', 1)
+		scheduler.release()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(['interactive', 'speculative', 'background'], order)
+
+	# Test that lower classes leave room for interactive requests
+	def test_class_shares(self):
+		scheduler = RequestScheduler(4)
+		scheduler.acquire('background')
+		scheduler.acquire('background')
+		self.assertRaises(DeadlineExceededError, scheduler.acquire, 'background', Deadline(0.01))
+		scheduler.acquire('interactive')
+		scheduler.acquire('interactive')
+		self.assertEqual(4, scheduler.in_flight)
+
+	# Test that lower classes are dropped when their queue is full
+	def test_drop_when_queue_full(self):
+		scheduler = RequestScheduler(1, max_queue_depths={ 'speculative': 0 })
+		scheduler.acquire('interactive')
+		with self.assertRaises(RequestRejectedError) as context:
+			scheduler.acquire('speculative')
+		self.assertIsInstance(context.exception, RequestError)
+		self.assertEqual(1, scheduler.get_stats()['speculative']['dropped'])
+
+	# Test that queue depth and waits are reported per class
+	def test_stats(self):
+		scheduler = RequestScheduler(1)
+		scheduler.acquire('interactive')
+		order = []
+		thread = start_waiter(scheduler, 'interactive', order)
+		wait_until_queued(scheduler, 'interactive', 1)
+		time.sleep(0.02)
+		scheduler.release()
+		thread.join()
+		stats = scheduler.get_stats()['interactive']
+		self.assertEqual(2, stats['admitted'])
+		self.assertEqual(1, stats['max_queue_depth'])
+		self.assertEqual(0, stats['queue_depth'])
+		self.assertTrue(stats['mean_wait'] > 0.005)
+
+	# Test that the client releases its slot after each attempt
+	def test_client_uses_scheduler(self):
+		scheduler = RequestScheduler(2)
+		client = YummlyClient(scheduler=scheduler)
+		with mock.patch.object(client.transport.session, 'get', return_value=mock.Mock(status_code=200)):
+			client.get_recipe('a', priority='background')
+		self.assertEqual(0, scheduler.in_flight)
+		self.assertEqual(1, scheduler.get_stats()['background']['admitted'])
+
+	# Test that interactive requests do not join lower priority ones in flight
+	def test_priority_not_coalesced(self):
+		client = YummlyClient(scheduler=RequestScheduler(2))
+		started = threading.Event()
+		def slow_get(*args, **kwargs):
+			started.set()
+			time.sleep(0.05)
+			return mock.Mock(status_code=200)
+		with mock.patch.object(client.transport.session, 'get', side_effect=slow_get) as mock_get:
+			thread = threading.Thread(target=client.get_recipe, args=('a',), kwargs={ 'priority': 'background' })
+			thread.start()
+			started.wait(1)
+			self.assertEqual(200, client.get_recipe('a').status_code)
+			thread.join()
+		self.assertEqual(2, mock_get.call_count)
+		self.assertEqual(1, client.scheduler.get_stats()['interactive']['admitted'])
+
+if __name__ == '__main__':
+	unittest.main()
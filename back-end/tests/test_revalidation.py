@@ -0,0 +1,96 @@
+"""
+This is the test suite for serving cached recipes past their soft ttl while
+revalidating them in the background.
+"""
+import time
+import unittest
+from unittest import mock
+from tiny_lfu_cache import TinyLfuCache
+from yummly_client import YummlyClient, get_conditional_headers
+from fakes import FakeClock, mocked_response
+
+"""
+Test methods related to revalidating cached recipes
+"""
+class TestRevalidation(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+		self.cache = TinyLfuCache(10000, ttl=600, clock=self.clock)
+		self.client = YummlyClient(recipe_cache=self.cache, revalidate_after=60,
+								   retry_policies={ 'search': {}, 'recipe': {} })
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_response(200, { 'name': 'Lasagna' },
+															{ 'ETag': '"v1"' })):
+			self.client.get_recipe('a')
+
+	def tearDown(self):
+		self.client.close()
+
+	def make_stale(self):
+		self.cache.put('a', dict(self.cache.get('a'), fetched_at=time.time() - 61))
+
+	def wait_for_refresh(self):
+		while self.client.get_revalidation_stats()['in_flight']:
+			time.sleep(0.001)
+
+	# Test that fresh recipes are answered from the cache without a request
+	def test_fresh(self):
+		with mock.patch.object(self.client.transport.session, 'get') as mock_get:
+			self.assertEqual({ 'name': 'Lasagna' }, self.client.get_recipe('a').json())
+		mock_get.assert_not_called()
+		self.assertEqual({ 'If-None-Match': '"v1"' }, get_conditional_headers(self.cache.get('a')))
+
+	# Test that a stale recipe is served while a conditional request revalidates it
+	def test_not_modified(self):
+		self.make_stale()
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_response(304)) as mock_get:
+			self.assertEqual({ 'name': 'Lasagna' }, self.client.get_recipe('a').json())
+			self.wait_for_refresh()
+		self.assertEqual({ 'If-None-Match': '"v1"' }, mock_get.call_args[1]['headers'])
+		self.assertTrue(time.time() - self.cache.get('a')['fetched_at'] < 60)
+		self.assertEqual({ 'name': 'Lasagna' }, self.cache.get('a')['recipe'])
+		self.assertEqual(1, self.client.get_revalidation_stats()['not_modified'])
+
+	# Test that a changed recipe replaces the stale one
+	def test_refreshed(self):
+		self.make_stale()
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_response(200, { 'name': 'Better Lasagna' },
+															{ 'ETag': '"v2"' })):
+			self.assertEqual({ 'name': 'Lasagna' }, self.client.get_recipe('a').json())
+			self.wait_for_refresh()
+		self.assertEqual({ 'name': 'Better Lasagna' }, self.client.get_recipe('a').json())
+		self.assertEqual({ 'ETag': '"v2"' }, self.cache.get('a')['validators'])
+
+	# Test that stale recipes are served while Yummly fails, until the hard ttl
+	def test_failing(self):
+		self.make_stale()
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_response(500)):
+			self.assertEqual({ 'name': 'Lasagna' }, self.client.get_recipe('a').json())
+			self.wait_for_refresh()
+			self.assertEqual({ 'name': 'Lasagna' }, self.client.get_recipe('a').json())
+			self.wait_for_refresh()
+			self.clock.now += 600
+			self.assertEqual(500, self.client.get_recipe('a').status_code)
+		stats = self.client.get_revalidation_stats()
+		self.assertEqual((2, 2), (stats['stale'], stats['failed']))
+
+	# Test that cached values in the other format are treated as misses
+	def test_other_format(self):
+		self.cache.put('b', { 'name': 'Chili' })
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_response(200, { 'name': 'Chili' })) as mock_get:
+			self.assertEqual({ 'name': 'Chili' }, self.client.get_recipe('b').json())
+		mock_get.assert_called_once()
+		plain_client = YummlyClient(recipe_cache=self.cache, retry_policies={ 'search': {}, 'recipe': {} })
+		self.addCleanup(plain_client.close)
+		with mock.patch.object(plain_client.transport.session, 'get',
+							   return_value=mocked_response(200, { 'name': 'Lasagna' })) as mock_get:
+			self.assertEqual({ 'name': 'Lasagna' }, plain_client.get_recipe('a').json())
+		mock_get.assert_called_once()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,89 @@
+"""
+This is the test suite for caching the outcome of searches under a canonical
+form of their payload.
+"""
+import unittest
+from unittest import mock
+from api_functions import create_payload
+from query_key import get_payload_key
+from tiny_lfu_cache import TinyLfuCache
+from yummly_client import YummlyClient, get_search_outcome
+from fakes import FakeClock
+
+def mocked_search_response(status_code, matches):
+	response = mock.Mock(status_code=status_code)
+	response.json.return_value = { 'criteria': { 'q': 'onion soup' }, 'totalMatchCount': len(matches),
+								   'matches': [{ 'id': match_id, 'recipeName': match_id,
+												 'ingredients': ['onion'] } for match_id in matches] }
+	return response
+
+
+"""
+Test methods related to the canonical key of a search payload
+"""
+class TestPayloadKey(unittest.TestCase):
+
+	# Test that case, whitespace and the order of list parameters are ignored
+	def test_equivalent_payloads(self):
+		first = create_payload('Onion  Soup', allergy=['Dairy-Free', 'Egg-Free'],
+							   excluded_ingredient=['beans'], time=1800)
+		second = create_payload(' onion soup ', allergy=['egg-free', 'dairy-free'],
+								excluded_ingredient=['Beans'], time='1800')
+		self.assertEqual(get_payload_key(first), get_payload_key(second))
+		hash(get_payload_key(first))
+
+	# Test that different searches get different keys
+	def test_different_payloads(self):
+		self.assertNotEqual(get_payload_key(create_payload('onion soup')),
+							get_payload_key(create_payload('onion soup', excluded_ingredient=['beans'])))
+		self.assertNotEqual(get_payload_key({ 'q': 'onion soup', 'start': 0 }),
+							get_payload_key({ 'q': 'onion soup', 'start': 10 }))
+
+
+"""
+Test methods related to answering searches from the cache
+"""
+class TestSearchCache(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+		self.cache = TinyLfuCache(10000, ttl=60, clock=self.clock)
+		self.client = YummlyClient(search_cache=self.cache, retry_policies={ 'search': {}, 'recipe': {} })
+
+	# Test that only the criteria, count and ranked ids of the matches are kept
+	def test_search_outcome(self):
+		outcome = get_search_outcome(mocked_search_response(200, ['a', 'b']).json())
+		self.assertEqual({ 'criteria': { 'q': 'onion soup' }, 'totalMatchCount': 2,
+						   'matches': [{ 'id': 'a' }, { 'id': 'b' }] }, outcome)
+
+	# Test that a repeat search is answered without a request
+	def test_repeat_search(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_search_response(200, ['a', 'b'])) as mock_get:
+			first = self.client.search({ 'q': 'Onion Soup', 'allowedAllergy[]': ['Egg-Free'] }).json()
+			second = self.client.search({ 'q': 'onion soup', 'allowedAllergy[]': ['egg-free'] }).json()
+		self.assertEqual(1, mock_get.call_count)
+		self.assertEqual(first, second)
+		self.assertEqual(['a', 'b'], [match['id'] for match in second['matches']])
+
+	# Test that cached outcomes expire after the ttl
+	def test_expiry(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_search_response(200, ['a'])) as mock_get:
+			self.client.search({ 'q': 'onion soup' })
+			self.clock.now += 60
+			self.client.search({ 'q': 'onion soup' })
+		self.assertEqual(2, mock_get.call_count)
+
+	# Test that failed searches and searches without matches are not cached
+	def test_not_cached(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_search_response(500, [])):
+			self.assertEqual(500, self.client.search({ 'q': 'onion soup' }).status_code)
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mocked_search_response(200, [])):
+			self.assertEqual([], self.client.search({ 'q': 'onion soup' }).json()['matches'])
+		self.assertEqual(0, len(self.cache))
+
+if __name__ == '__main__':
+	unittest.main()
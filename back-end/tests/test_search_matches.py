@@ -0,0 +1,75 @@
+"""
+This is the test suite for iterating over the matches of a search page by page.
+"""
+import unittest
+from unittest.mock import Mock
+from api_functions import iter_search_matches, get_search_results
+from no_match_error import NoMatchError
+
+"""
+Fake client paging through a list of matching recipe ids like Yummly does
+"""
+class PagingClient:
+	def __init__(self, recipe_ids):
+		self.recipe_ids = recipe_ids
+		self.pages = []
+		self.responses = []
+
+	def search(self, payload, **request_options):
+		start = payload.get('start', 0)
+		max_result = payload.get('maxResult', 10)
+		self.pages.append((start, max_result))
+		matches = [{ 'id': recipe_id } for recipe_id in self.recipe_ids[start:start + max_result]]
+		response = Mock(status_code=200)
+		response.json.return_value = { 'criteria': { 'q': payload['q'] },
+									   'totalMatchCount': len(self.recipe_ids),
+									   'matches': matches }
+		self.responses.append(response)
+		return response
+
+
+"""
+Test methods related to iterating over search matches
+"""
+class TestSearchMatches(unittest.TestCase):
+
+	# Test that only the first small page is requested for the first match
+	def test_first_page_only(self):
+		client = PagingClient(['a', 'b', 'c'])
+		matches = iter_search_matches('chili', client=client, first_page_size=1)
+		self.assertEqual('a', next(matches))
+		self.assertEqual([(0, 1)], client.pages)
+
+	# Test that later pages are requested as the caller iterates
+	def test_later_pages(self):
+		client = PagingClient([str(number) for number in range(12)])
+		matches = list(iter_search_matches('chili', client=client, page_size=5, first_page_size=2))
+		self.assertEqual([str(number) for number in range(12)], matches)
+		self.assertEqual([(0, 2), (2, 5), (7, 5)], client.pages)
+
+	# Test that no page is requested past the last match
+	def test_stops_at_total_match_count(self):
+		client = PagingClient(['a', 'b', 'c', 'd'])
+		self.assertEqual(['a', 'b', 'c', 'd'], list(iter_search_matches('chili', client=client,
+																		page_size=2, first_page_size=2)))
+		self.assertEqual([(0, 2), (2, 2)], client.pages)
+
+	# Test that the body of each page is only decoded once
+	def test_decodes_once(self):
+		client = PagingClient([str(number) for number in range(4)])
+		list(iter_search_matches('chili', client=client, page_size=4, first_page_size=2))
+		self.assertEqual([1, 1], [response.json.call_count for response in client.responses])
+
+	def test_no_match(self):
+		matches = iter_search_matches('hamster food', client=PagingClient([]))
+		self.assertRaises(NoMatchError, next, matches)
+
+	# Test that the page parameters are added to the search payload
+	def test_page_parameters(self):
+		client = Mock()
+		get_search_results('chili', client=client, max_result=3, start=6, allergy=['Egg-Free'])
+		self.assertEqual({ 'q': 'chili', 'allowedAllergy[]': ['Egg-Free'], 'maxResult': 3, 'start': 6 },
+						 client.search.call_args[0][0])
+
+if __name__ == '__main__':
+	unittest.main()
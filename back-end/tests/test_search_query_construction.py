@@ -5,6 +5,14 @@ Yummly API.
 import unittest
 from unittest import mock
 from api_functions import get_search_results, create_payload
+from yummly_client import YummlyClient, set_default_client
+
+"""
+Start from a fresh shared client so circuit breaker state left by other test
+modules does not leak into these tests
+"""
+def setUpModule():
+	set_default_client(YummlyClient())
 
 """
 Mock for requests.get
@@ -115,11 +123,11 @@ class TestPayloadCreation(unittest.TestCase):
 """
 Test methods related to checking for successful search queries in API
 """
-#Patch requests.get to mock API call
-@mock.patch('api_functions.requests.get', side_effect=mocked_requests_get)
+#Patch the pooled session's get to mock API call
+@mock.patch('yummly_client.requests.Session.get', side_effect=mocked_requests_get)
 class TestSearchSuccess(unittest.TestCase):
 
-	# @mock.patch('api_functions.requests.get', side_effect=mocked_requests_get)
+	# @mock.patch('yummly_client.requests.Session.get', side_effect=mocked_requests_get)
 
 	# Test simple search for onion soup
 	def test_simple_search_api(self, mock_get):
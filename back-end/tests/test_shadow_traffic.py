@@ -0,0 +1,128 @@
+"""
+This is the test suite for mirroring live requests to a shadow backend.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from api_functions import get_recipe_info
+from no_match_error import NoMatchError
+import shadow_traffic
+from shadow_traffic import ShadowTraffic, summarize_metrics
+from fakes import mocked_response
+
+"""
+Fake backend returning one recipe for every search, after an optional delay
+"""
+class FakeBackend:
+	def __init__(self, recipe_url, delay=0, matches=True):
+		self.recipe_url = recipe_url
+		self.delay = delay
+		self.matches = matches
+		self.searches = 0
+
+	def search(self, payload, **request_options):
+		time.sleep(self.delay)
+		self.searches += 1
+		matches = [{ 'id': 'soup' }] if self.matches else []
+		return mocked_response(200, { 'criteria': { 'q': payload['q'] }, 'matches': matches })
+
+	def get_recipe(self, recipe_id, **request_options):
+		return mocked_response(200, { 'name': 'Soup', 'numberOfServings': 4,
+									  'ingredientLines': ['1 onion'],
+									  'source': { 'sourceRecipeUrl': self.recipe_url } })
+
+"""
+Random number generator always returning the same number
+"""
+class FixedRandom:
+	def __init__(self, number):
+		self.number = number
+
+	def random(self):
+		return self.number
+
+
+"""
+Test methods related to shadow traffic
+"""
+class TestShadowTraffic(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.metrics_path = os.path.join(self.directory, 'shadow.jsonl')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def read_metrics(self):
+		with open(self.metrics_path) as metrics_file:
+			return [json.loads(line) for line in metrics_file]
+
+	# Test that the shadow backend does not add to the request latency
+	def test_no_added_latency(self):
+		secondary = FakeBackend('https://example.com/soup', delay=0.2)
+		shadow = ShadowTraffic(secondary, sample_rate=1, metrics_path=self.metrics_path)
+		started_at = time.monotonic()
+		details = get_recipe_info('soup', 4, client=FakeBackend('https://example.com/soup'), shadow=shadow)
+		self.assertTrue(time.monotonic() - started_at < 0.1)
+		self.assertEqual('https://example.com/soup', details['recipe_url'])
+		shadow._executor.shutdown(wait=True)
+		comparison = self.read_metrics()[0]
+		self.assertTrue(comparison['agree'])
+		self.assertTrue(comparison['secondary']['latency'] >= 0.2)
+		self.assertEqual(1, secondary.searches)
+
+	# Test that disagreements and errors are recorded
+	def test_disagreement_and_errors(self):
+		shadow = ShadowTraffic(FakeBackend('https://example.com/other', matches=False), sample_rate=1,
+							   metrics_path=self.metrics_path)
+		get_recipe_info('soup', 4, client=FakeBackend('https://example.com/soup'), shadow=shadow)
+		self.assertRaises(NoMatchError, get_recipe_info, 'soup', 4,
+						  client=FakeBackend('https://example.com/soup', matches=False), shadow=shadow)
+		shadow._executor.shutdown(wait=True)
+		first, second = self.read_metrics()
+		self.assertFalse(first['agree'])
+		self.assertEqual('NoMatchError', first['secondary']['error'])
+		self.assertTrue(second['agree'])
+		summary = summarize_metrics(self.metrics_path)
+		self.assertEqual(2, summary['requests'])
+		self.assertEqual(0.5, summary['agreement_rate'])
+		self.assertEqual(0.5, summary['primary']['error_rate'])
+		self.assertEqual(1, summary['secondary']['error_rate'])
+
+	# Test that only the sampled requests are mirrored
+	def test_sampling(self):
+		secondary = FakeBackend('https://example.com/soup')
+		shadow = ShadowTraffic(secondary, sample_rate=0.5, metrics_path=self.metrics_path,
+							   rng=FixedRandom(0.7))
+		get_recipe_info('soup', 4, client=FakeBackend('https://example.com/soup'), shadow=shadow)
+		self.assertEqual(0, secondary.searches)
+		self.assertEqual({ 'sampled': 0, 'dropped': 0, 'compared': 0 }, shadow.get_stats())
+
+	# Test that shadow requests are dropped when too many are running
+	def test_max_in_flight(self):
+		release = threading.Event()
+		shadow = ShadowTraffic(None, sample_rate=1, metrics_path=self.metrics_path, max_in_flight=1)
+		primary_outcome = { 'latency': 0, 'error': None, 'recipe_url': None }
+		shadow.observe('soup', lambda client: release.wait() and None, primary_outcome)
+		self.assertIsNone(shadow.observe('soup', lambda client: None, primary_outcome))
+		release.set()
+		shadow._executor.shutdown(wait=True)
+		self.assertEqual({ 'sampled': 2, 'dropped': 1, 'compared': 1 }, shadow.get_stats())
+
+	# Test that our Yummly credentials are not sent to the shadow backend
+	def test_no_credentials(self):
+		previous_shadow = shadow_traffic.set_default_shadow(None)
+		self.addCleanup(shadow_traffic.set_default_shadow, previous_shadow)
+		with mock.patch('shadow_traffic.SHADOW_BASE_URL', 'http://shadow.example.com'):
+			session_headers = shadow_traffic.get_default_shadow().secondary_client.transport.session.headers
+		self.assertNotIn('X-Yummly-App-ID', session_headers)
+		self.assertNotIn('X-Yummly-App-Key', session_headers)
+
+if __name__ == '__main__':
+	unittest.main()
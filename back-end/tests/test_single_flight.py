@@ -0,0 +1,111 @@
+"""
+This is the test suite for coalescing identical in-flight requests.
+"""
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+from single_flight import SingleFlight, AsyncSingleFlight
+from yummly_client import YummlyClient
+
+"""
+Method to run a function from several threads at once and collect the results
+"""
+def run_in_threads(function, count):
+	results = []
+	errors = []
+	def run():
+		try:
+			results.append(function())
+		except Exception as err:
+			errors.append(err)
+	threads = [threading.Thread(target=run) for _ in range(count)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return results, errors
+
+
+"""
+Test methods related to coalescing requests from threads
+"""
+class TestSingleFlight(unittest.TestCase):
+
+	# Test that concurrent callers share one call
+	def test_shared_result(self):
+		flights = SingleFlight()
+		calls = []
+		def slow_request():
+			calls.append(1)
+			time.sleep(0.05)
+			return 'lasagna'
+		results, errors = run_in_threads(lambda: flights.do('lasagna', slow_request), 10)
+		self.assertEqual(['lasagna'] * 10, results)
+		self.assertEqual(1, len(calls))
+		self.assertEqual(9, flights.shared_count)
+
+	# Test that concurrent callers share one exception
+	def test_shared_exception(self):
+		flights = SingleFlight()
+		def failing_request():
+			time.sleep(0.05)
+			raise ConnectionError()
+		results, errors = run_in_threads(lambda: flights.do('chili', failing_request), 5)
+		self.assertEqual(5, len(errors))
+		self.assertTrue(all(isinstance(err, ConnectionError) for err in errors))
+
+	# Test that a new call is made once the previous one completed
+	def test_sequential_calls(self):
+		flights = SingleFlight()
+		calls = []
+		flights.do('chili', lambda: calls.append(1))
+		flights.do('chili', lambda: calls.append(1))
+		self.assertEqual(2, len(calls))
+
+	# Test that the client coalesces identical searches
+	def test_client_coalesces_searches(self):
+		client = YummlyClient()
+		def slow_get(*args, **kwargs):
+			time.sleep(0.05)
+			return mock.Mock(status_code=200)
+		with mock.patch.object(client.transport.session, 'get', side_effect=slow_get) as mock_get:
+			run_in_threads(lambda: client.search({ 'q': 'lasagna', 'allowedAllergy[]': ['Egg-Free'] }), 8)
+			self.assertEqual(1, mock_get.call_count)
+
+
+"""
+Test methods related to coalescing requests from coroutines
+"""
+class TestAsyncSingleFlight(unittest.TestCase):
+
+	# Test that concurrent coroutines share one call
+	def test_shared_result(self):
+		flights = AsyncSingleFlight()
+		calls = []
+		async def slow_request():
+			calls.append(1)
+			await asyncio.sleep(0.01)
+			return 'lasagna'
+		async def run():
+			return await asyncio.gather(*[flights.do('lasagna', slow_request) for _ in range(20)])
+		self.assertEqual(['lasagna'] * 20, asyncio.run(run()))
+		self.assertEqual(1, len(calls))
+
+	# Test that one caller timing out does not cancel the call for others
+	def test_caller_timeout(self):
+		flights = AsyncSingleFlight()
+		async def slow_request():
+			await asyncio.sleep(0.05)
+			return 'chili'
+		async def run():
+			impatient = flights.do('chili', slow_request, timeout=0.01)
+			patient = flights.do('chili', slow_request)
+			return await asyncio.gather(impatient, patient, return_exceptions=True)
+		impatient_result, patient_result = asyncio.run(run())
+		self.assertIsInstance(impatient_result, asyncio.TimeoutError)
+		self.assertEqual('chili', patient_result)
+
+if __name__ == '__main__':
+	unittest.main()
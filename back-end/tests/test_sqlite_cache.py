@@ -0,0 +1,163 @@
+"""
+This is the test suite for the cache shared by the processes on one machine.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from sqlite_cache import SqliteCache
+from tiered_cache import TieredCache
+from tiny_lfu_cache import TinyLfuCache
+from yummly_client import YummlyClient, get_shared_cache
+from fakes import FakeClock
+
+"""
+Test methods related to the SQLite cache
+"""
+class TestSqliteCache(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'cache.db')
+		self.clock = FakeClock()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	# Test that documents are shared between caches opened on the same database
+	def test_shared_between_instances(self):
+		writer = SqliteCache(self.path, namespace='recipe')
+		writer.put('a', { 'name': 'Lasagna' })
+		writer.put((('q', 'onion soup'),), { 'matches': [{ 'id': 'a' }] })
+		reader = SqliteCache(self.path, namespace='recipe')
+		self.assertEqual({ 'name': 'Lasagna' }, reader.get('a'))
+		self.assertEqual({ 'matches': [{ 'id': 'a' }] }, reader.get((('q', 'onion soup'),)))
+		self.assertIsNone(SqliteCache(self.path, namespace='search').get('a'))
+		self.assertEqual('wal', reader._connect().execute('PRAGMA journal_mode').fetchone()[0])
+		stats = reader.get_stats()
+		self.assertEqual((2, 0, 2), (stats['hits'], stats['misses'], stats['entries']))
+
+	# Test that documents expire after the ttl
+	def test_ttl(self):
+		cache = SqliteCache(self.path, ttl=60, clock=self.clock)
+		cache.put('a', 'lasagna')
+		self.clock.now += 59
+		self.assertEqual('lasagna', cache.get('a'))
+		self.clock.now += 1
+		self.assertIsNone(cache.get('a'))
+		self.assertEqual(0, len(cache))
+
+	# Test that the oldest documents are deleted to stay within the size allowed
+	def test_size_bound(self):
+		cache = SqliteCache(self.path, max_bytes=1000, clock=self.clock)
+		for number in range(30):
+			self.clock.now += 1
+			cache.put(number, 'x' * 98)
+		stats = cache.get_stats()
+		self.assertTrue(stats['bytes'] <= 1000)
+		self.assertIsNone(cache.get(0))
+		self.assertEqual('x' * 98, cache.get(29))
+		self.assertTrue(stats['evictions'] > 0)
+
+	# Test that the size of the database is only measured once the running total passes the bound
+	def test_running_size(self):
+		cache = SqliteCache(self.path, max_bytes=10000, clock=self.clock)
+		with mock.patch.object(cache, '_get_bytes', wraps=cache._get_bytes) as mock_get_bytes:
+			for number in range(50):
+				cache.put(number, 'x' * 98)
+			self.assertEqual(1, mock_get_bytes.call_count)
+			for number in range(50, 110):
+				cache.put(number, 'x' * 98)
+		self.assertTrue(cache.get_stats()['bytes'] <= 10000)
+
+	# Test that a database written with another schema version is recreated
+	def test_schema_version(self):
+		SqliteCache(self.path).put('a', 'lasagna')
+		connection = sqlite3.connect(self.path)
+		connection.execute("UPDATE meta SET value = 0 WHERE name = 'schema_version'")
+		connection.commit()
+		connection.close()
+		self.assertIsNone(SqliteCache(self.path).get('a'))
+
+	# Test that concurrent writers and readers keep the database consistent
+	def test_concurrent_use(self):
+		errors = []
+		def use_cache(offset):
+			cache = SqliteCache(self.path, max_bytes=20000)
+			for number in range(100):
+				key = (offset + number) % 50
+				cache.put(key, 'x' * 100)
+				if cache.get(key) not in (None, 'x' * 100):
+					errors.append(key)
+			if cache.get_stats()['errors']:
+				errors.append('sqlite error')
+		threads = [threading.Thread(target=use_cache, args=(offset,)) for offset in range(6)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual([], errors)
+		self.assertTrue(SqliteCache(self.path).get_stats()['bytes'] <= 20000)
+
+
+"""
+Test methods related to stacking an in-process cache on a shared one
+"""
+class TestTieredCache(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'cache.db')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	# Test that documents found in the shared cache are copied into the local one
+	def test_promotion(self):
+		SqliteCache(self.path, namespace='recipe').put('a', { 'name': 'Lasagna' })
+		cache = TieredCache(TinyLfuCache(10000), SqliteCache(self.path, namespace='recipe'))
+		self.assertEqual({ 'name': 'Lasagna' }, cache.get('a'))
+		self.assertEqual({ 'name': 'Lasagna' }, cache.near.get('a'))
+		cache.put('b', { 'name': 'Chili' })
+		self.assertEqual({ 'name': 'Chili' }, cache.far.get('b'))
+
+	# Test that documents copied into the local cache expire when they would have in the shared one
+	def test_promotion_ttl(self):
+		clock = FakeClock()
+		cache = TieredCache(TinyLfuCache(10000, ttl=60, clock=clock),
+							SqliteCache(self.path, namespace='recipe', ttl=60, clock=clock))
+		cache.far.put('a', { 'name': 'Lasagna' })
+		clock.now += 50
+		self.assertEqual(({ 'name': 'Lasagna' }, 10), cache.get_with_ttl('a'))
+		clock.now += 10
+		self.assertIsNone(cache.near.get('a'))
+		cache.put('b', { 'name': 'Chili' }, ttl=5)
+		clock.now += 5
+		self.assertEqual((None, None), (cache.near.get('b'), cache.far.get('b')))
+
+	# Test that a database that cannot be opened leaves only the in-process cache
+	def test_shared_cache_unavailable(self):
+		local_cache = TinyLfuCache(10000)
+		missing_path = os.path.join(self.directory, 'missing', 'cache.db')
+		with mock.patch('yummly_client.SHARED_CACHE_PATH', missing_path):
+			self.assertIs(local_cache, get_shared_cache(local_cache, 'recipe', 60))
+
+	# Test that a client in another process is answered from the shared cache
+	def test_client_shared_cache(self):
+		response = mock.Mock(status_code=200)
+		response.json.return_value = { 'name': 'Lasagna' }
+		first = YummlyClient(recipe_cache=TieredCache(TinyLfuCache(10000), SqliteCache(self.path)),
+							 retry_policies={ 'search': {}, 'recipe': {} })
+		with mock.patch.object(first.transport.session, 'get', return_value=response):
+			first.get_recipe('a')
+		second = YummlyClient(recipe_cache=TieredCache(TinyLfuCache(10000), SqliteCache(self.path)),
+							  retry_policies={ 'search': {}, 'recipe': {} })
+		with mock.patch.object(second.transport.session, 'get') as mock_get:
+			self.assertEqual({ 'name': 'Lasagna' }, second.get_recipe('a').json())
+		mock_get.assert_not_called()
+
+if __name__ == '__main__':
+	unittest.main()
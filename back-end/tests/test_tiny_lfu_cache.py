@@ -0,0 +1,130 @@
+"""
+This is the test suite for the in-process cache of Yummly documents.
+"""
+import threading
+import unittest
+from unittest import mock
+from tiny_lfu_cache import TinyLfuCache, CountMinSketch, get_json_size
+from yummly_client import YummlyClient
+from fakes import FakeClock
+
+"""
+Test methods related to estimating how often keys are requested
+"""
+class TestCountMinSketch(unittest.TestCase):
+
+	# Test that frequencies are counted and aged
+	def test_estimate_and_aging(self):
+		sketch = CountMinSketch(width=64, sample_size=40)
+		for _ in range(8):
+			sketch.increment('lasagna')
+		self.assertEqual(8, sketch.estimate('lasagna'))
+		self.assertEqual(0, sketch.estimate('chili'))
+		for _ in range(32):
+			sketch.increment('soup')
+		self.assertEqual(4, sketch.estimate('lasagna'))
+
+
+"""
+Test methods related to caching documents
+"""
+class TestTinyLfuCache(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+
+	# Test that stored documents are returned and counted as hits
+	def test_hit_and_miss(self):
+		cache = TinyLfuCache(10000, clock=self.clock)
+		self.assertIsNone(cache.get('a'))
+		cache.put('a', { 'name': 'Lasagna' })
+		self.assertEqual({ 'name': 'Lasagna' }, cache.get('a'))
+		stats = cache.get_stats()
+		self.assertEqual((1, 1, 0.5), (stats['hits'], stats['misses'], stats['hit_rate']))
+		self.assertEqual(get_json_size({ 'name': 'Lasagna' }), stats['bytes'])
+
+	# Test that documents expire after the ttl
+	def test_ttl(self):
+		cache = TinyLfuCache(10000, ttl=60, clock=self.clock)
+		cache.put('a', 'lasagna')
+		self.clock.now += 59
+		self.assertEqual('lasagna', cache.get('a'))
+		self.clock.now += 1
+		self.assertIsNone(cache.get('a'))
+		self.assertEqual(1, cache.get_stats()['expirations'])
+		self.assertEqual(0, len(cache))
+
+	# Test that the cache never holds more bytes than allowed
+	def test_size_in_bytes(self):
+		cache = TinyLfuCache(1000, sizeof=len, window_ratio=0.1)
+		for key in range(50):
+			cache.put(key, 'x' * 90)
+		self.assertTrue(cache.get_stats()['bytes'] <= 1000)
+		cache.put('huge', 'x' * 1001)
+		self.assertIsNone(cache.get('huge'))
+
+	# Test that nothing is evicted for a candidate that ends up rejected
+	def test_rejection_evicts_nothing(self):
+		cache = TinyLfuCache(1000, sizeof=len, window_ratio=0.1)
+		for key in ('a', 'b', 'c'):
+			cache.put(key, 'x' * 300)
+		for _ in range(5):
+			cache.get('b')
+			cache.get('c')
+		cache.get('big')
+		cache.put('big', 'x' * 600)
+		self.assertIsNone(cache.get('big'))
+		self.assertEqual(['a', 'b', 'c'], [key for key in ('a', 'b', 'c') if cache.get(key) is not None])
+		self.assertEqual(0, cache.get_stats()['evictions'])
+
+	# Test that a scan of one-off keys does not flush out popular ones
+	def test_scan_resistance(self):
+		cache = TinyLfuCache(1000, sizeof=len, window_ratio=0.1)
+		popular = ['popular-' + str(number) for number in range(8)]
+		for key in popular:
+			cache.put(key, 'x' * 100)
+		for _ in range(5):
+			for key in popular:
+				self.assertIsNotNone(cache.get(key))
+		for number in range(500):
+			key = 'scan-' + str(number)
+			cache.get(key)
+			cache.put(key, 'x' * 100)
+		self.assertEqual(8, sum(cache.get(key) is not None for key in popular))
+		stats = cache.get_stats()
+		self.assertTrue(stats['rejections'] > 400)
+
+	# Test that concurrent use keeps the cache consistent
+	def test_thread_safety(self):
+		cache = TinyLfuCache(5000, sizeof=len, window_ratio=0.1)
+		def use_cache(offset):
+			for number in range(300):
+				key = (offset + number) % 40
+				if cache.get(key) is None:
+					cache.put(key, 'x' * 100)
+		threads = [threading.Thread(target=use_cache, args=(offset,)) for offset in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		stats = cache.get_stats()
+		self.assertEqual(2400, stats['hits'] + stats['misses'])
+		self.assertEqual(stats['entries'] * 100, stats['bytes'])
+		self.assertTrue(stats['bytes'] <= 5000)
+
+	# Test that the client answers repeated recipe requests from the cache
+	def test_client_recipe_cache(self):
+		cache = TinyLfuCache(10000)
+		client = YummlyClient(recipe_cache=cache, retry_policies={ 'search': {}, 'recipe': {} })
+		response = mock.Mock(status_code=200)
+		response.json.return_value = { 'name': 'Lasagna' }
+		with mock.patch.object(client.transport.session, 'get', return_value=response) as mock_get:
+			self.assertEqual({ 'name': 'Lasagna' }, client.get_recipe('a').json())
+			self.assertEqual({ 'name': 'Lasagna' }, client.get_recipe('a').json())
+			self.assertEqual(1, mock_get.call_count)
+			mock_get.return_value = mock.Mock(status_code=500)
+			self.assertEqual(500, client.get_recipe('b').status_code)
+		self.assertEqual(1, len(cache))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,112 @@
+"""
+This is the test suite for the transports used to record and replay Yummly
+API traffic.
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import requests
+from api_functions import get_recipe_info
+from cassette_miss_error import CassetteMissError
+from transports import RecordingTransport, ReplayTransport, YummlyResponse, get_interaction_key
+from yummly_client import YummlyClient, BASE_API_SEARCH_URL, BASE_API_GET_URL
+
+SEARCH_BODY = { 'criteria': { 'q': 'onion soup' },
+				'matches': [{ 'id': 'Easy-French-Onion-Soup-123' }] }
+
+RECIPE_BODY = { 'name': 'Easy French Onion Soup',
+				'numberOfServings': 4,
+				'ingredientLines': ['3 tbsps butter'],
+				'source': { 'sourceRecipeUrl': 'https://www.mccormick.com' } }
+
+"""
+Fake transport answering from canned responses in turn, as if slowly
+"""
+class FakeTransport:
+	def __init__(self, responses, delay=0):
+		self.responses = iter(responses)
+		self.delay = delay
+		self.closed = False
+
+	def get(self, url, params=None, timeout=None, headers=None):
+		time.sleep(self.delay)
+		return next(self.responses)
+
+	def close(self):
+		self.closed = True
+
+
+"""
+Test methods related to recording and replaying requests
+"""
+class TestTransports(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.cassette_path = os.path.join(self.directory, 'yummly.jsonl.gz')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def record(self, responses, requests_made, delay=0):
+		transport = RecordingTransport(FakeTransport(responses, delay), self.cassette_path)
+		for url, params in requests_made:
+			transport.get(url, params=params, timeout=5)
+		transport.close()
+
+	# Test that the order of parameters does not change the key
+	def test_interaction_key(self):
+		self.assertEqual(get_interaction_key('url', { 'q': 'chili', 'allowedAllergy[]': ['Egg-Free', 'Soy-Free'] }),
+						 get_interaction_key('url', { 'allowedAllergy[]': ['Soy-Free', 'Egg-Free'], 'q': 'chili' }))
+		self.assertNotEqual(get_interaction_key('url', { 'q': 'chili' }), get_interaction_key('url'))
+
+	# Test that recorded responses are replayed
+	def test_record_and_replay(self):
+		self.record([YummlyResponse(200, SEARCH_BODY), YummlyResponse(500, { 'error': 'down' })],
+					[(BASE_API_SEARCH_URL, { 'q': 'onion soup' }), (BASE_API_GET_URL + 'a', None)])
+		transport = ReplayTransport(self.cassette_path)
+		response = transport.get(BASE_API_SEARCH_URL, params={ 'q': 'onion soup' })
+		self.assertEqual(200, response.status_code)
+		self.assertEqual(SEARCH_BODY, response.json())
+		response = transport.get(BASE_API_GET_URL + 'a')
+		self.assertEqual(500, response.status_code)
+		self.assertIsNone(response.json())
+
+	# Test that requests recorded several times are answered in turn
+	def test_replay_cycles(self):
+		self.record([YummlyResponse(500), YummlyResponse(200, RECIPE_BODY)],
+					[(BASE_API_GET_URL + 'a', None)] * 2)
+		transport = ReplayTransport(self.cassette_path)
+		statuses = [transport.get(BASE_API_GET_URL + 'a').status_code for _ in range(3)]
+		self.assertEqual([500, 200, 500], statuses)
+
+	# Test that a request that was never recorded is reported
+	def test_cassette_miss(self):
+		self.record([YummlyResponse(200, RECIPE_BODY)], [(BASE_API_GET_URL + 'a', None)])
+		transport = ReplayTransport(self.cassette_path)
+		with self.assertRaises(CassetteMissError) as context:
+			transport.get(BASE_API_GET_URL + 'b')
+		self.assertEqual('No recorded response for ' + BASE_API_GET_URL + 'b', context.exception.message())
+
+	# Test that recorded latencies are replayed and bounded by the timeout
+	def test_simulated_latency(self):
+		self.record([YummlyResponse(200, RECIPE_BODY)], [(BASE_API_GET_URL + 'a', None)], delay=0.05)
+		transport = ReplayTransport(self.cassette_path, simulate_latency=True)
+		started_at = time.monotonic()
+		transport.get(BASE_API_GET_URL + 'a', timeout=5)
+		self.assertTrue(time.monotonic() - started_at >= 0.04)
+		self.assertRaises(requests.Timeout, transport.get, BASE_API_GET_URL + 'a', timeout=0.01)
+
+	# Test that the whole pipeline runs from a cassette
+	def test_replay_pipeline(self):
+		self.record([YummlyResponse(200, SEARCH_BODY), YummlyResponse(200, RECIPE_BODY)],
+					[(BASE_API_SEARCH_URL, { 'q': 'onion soup', 'maxResult': 1, 'start': 0 }),
+					 (BASE_API_GET_URL + 'Easy-French-Onion-Soup-123', None)])
+		client = YummlyClient(transport=ReplayTransport(self.cassette_path))
+		details = get_recipe_info('onion soup', 4, client=client)
+		self.assertEqual('Easy French Onion Soup', details['name'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,148 @@
+"""
+This is the test suite for the pooled Yummly API client.
+"""
+import threading
+import unittest
+from unittest import mock
+import requests
+import yummly_client
+from yummly_client import YummlyClient, get_default_client, set_default_client
+from api_functions import get_recipe_info
+from retry_policy import RetryPolicy
+from circuit_open_error import CircuitOpenError
+
+"""
+Mock for the pooled session's get
+"""
+def mocked_session_get(*args, **kwargs):
+	class MockedResponse:
+		def __init__(self, status_code, json_data):
+			self.status_code = status_code
+			self.json_data = json_data
+
+		def json(self):
+			return self.json_data
+
+	if 'params' in kwargs:
+		return MockedResponse(200, { 'criteria': { 'q': 'onion soup' },
+									 'matches': [{ 'id': 'Easy-French-Onion-Soup-2038937' }] })
+	return MockedResponse(200, { 'name': 'Easy French Onion Soup',
+								 'numberOfServings': 4,
+								 'ingredientLines': ['3 tbsps butter'],
+								 'source': { 'sourceRecipeUrl': 'https://www.mccormick.com' } })
+
+"""
+Test methods related to creating and configuring the client
+"""
+class TestYummlyClient(unittest.TestCase):
+
+	# Test that the connection pool is sized from the constructor
+	def test_pool_size(self):
+		client = YummlyClient(pool_size=3)
+		adapter = client.transport.session.get_adapter('http://api.yummly.com')
+		self.assertEqual(3, adapter._pool_maxsize)
+
+	# Test that connections are no longer closed after every request
+	def test_keep_alive(self):
+		client = YummlyClient()
+		self.assertNotEqual('close', client.transport.session.headers.get('Connection'))
+
+	# Test that every caller in the process shares one client
+	def test_default_client_is_shared(self):
+		clients = []
+		threads = [threading.Thread(target=lambda: clients.append(get_default_client()))
+				   for _ in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertTrue(all(client is clients[0] for client in clients))
+
+	# Test replacing the shared client
+	def test_set_default_client(self):
+		client = YummlyClient(pool_size=2)
+		previous_client = set_default_client(client)
+		try:
+			self.assertIs(client, get_default_client())
+		finally:
+			set_default_client(previous_client)
+
+
+"""
+Test that the wrapper method sends its requests through the shared client
+"""
+@mock.patch('yummly_client.requests.Session.get', side_effect=mocked_session_get)
+class TestDefaultClientUsage(unittest.TestCase):
+
+	def setUp(self):
+		set_default_client(YummlyClient())
+
+	# Test that search and recipe requests both use the shared session
+	def test_get_recipe_info_uses_default_client(self, mock_get):
+		recipe_info = get_recipe_info('onion soup', 4)
+		self.assertEqual('Easy French Onion Soup', recipe_info['name'])
+		self.assertEqual(2, mock_get.call_count)
+		self.assertEqual(yummly_client.BASE_API_SEARCH_URL, mock_get.call_args_list[0][0][0])
+
+	# Test passing an explicit client
+	def test_get_recipe_info_with_client(self, mock_get):
+		client = YummlyClient(pool_size=1)
+		with mock.patch.object(client, 'search', wraps=client.search) as mock_search:
+			get_recipe_info('onion soup', 4, client=client)
+			mock_search.assert_called_once_with({ 'q': 'onion soup', 'maxResult': 1, 'start': 0 },
+												deadline=None, user_id=None, priority='interactive')
+
+
+"""
+Test methods related to retrying failed requests
+"""
+class TestRetries(unittest.TestCase):
+
+	def setUp(self):
+		policies = { 'server error': RetryPolicy(max_retries=2, base_delay=0, max_delay=0),
+					 'connection error': RetryPolicy(max_retries=1, base_delay=0, max_delay=0) }
+		self.client = YummlyClient(retry_policies={ 'search': policies, 'recipe': {} })
+
+	# Test that server errors are retried until a request succeeds
+	def test_retry_server_error(self):
+		responses = [mock.Mock(status_code=500), mock.Mock(status_code=500), mock.Mock(status_code=200)]
+		with mock.patch.object(self.client.transport.session, 'get', side_effect=responses) as mock_get:
+			self.assertEqual(200, self.client.search({ 'q': 'onion soup' }).status_code)
+			self.assertEqual(3, mock_get.call_count)
+
+	# Test that the last response is returned once retries run out
+	def test_retries_exhausted(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=503)) as mock_get:
+			self.assertEqual(503, self.client.search({ 'q': 'onion soup' }).status_code)
+			self.assertEqual(3, mock_get.call_count)
+
+	# Test that connection errors are retried and re-raised once retries run out
+	def test_retry_connection_error(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   side_effect=requests.ConnectionError()) as mock_get:
+			self.assertRaises(requests.ConnectionError, self.client.search, { 'q': 'onion soup' })
+			self.assertEqual(2, mock_get.call_count)
+
+	# Test that kinds of failure without a policy are not retried
+	def test_no_policy(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=409)) as mock_get:
+			self.assertEqual(409, self.client.search({ 'q': 'onion soup' }).status_code)
+			self.assertEqual(1, mock_get.call_count)
+
+	# Test that an open circuit fails fast without sending a request
+	def test_open_circuit(self):
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=500)) as mock_get:
+			for _ in range(5):
+				self.client.get_recipe('a')
+			self.assertRaises(CircuitOpenError, self.client.get_recipe, 'a')
+			self.assertEqual(5, mock_get.call_count)
+		# Each endpoint has its own circuit
+		with mock.patch.object(self.client.transport.session, 'get',
+							   return_value=mock.Mock(status_code=200)):
+			self.assertEqual(200, self.client.search({ 'q': 'onion soup' }).status_code)
+
+if __name__ == '__main__':
+	unittest.main()
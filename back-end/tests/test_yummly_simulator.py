@@ -0,0 +1,94 @@
+"""
+This is the test suite for the local simulator of the Yummly API.
+"""
+import os
+import subprocess
+import sys
+import time
+import unittest
+from api_functions import get_recipe_info
+from no_match_error import NoMatchError
+from request_error import RequestError
+from yummly_client import YummlyClient
+from yummly_simulator import YummlySimulator, load_corpus
+
+NO_RETRIES = { 'search': {}, 'recipe': {} }
+
+"""
+Method to create a client sending its requests to a running simulator
+"""
+def simulator_client(base_url, **client_options):
+	return YummlyClient(search_url=base_url + '/v1/api/recipes',
+						get_url=base_url + '/v1/api/recipe/', retry_policies=NO_RETRIES,
+						coalesce=False, **client_options)
+
+
+"""
+Test methods related to simulating the Yummly API
+"""
+class TestYummlySimulator(unittest.TestCase):
+
+	def start_simulator(self, **options):
+		simulator = YummlySimulator(seed=1, **options)
+		base_url = simulator.start()
+		self.addCleanup(simulator.stop)
+		return simulator, simulator_client(base_url)
+
+	# Test that the whole pipeline runs against the simulator
+	def test_pipeline(self):
+		simulator, client = self.start_simulator()
+		details = get_recipe_info('onion soup', 8, client=client)
+		self.assertEqual('Easy French Onion Soup', details['name'])
+		self.assertEqual('6.0 tbsps butter', details['scaled_ingredients'][0])
+		self.assertEqual({ 'search': { 200: 1 }, 'recipe': { 200: 1 } }, simulator.get_stats())
+
+	# Test that searches are filtered by the optional parameters
+	def test_search_filters(self):
+		simulator, client = self.start_simulator()
+		response = client.search({ 'q': 'lasagna', 'allowedAllergy[]': ['Egg-Free'] })
+		self.assertEqual(['Vegetable-Lasagna-1002'], [match['id'] for match in response.json()['matches']])
+		self.assertRaises(NoMatchError, get_recipe_info, 'chili', 4, client=client,
+						  excluded_ingredient=['beans'])
+
+	# Test that searches are paginated
+	def test_search_pages(self):
+		simulator, client = self.start_simulator()
+		response = client.search({ 'q': 'chili', 'maxResult': 1, 'start': 1 })
+		self.assertEqual(2, response.json()['totalMatchCount'])
+		self.assertEqual(1, len(response.json()['matches']))
+
+	# Test that errors are injected at the configured rate
+	def test_error_injection(self):
+		simulator, client = self.start_simulator(error_rates={ 500: 1 })
+		self.assertRaises(RequestError, get_recipe_info, 'lasagna', 4, client=client)
+		self.assertEqual({ 'search': { 500: 1 } }, simulator.get_stats())
+
+	# Test that responses are delayed and padded as configured
+	def test_latency_and_payload_size(self):
+		simulator, client = self.start_simulator(latency=('fixed', 0.05), payload_size=20000)
+		started_at = time.monotonic()
+		response = client.get_recipe('Classic-Lasagna-1001')
+		self.assertTrue(time.monotonic() - started_at >= 0.05)
+		self.assertTrue(len(response.content) >= 20000)
+
+	# Test that unknown recipes are not found
+	def test_unknown_recipe(self):
+		simulator, client = self.start_simulator()
+		self.assertEqual(404, client.get_recipe('Missing-Recipe').status_code)
+
+	# Test that the Yummly urls can be pointed at the simulator
+	def test_base_url_override(self):
+		environment = dict(os.environ, YUMMLY_BASE_URL='http://localhost:8765/')
+		output = subprocess.check_output([sys.executable, '-c',
+										  'import yummly_client; print(yummly_client.BASE_API_GET_URL)'],
+										 env=environment, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+		self.assertEqual('http://localhost:8765/v1/api/recipe/', output.decode().strip())
+
+	# Test that the fixture corpus has everything the bot needs
+	def test_corpus(self):
+		for recipe in load_corpus():
+			self.assertTrue(recipe['id'] and recipe['name'] and recipe['numberOfServings'])
+			self.assertTrue(recipe['ingredientLines'] and recipe['source']['sourceRecipeUrl'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,58 @@
+"""
+This module contains the cache stacking two caches with the same interface,
+e.g. an in-process TinyLfuCache in front of a CompressedCache, or of a
+SqliteCache shared by the other processes on the machine.
+"""
+
+
+"""
+Cache looking keys up in the near cache first and then in the far one, copying
+the values found in the far cache into the near one for the ttl they have left
+there, so that they do not outlive it. Values are stored in, and
+deleted from, both unless write_through is False, in which case the far cache
+only keeps what the near one, a TinyLfuCache, evicts or rejects, and values
+found in it move back into the near one
+"""
+class TieredCache:
+	def __init__(self, near, far, write_through=True):
+		self.near = near
+		self.far = far
+		self.write_through = write_through
+		if not write_through:
+			near.on_evict = far.put
+
+	def get(self, key):
+		return self.get_with_ttl(key)[0]
+
+	def get_with_ttl(self, key):
+		value, ttl = self.near.get_with_ttl(key)
+		if value is None:
+			value, ttl = self.far.get_with_ttl(key)
+			if value is not None:
+				if not self.write_through:
+					self.far.delete(key)
+				self.near.put(key, value, ttl=ttl)
+		return value, ttl
+
+	def put(self, key, value, ttl=None):
+		self.near.put(key, value, ttl=ttl)
+		if self.write_through:
+			self.far.put(key, value, ttl=ttl)
+		else:
+			self.far.delete(key)
+
+	def delete(self, key):
+		self.near.delete(key)
+		self.far.delete(key)
+
+	def clear(self):
+		self.near.clear()
+		self.far.clear()
+
+	def __len__(self):
+		if self.write_through:
+			return len(self.far)
+		return len(self.near) + len(self.far)
+
+	def get_stats(self):
+		return { 'near': self.near.get_stats(), 'far': self.far.get_stats() }
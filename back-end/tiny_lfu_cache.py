@@ -0,0 +1,258 @@
+"""
+This module contains the in-process cache used to keep Yummly documents that
+are requested again and again in a warm container or server worker.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+""" --- Constants ---"""
+RECIPE_CACHE_BYTES = int(os.environ.get('YUMMLY_RECIPE_CACHE_BYTES', 4 * 1024 * 1024))
+
+RECIPE_CACHE_TTL = float(os.environ.get('YUMMLY_RECIPE_CACHE_TTL_SECONDS', 6 * 60 * 60))
+
+RECIPE_CACHE_SOFT_TTL = float(os.environ.get('YUMMLY_RECIPE_CACHE_SOFT_TTL_SECONDS', 60 * 60))
+
+SEARCH_CACHE_BYTES = int(os.environ.get('YUMMLY_SEARCH_CACHE_BYTES', 1024 * 1024))
+
+SEARCH_CACHE_TTL = float(os.environ.get('YUMMLY_SEARCH_CACHE_TTL_SECONDS', 15 * 60))
+
+DEFAULT_WINDOW_RATIO = 0.01
+
+DEFAULT_PROTECTED_RATIO = 0.8
+
+DEFAULT_SKETCH_WIDTH = 4096
+
+SKETCH_DEPTH = 4
+
+MAX_FREQUENCY = 15
+
+HASH_MASK = (1 << 64) - 1
+
+
+"""
+Method to get the size in bytes of a JSON document, as it was sent by Yummly
+"""
+def get_json_size(document):
+	return len(json.dumps(document, separators=(',', ':'), default=str).encode('utf-8'))
+
+
+"""
+Count-min sketch estimating how often each key was requested recently, using
+counters that saturate at MAX_FREQUENCY and are all halved once sample_size
+requests were counted, so that keys popular long ago are forgotten
+"""
+class CountMinSketch:
+	def __init__(self, width=DEFAULT_SKETCH_WIDTH, sample_size=None):
+		self.width = width
+		self.sample_size = sample_size or 10 * width
+		self.rows = [bytearray(width) for _ in range(SKETCH_DEPTH)]
+		self.additions = 0
+
+	def _indexes(self, key):
+		key_hash = hash(key)
+		indexes = []
+		for seed in range(1, SKETCH_DEPTH + 1):
+			mixed = (key_hash + seed * 0x9E3779B97F4A7C15) & HASH_MASK
+			mixed = ((mixed ^ (mixed >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+			mixed = ((mixed ^ (mixed >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+			indexes.append((mixed ^ (mixed >> 31)) % self.width)
+		return indexes
+
+	def increment(self, key):
+		for row, index in zip(self.rows, self._indexes(key)):
+			if row[index] < MAX_FREQUENCY:
+				row[index] += 1
+		self.additions += 1
+		if self.additions >= self.sample_size:
+			self.rows = [bytearray(count // 2 for count in row) for row in self.rows]
+			self.additions //= 2
+
+	def estimate(self, key):
+		return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+
+class _CacheEntry:
+	__slots__ = ('value', 'size', 'expires_at')
+
+	def __init__(self, value, size, expires_at):
+		self.value = value
+		self.size = size
+		self.expires_at = expires_at
+
+
+"""
+Thread-safe cache holding up to max_bytes of values, as measured by sizeof,
+evicted following W-TinyLFU: new entries go into a small LRU window, and an
+entry leaving the window only makes it into the main cache, a segmented LRU,
+if it has been requested more often than the entries it would evict
+together, which are only evicted once it is admitted. One-off requests, such
+as a scan through many keys, therefore cannot flush out the popular entries.
+Entries expire ttl seconds after being stored, if given, or after the ttl they
+are put with. Given on_evict, entries evicted or rejected for lack of room are
+passed to it with the ttl they had left, e.g. to keep them in a colder tier.
+Values are returned as stored, so they must not be modified by callers
+"""
+class TinyLfuCache:
+	def __init__(self, max_bytes, ttl=None, sizeof=get_json_size, window_ratio=DEFAULT_WINDOW_RATIO,
+				 protected_ratio=DEFAULT_PROTECTED_RATIO, sketch_width=DEFAULT_SKETCH_WIDTH,
+				 clock=time.monotonic, on_evict=None):
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+		self.sizeof = sizeof
+		self.clock = clock
+		self.on_evict = on_evict
+		self.window_capacity = int(max_bytes * window_ratio)
+		self.main_capacity = max_bytes - self.window_capacity
+		self.protected_capacity = int(self.main_capacity * protected_ratio)
+		self.sketch = CountMinSketch(sketch_width)
+		self.counters = { 'hits': 0, 'misses': 0, 'evictions': 0, 'rejections': 0, 'expirations': 0 }
+		self._window = OrderedDict()
+		self._probation = OrderedDict()
+		self._protected = OrderedDict()
+		self._bytes = { 'window': 0, 'probation': 0, 'protected': 0 }
+		self._lock = threading.Lock()
+
+	def _segments(self):
+		return (('window', self._window), ('probation', self._probation),
+				('protected', self._protected))
+
+	def _find(self, key):
+		for name, segment in self._segments():
+			if key in segment:
+				return name, segment
+		return None, None
+
+	def _remove(self, key):
+		name, segment = self._find(key)
+		if segment is None:
+			return None
+		entry = segment.pop(key)
+		self._bytes[name] -= entry.size
+		return entry
+
+	def _main_victims(self, size):
+		excess = self._bytes['probation'] + self._bytes['protected'] + size - self.main_capacity
+		victim_keys = []
+		for segment in (self._probation, self._protected):
+			for victim_key, victim in segment.items():
+				if excess <= 0:
+					return victim_keys
+				victim_keys.append(victim_key)
+				excess -= victim.size
+		return victim_keys if excess <= 0 else None
+
+	def _admit(self, key, entry, evicted):
+		victim_keys = self._main_victims(entry.size)
+		if victim_keys is None or (victim_keys and self.sketch.estimate(key) <= sum(
+				self.sketch.estimate(victim_key) for victim_key in victim_keys)):
+			self.counters['rejections'] += 1
+			evicted.append((key, entry))
+			return
+		for victim_key in victim_keys:
+			evicted.append((victim_key, self._remove(victim_key)))
+			self.counters['evictions'] += 1
+		self._probation[key] = entry
+		self._bytes['probation'] += entry.size
+
+	def _promote(self, key):
+		entry = self._probation.pop(key)
+		self._bytes['probation'] -= entry.size
+		self._protected[key] = entry
+		self._bytes['protected'] += entry.size
+		while self._bytes['protected'] > self.protected_capacity and len(self._protected) > 1:
+			demoted_key, demoted_entry = self._protected.popitem(last=False)
+			self._bytes['protected'] -= demoted_entry.size
+			self._probation[demoted_key] = demoted_entry
+			self._bytes['probation'] += demoted_entry.size
+
+	def get(self, key):
+		return self.get_with_ttl(key)[0]
+
+	def get_with_ttl(self, key):
+		with self._lock:
+			self.sketch.increment(key)
+			name, segment = self._find(key)
+			if segment is None:
+				self.counters['misses'] += 1
+				return None, None
+			entry = segment[key]
+			now = self.clock()
+			if entry.expires_at is not None and entry.expires_at <= now:
+				self._remove(key)
+				self.counters['expirations'] += 1
+				self.counters['misses'] += 1
+				return None, None
+			if name == 'probation':
+				self._promote(key)
+			else:
+				segment.move_to_end(key)
+			self.counters['hits'] += 1
+			return entry.value, entry.expires_at - now if entry.expires_at is not None else None
+
+	def _notify_evicted(self, evicted):
+		now = self.clock()
+		for key, entry in evicted:
+			if entry.expires_at is None:
+				self.on_evict(key, entry.value, None)
+			elif entry.expires_at > now:
+				self.on_evict(key, entry.value, entry.expires_at - now)
+
+	def put(self, key, value, ttl=None):
+		size = self.sizeof(value)
+		ttl = ttl if ttl is not None else self.ttl
+		evicted = []
+		with self._lock:
+			self._remove(key)
+			expires_at = self.clock() + ttl if ttl is not None else None
+			entry = _CacheEntry(value, size, expires_at)
+			if size > self.max_bytes:
+				self.counters['rejections'] += 1
+				evicted.append((key, entry))
+			else:
+				self._window[key] = entry
+				self._bytes['window'] += size
+				while self._bytes['window'] > self.window_capacity and self._window:
+					candidate_key, candidate = self._window.popitem(last=False)
+					self._bytes['window'] -= candidate.size
+					self._admit(candidate_key, candidate, evicted)
+		if evicted and self.on_evict is not None:
+			self._notify_evicted(evicted)
+
+	def delete(self, key):
+		with self._lock:
+			self._remove(key)
+
+	def get_entries(self):
+		with self._lock:
+			now = self.clock()
+			entries = []
+			for segment in (self._probation, self._protected, self._window):
+				for key, entry in segment.items():
+					if entry.expires_at is None:
+						entries.append((key, entry.value, None))
+					elif entry.expires_at > now:
+						entries.append((key, entry.value, entry.expires_at - now))
+			return entries
+
+	def clear(self):
+		with self._lock:
+			for name, segment in self._segments():
+				segment.clear()
+				self._bytes[name] = 0
+
+	def __len__(self):
+		with self._lock:
+			return len(self._window) + len(self._probation) + len(self._protected)
+
+	def get_stats(self):
+		with self._lock:
+			stats = dict(self.counters)
+			requests = stats['hits'] + stats['misses']
+			stats['hit_rate'] = stats['hits'] / requests if requests else 0.0
+			stats['entries'] = len(self._window) + len(self._probation) + len(self._protected)
+			stats['bytes'] = sum(self._bytes.values())
+			return stats
@@ -0,0 +1,135 @@
+"""
+This module contains the transports the Yummly client sends its requests
+through: the pooled HTTP transport used in production, and transports that
+record real traffic to cassette files and replay it without a network.
+"""
+
+import gzip
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from cassette_miss_error import CassetteMissError
+
+
+"""
+Response from the Yummly API whose body has already been read and decoded, for
+clients and transports that do not hand back a requests response
+"""
+class YummlyResponse:
+	def __init__(self, status_code, json_data=None, headers=None):
+		self.status_code = status_code
+		self.json_data = json_data
+		self.headers = headers or {}
+
+	def json(self):
+		return self.json_data
+
+
+"""
+Transport sending requests over one requests session whose connection pool
+keeps up to pool_size connections open between calls, sending any headers
+given with a request on top of the session's
+"""
+class RequestsTransport:
+	def __init__(self, pool_size, headers):
+		self.session = requests.Session()
+		self.session.headers.update(headers)
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+		self.session.mount('http://', adapter)
+		self.session.mount('https://', adapter)
+
+	def get(self, url, params=None, timeout=None, headers=None):
+		options = { 'timeout': timeout }
+		if params is not None:
+			options['params'] = params
+		if headers:
+			options['headers'] = headers
+		return self.session.get(url, **options)
+
+	def close(self):
+		self.session.close()
+
+
+"""
+Method to get the key a request is recorded under in a cassette: the url and
+its parameters in a fixed order
+"""
+def get_interaction_key(url, params=None):
+	pairs = []
+	for name, value in (params or {}).items():
+		values = value if isinstance(value, (list, tuple)) else [value]
+		pairs.extend([name, str(item)] for item in values)
+	return json.dumps([url, sorted(pairs)])
+
+
+"""
+Transport passing requests on to another transport and appending each request,
+its response and how long it took to a cassette: a gzip file with one compact
+JSON object per line. Response bodies are only kept for 200 responses, the
+only ones whose body is read
+"""
+class RecordingTransport:
+	def __init__(self, transport, cassette_path):
+		self.transport = transport
+		self.cassette_path = cassette_path
+		self._lock = threading.Lock()
+
+	def get(self, url, params=None, timeout=None, headers=None):
+		started_at = time.monotonic()
+		response = self.transport.get(url, params=params, timeout=timeout, headers=headers)
+		latency = time.monotonic() - started_at
+		interaction = { 'key': get_interaction_key(url, params),
+						'status': response.status_code,
+						'body': response.json() if response.status_code == 200 else None,
+						'latency': round(latency, 4) }
+		line = json.dumps(interaction, separators=(',', ':')) + '\n'
+		with self._lock:
+			with gzip.open(self.cassette_path, 'at', encoding='utf-8') as cassette:
+				cassette.write(line)
+		return response
+
+	def close(self):
+		self.transport.close()
+
+
+"""
+Transport answering requests from a cassette written by RecordingTransport.
+Requests recorded several times are answered with each recording in turn,
+starting over once all have been used. With simulate_latency, each answer is
+delayed by its recorded latency times latency_scale. Requests that were never
+recorded raise CassetteMissError. Headers are not recorded, so conditional
+requests are answered like any other
+"""
+class ReplayTransport:
+	def __init__(self, cassette_path, simulate_latency=False, latency_scale=1.0):
+		self.simulate_latency = simulate_latency
+		self.latency_scale = latency_scale
+		self.interactions = {}
+		self._positions = {}
+		self._lock = threading.Lock()
+		with gzip.open(cassette_path, 'rt', encoding='utf-8') as cassette:
+			for line in cassette:
+				interaction = json.loads(line)
+				self.interactions.setdefault(interaction['key'], []).append(interaction)
+
+	def get(self, url, params=None, timeout=None, headers=None):
+		key = get_interaction_key(url, params)
+		recordings = self.interactions.get(key)
+		if not recordings:
+			raise CassetteMissError(url, params)
+		with self._lock:
+			position = self._positions.get(key, 0)
+			self._positions[key] = (position + 1) % len(recordings)
+		interaction = recordings[position]
+		if self.simulate_latency:
+			latency = interaction['latency'] * self.latency_scale
+			if timeout is not None and latency > timeout:
+				time.sleep(timeout)
+				raise requests.Timeout('Replayed response took longer than ' + str(timeout) + 's')
+			time.sleep(latency)
+		return YummlyResponse(interaction['status'], interaction['body'])
+
+	def close(self):
+		pass
@@ -0,0 +1,411 @@
+"""
+This module contains the client used to send requests to the Yummly API, by
+default over a pooled, keep-alive HTTP session.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import requests
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from circuit_breaker import CircuitBreaker
+from retry_policy import DEFAULT_RETRY_POLICIES, classify_status
+from deadline_exceeded_error import DeadlineExceededError
+from query_key import get_payload_key
+from single_flight import SingleFlight
+from quota_manager import QuotaManager
+from quota_exhausted_error import QuotaExhaustedError
+from request_scheduler import RequestScheduler
+from transports import RequestsTransport, YummlyResponse
+from adaptive_limiter import AdaptiveLimiter, ADAPTIVE_CONCURRENCY
+from tiny_lfu_cache import TinyLfuCache, RECIPE_CACHE_BYTES, RECIPE_CACHE_TTL, RECIPE_CACHE_SOFT_TTL
+from tiny_lfu_cache import SEARCH_CACHE_BYTES, SEARCH_CACHE_TTL
+from bloom_filter import TimeDecayedBloomFilter, NEGATIVE_CACHE_CAPACITY
+from sqlite_cache import SqliteCache, SHARED_CACHE_PATH
+from tiered_cache import TieredCache
+from compressed_cache import CompressedCache, COLD_CACHE_BYTES
+
+""" --- Constants ---"""
+HEADERS  = OrderedDict({
+	'X-Yummly-App-ID': os.environ.get("AWS_YUMMLY_APP_ID"),
+	'X-Yummly-App-Key': os.environ.get('AWS_YUMMLY_APP_KEY'),
+})
+
+YUMMLY_BASE_URL = os.environ.get('YUMMLY_BASE_URL', 'http://api.yummly.com').rstrip('/')
+
+BASE_API_SEARCH_URL = os.environ.get('YUMMLY_SEARCH_URL', YUMMLY_BASE_URL + '/v1/api/recipes')
+
+BASE_API_GET_URL = os.environ.get('YUMMLY_GET_URL', YUMMLY_BASE_URL + '/v1/api/recipe/')
+
+DEFAULT_POOL_SIZE = int(os.environ.get('YUMMLY_POOL_SIZE', 10))
+
+DEFAULT_TIMEOUT = float(os.environ.get('YUMMLY_TIMEOUT_SECONDS', 5))
+
+ENDPOINTS = ['search', 'recipe']
+
+PAGE_PARAMETERS = ['maxResult', 'start']
+
+VALIDATOR_HEADERS = { 'ETag': 'If-None-Match', 'Last-Modified': 'If-Modified-Since' }
+
+ENVELOPE_KEYS = { 'recipe', 'fetched_at', 'validators' }
+
+REFRESH_WORKERS = 2
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+"""
+Method to get the part of a search response the bot uses: the criteria, the
+number of matches and the ranked ids of the matches returned
+"""
+def get_search_outcome(search_response):
+	return { 'criteria': search_response.get('criteria'),
+			 'totalMatchCount': search_response.get('totalMatchCount'),
+			 'matches': [{ 'id': match['id'] } for match in search_response['matches']] }
+
+"""
+Method to get the outcome of a search known to have no match, with its payload
+less the paging parameters as criteria, like Yummly would return them
+"""
+def get_no_match_outcome(payload):
+	criteria = { name: value for name, value in payload.items() if name not in PAGE_PARAMETERS }
+	return { 'criteria': criteria, 'totalMatchCount': 0, 'matches': [] }
+
+
+"""
+Method to wrap a recipe fetched from Yummly for a cache whose entries are
+revalidated: with the time it was fetched at and the validators Yummly sent
+along with it. Recipes older than the client's revalidate_after are answered
+from the cache while a conditional request refreshes them in the background,
+until the cache's ttl expires them; values in the other format are misses
+"""
+def get_cache_envelope(recipe, response):
+	headers = getattr(response, 'headers', None)
+	validators = {}
+	if isinstance(headers, Mapping):
+		validators = { name: headers[name] for name in VALIDATOR_HEADERS if headers.get(name) }
+	return { 'recipe': recipe, 'fetched_at': time.time(), 'validators': validators }
+
+"""
+Method to check whether a cached value is a recipe wrapped by
+get_cache_envelope rather than a plain recipe
+"""
+def is_cache_envelope(value):
+	return isinstance(value, Mapping) and value.keys() == ENVELOPE_KEYS
+
+"""
+Method to get the headers asking Yummly to only send a cached recipe again if
+it has changed
+"""
+def get_conditional_headers(envelope):
+	return { VALIDATOR_HEADERS[name]: value for name, value in envelope['validators'].items() }
+
+
+"""
+Client for the Yummly API, meant to be created once per warm Lambda container
+or server worker and shared between threads. Requests go through transport,
+by default a pooled RequestsTransport, and are retried following
+retry_policies behind one circuit breaker per endpoint, within timeout
+seconds or the deadline given. The optional hedger, quota, scheduler, limiter
+and caches each add what their own class describes; 409s are not retried when
+a quota is given. Unless coalesce is False, identical requests of the same
+priority in flight at once are sent once. Given revalidate_after, cached
+recipes are refreshed as get_cache_envelope describes
+"""
+class YummlyClient:
+	def __init__(self, pool_size=DEFAULT_POOL_SIZE, headers=HEADERS,
+				 search_url=BASE_API_SEARCH_URL, get_url=BASE_API_GET_URL,
+				 retry_policies=None, breakers=None, timeout=DEFAULT_TIMEOUT, hedger=None,
+				 coalesce=True, quota=None, scheduler=None, transport=None, limiter=None,
+				 recipe_cache=None, search_cache=None, negative_cache=None, revalidate_after=None):
+		self.pool_size = pool_size
+		self.timeout = timeout
+		self.hedger = hedger
+		self.flights = SingleFlight() if coalesce else None
+		self.quota = quota
+		self.scheduler = scheduler
+		self.limiter = limiter
+		self.recipe_cache = recipe_cache
+		self.search_cache = search_cache
+		self.negative_cache = negative_cache
+		self.revalidate_after = revalidate_after
+		self.revalidation_counters = { 'stale': 0, 'refreshed': 0, 'not_modified': 0, 'failed': 0 }
+		self._refreshing = set()
+		self._refresh_lock = threading.Lock()
+		self._refresh_executor = None
+		if revalidate_after is not None:
+			self._refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS)
+		self.search_url = search_url
+		self.get_url = get_url
+		self.retry_policies = retry_policies or { endpoint: DEFAULT_RETRY_POLICIES
+												  for endpoint in ENDPOINTS }
+		self.breakers = breakers or { endpoint: CircuitBreaker(endpoint)
+									  for endpoint in ENDPOINTS }
+		self.transport = transport or RequestsTransport(pool_size, headers)
+
+	def _send_attempt(self, endpoint, send_request, timeout, user_id=None):
+		if self.hedger is None:
+			return send_request(timeout)
+		acquire_hedge = None
+		if self.quota is not None:
+			acquire_hedge = lambda: self.quota.acquire(user_id)
+		return self.hedger.send(endpoint, lambda: send_request(timeout), acquire_hedge)
+
+	def _attempt(self, endpoint, send_request, deadline=None, user_id=None):
+		breaker = self.breakers[endpoint]
+		if deadline is not None and deadline.expired():
+			raise DeadlineExceededError(deadline.budget)
+		if self.limiter is not None:
+			self.limiter.acquire(deadline)
+		try:
+			breaker.before_request()
+		except BaseException:
+			self._release_limiter()
+			raise
+		try:
+			timeout = deadline.get_timeout(self.timeout) if deadline else self.timeout
+			if self.quota is not None:
+				self.quota.acquire(user_id)
+		except (DeadlineExceededError, QuotaExhaustedError):
+			self._release_limiter()
+			breaker.cancel_request()
+			raise
+		started_at = time.monotonic()
+		try:
+			response = self._send_attempt(endpoint, send_request, timeout, user_id)
+		except (requests.ConnectionError, requests.Timeout) as connection_err:
+			self._release_limiter(started_at, 'connection error')
+			breaker.record_failure()
+			return None, 'connection error', connection_err
+		except BaseException:
+			self._release_limiter()
+			breaker.record_failure()
+			raise
+		failure = classify_status(response.status_code)
+		self._release_limiter(started_at, failure)
+		if failure == 'rate limit' and self.quota is not None:
+			self.quota.record_rate_limited()
+		if failure == 'server error':
+			breaker.record_failure()
+		else:
+			breaker.record_success()
+		return response, failure, None
+
+	def _release_limiter(self, started_at=None, failure=None):
+		if self.limiter is None:
+			return
+		latency = time.monotonic() - started_at if started_at is not None else None
+		self.limiter.release(latency, failure)
+
+	def _send(self, endpoint, send_request, deadline=None, user_id=None, priority='interactive'):
+		policies = self.retry_policies[endpoint]
+		retry_counts = {}
+		while True:
+			if self.scheduler is not None:
+				self.scheduler.acquire(priority, deadline)
+			try:
+				response, failure, error = self._attempt(endpoint, send_request, deadline, user_id)
+			finally:
+				if self.scheduler is not None:
+					self.scheduler.release()
+			if failure is None:
+				return response
+			policy = policies.get(failure)
+			if failure == 'rate limit' and self.quota is not None:
+				policy = None
+			retry_counts[failure] = retry_counts.get(failure, 0) + 1
+			if policy is None or retry_counts[failure] > policy.max_retries:
+				if error is not None:
+					raise error
+				return response
+			delay = policy.get_delay(retry_counts[failure])
+			if deadline is not None and delay >= deadline.remaining():
+				if error is not None:
+					raise DeadlineExceededError(deadline.budget) from error
+				return response
+			time.sleep(delay)
+
+	def _send_coalesced(self, key, send, deadline=None):
+		if self.flights is None:
+			return send()
+		try:
+			return self.flights.do(key, send, deadline.remaining() if deadline else None)
+		except FutureTimeoutError:
+			if deadline is None:
+				raise
+			raise DeadlineExceededError(deadline.budget)
+
+	def _send_and_cache_search(self, key, send_request, deadline=None, user_id=None,
+							   priority='interactive'):
+		response = self._send('search', send_request, deadline, user_id, priority)
+		if response.status_code != 200 or (self.search_cache is None and self.negative_cache is None):
+			return response
+		outcome = get_search_outcome(response.json())
+		if not outcome['matches']:
+			if self.negative_cache is not None:
+				self.negative_cache.add(key)
+		elif self.search_cache is not None:
+			self.search_cache.put(key, outcome)
+		return YummlyResponse(200, outcome)
+
+	def _send_and_cache_recipe(self, recipe_id, send_request, deadline=None, user_id=None,
+							   priority='interactive'):
+		response = self._send('recipe', send_request, deadline, user_id, priority)
+		if self.recipe_cache is None or response.status_code != 200:
+			return response
+		recipe = response.json()
+		if self.revalidate_after is None:
+			self.recipe_cache.put(recipe_id, recipe)
+		else:
+			self.recipe_cache.put(recipe_id, get_cache_envelope(recipe, response))
+		return YummlyResponse(200, recipe)
+
+	def _count_revalidation(self, outcome):
+		with self._refresh_lock:
+			self.revalidation_counters[outcome] += 1
+
+	def _refresh_recipe(self, recipe_id, envelope):
+		headers = get_conditional_headers(envelope)
+		send_request = lambda timeout: self.transport.get(self.get_url + recipe_id, timeout=timeout,
+														  headers=headers)
+		try:
+			response = self._send('recipe', send_request, priority='background')
+			if response.status_code == 304:
+				self.recipe_cache.put(recipe_id, dict(envelope, fetched_at=time.time()))
+				self._count_revalidation('not_modified')
+			elif response.status_code == 200:
+				self.recipe_cache.put(recipe_id, get_cache_envelope(response.json(), response))
+				self._count_revalidation('refreshed')
+			else:
+				self._count_revalidation('failed')
+		except Exception:
+			self._count_revalidation('failed')
+		finally:
+			with self._refresh_lock:
+				self._refreshing.discard(recipe_id)
+
+	def _revalidate(self, recipe_id, envelope):
+		self._count_revalidation('stale')
+		with self._refresh_lock:
+			if recipe_id in self._refreshing:
+				return
+			self._refreshing.add(recipe_id)
+		self._refresh_executor.submit(self._refresh_recipe, recipe_id, envelope)
+
+	def get_revalidation_stats(self):
+		with self._refresh_lock:
+			return dict(self.revalidation_counters, in_flight=len(self._refreshing))
+
+	def search(self, payload, deadline=None, user_id=None, priority='interactive'):
+		key = get_payload_key(payload)
+		if self.search_cache is not None:
+			outcome = self.search_cache.get(key)
+			if outcome is not None:
+				return YummlyResponse(200, outcome)
+		if self.negative_cache is not None and key in self.negative_cache:
+			return YummlyResponse(200, get_no_match_outcome(payload))
+		send_request = lambda timeout: self.transport.get(self.search_url, params=payload,
+														  timeout=timeout)
+		return self._send_coalesced(('search', key, priority),
+									lambda: self._send_and_cache_search(key, send_request, deadline,
+																		user_id, priority),
+									deadline)
+
+	def get_recipe(self, recipe_id, deadline=None, user_id=None, priority='interactive'):
+		if self.recipe_cache is not None:
+			recipe = self.recipe_cache.get(recipe_id)
+			if recipe is not None and is_cache_envelope(recipe) == (self.revalidate_after is not None):
+				if self.revalidate_after is None:
+					return YummlyResponse(200, recipe)
+				if time.time() - recipe['fetched_at'] >= self.revalidate_after:
+					self._revalidate(recipe_id, recipe)
+				return YummlyResponse(200, recipe['recipe'])
+		send_request = lambda timeout: self.transport.get(self.get_url + recipe_id,
+														  timeout=timeout)
+		return self._send_coalesced(('recipe', recipe_id, priority),
+									lambda: self._send_and_cache_recipe(recipe_id, send_request,
+																		deadline, user_id,
+																		priority),
+									deadline)
+
+	def close(self):
+		if self._refresh_executor is not None:
+			self._refresh_executor.shutdown(wait=False)
+		self.transport.close()
+
+
+"""
+Method to get a cache backed by the database shared by the processes on this
+machine, behind the in-process cache given if any, or only the in-process
+cache if the database cannot be opened
+"""
+def get_shared_cache(local_cache, namespace, ttl):
+	try:
+		shared_cache = SqliteCache(SHARED_CACHE_PATH, namespace=namespace, ttl=ttl)
+	except sqlite3.Error:
+		return local_cache
+	if local_cache is None:
+		return shared_cache
+	return TieredCache(local_cache, shared_cache)
+
+"""
+Method to get the age after which the default client revalidates the recipes
+it caches, if the soft ttl is shorter than the hard one
+"""
+def get_soft_ttl():
+	if not 0 < RECIPE_CACHE_SOFT_TTL < RECIPE_CACHE_TTL:
+		return None
+	return RECIPE_CACHE_SOFT_TTL
+
+"""
+Method to get the client shared by every call in this process, creating it on
+first use so that it survives between warm Lambda invocations
+"""
+def get_default_client():
+	global _default_client
+	if _default_client is None:
+		with _default_client_lock:
+			if _default_client is None:
+				limiter, max_concurrent = None, DEFAULT_POOL_SIZE
+				if ADAPTIVE_CONCURRENCY:
+					limiter = AdaptiveLimiter(DEFAULT_POOL_SIZE)
+					max_concurrent = limiter.max_limit
+				recipe_cache, search_cache, negative_cache = None, None, None
+				if RECIPE_CACHE_BYTES > 0:
+					recipe_cache = TinyLfuCache(RECIPE_CACHE_BYTES, ttl=RECIPE_CACHE_TTL)
+				if SEARCH_CACHE_BYTES > 0:
+					search_cache = TinyLfuCache(SEARCH_CACHE_BYTES, ttl=SEARCH_CACHE_TTL)
+				if NEGATIVE_CACHE_CAPACITY > 0:
+					negative_cache = TimeDecayedBloomFilter()
+				if COLD_CACHE_BYTES > 0 and recipe_cache is not None:
+					recipe_cache = TieredCache(recipe_cache,
+											   CompressedCache(COLD_CACHE_BYTES, ttl=RECIPE_CACHE_TTL),
+											   write_through=False)
+				soft_ttl = get_soft_ttl()
+				if SHARED_CACHE_PATH:
+					recipe_cache = get_shared_cache(recipe_cache,
+													'recipe' if soft_ttl is None else 'recipe_envelope',
+													RECIPE_CACHE_TTL)
+					search_cache = get_shared_cache(search_cache, 'search', SEARCH_CACHE_TTL)
+				_default_client = YummlyClient(quota=QuotaManager.from_environment(),
+											   scheduler=RequestScheduler(max_concurrent),
+											   limiter=limiter, recipe_cache=recipe_cache,
+											   search_cache=search_cache,
+											   negative_cache=negative_cache,
+											   revalidate_after=soft_ttl if recipe_cache is not None else None)
+	return _default_client
+
+"""
+Method to replace the shared client, e.g. to change the pool size at start-up
+"""
+def set_default_client(client):
+	global _default_client
+	with _default_client_lock:
+		previous_client = _default_client
+		_default_client = client
+	return previous_client
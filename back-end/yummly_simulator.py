@@ -0,0 +1,180 @@
+"""
+This module contains a local stand-in for the Yummly API, serving searches and
+recipes from a fixture corpus with configurable latency, errors and payload
+sizes, so the bot can be load and chaos tested without the real API. Point
+the bot at it by setting YUMMLY_BASE_URL to the url it prints, e.g.:
+
+	python yummly_simulator.py --port 8765 --latency lognormal 0.15 0.5 --error-rate 500 0.02
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs, unquote
+from recipe_corpus import DEFAULT_CORPUS_PATH, RecipeCorpus, load_corpus
+
+""" --- Constants ---"""
+SEARCH_PATH = '/v1/api/recipes'
+
+RECIPE_PATH = '/v1/api/recipe/'
+
+ERROR_BODIES = {
+	409: { 'error': 'API call limit exceeded' },
+	500: { 'error': 'Internal server error' },
+}
+
+LATENCY_DISTRIBUTIONS = {
+	'fixed': lambda rng, seconds: seconds,
+	'uniform': lambda rng, low, high: rng.uniform(low, high),
+	'lognormal': lambda rng, median, sigma: median * rng.lognormvariate(0, sigma),
+}
+
+
+"""
+Simulator of the Yummly search and recipe endpoints. Each request waits for a
+latency drawn from the named distribution in LATENCY_DISTRIBUTIONS (e.g.
+('lognormal', 0.15, 0.5) for a 150ms median), then fails with each status in
+error_rates with the given probability, e.g. { 500: 0.02, 409: 0.01 }. Recipe
+responses are padded to at least payload_size bytes. Pass a seed to make the
+latencies and errors repeatable
+"""
+class YummlySimulator:
+	def __init__(self, corpus=None, latency=None, error_rates=None, payload_size=0, seed=None):
+		self.corpus = RecipeCorpus(corpus)
+		self.latency = latency
+		self.error_rates = error_rates or {}
+		self.payload_size = payload_size
+		self.random = random.Random(seed)
+		self.counters = {}
+		self._lock = threading.Lock()
+		self._server = None
+		self._thread = None
+
+	def _count(self, endpoint, status_code):
+		with self._lock:
+			endpoint_counters = self.counters.setdefault(endpoint, {})
+			endpoint_counters[status_code] = endpoint_counters.get(status_code, 0) + 1
+
+	def _draw(self):
+		with self._lock:
+			latency = 0
+			if self.latency:
+				kind, *params = self.latency
+				latency = LATENCY_DISTRIBUTIONS[kind](self.random, *params)
+			chance = self.random.random()
+		for status_code, rate in sorted(self.error_rates.items()):
+			if chance < rate:
+				return max(latency, 0), status_code
+			chance -= rate
+		return max(latency, 0), 200
+
+	def search(self, params):
+		return self.corpus.search(params)
+
+	def get_recipe(self, recipe_id):
+		recipe = self.corpus.get_recipe(recipe_id)
+		if recipe is None:
+			return None
+		missing_bytes = self.payload_size - len(json.dumps(recipe))
+		if missing_bytes > 0:
+			recipe['padding'] = 'x' * missing_bytes
+		return recipe
+
+	def handle(self, path, query):
+		params = parse_qs(query)
+		if path == SEARCH_PATH:
+			endpoint, respond = 'search', lambda: self.search(params)
+		elif path.startswith(RECIPE_PATH):
+			endpoint, respond = 'recipe', lambda: self.get_recipe(unquote(path[len(RECIPE_PATH):]))
+		else:
+			return 404, { 'error': 'Not found' }
+		latency, status_code = self._draw()
+		time.sleep(latency)
+		body = ERROR_BODIES.get(status_code)
+		if status_code == 200:
+			body = respond()
+			if body is None:
+				status_code, body = 404, { 'error': 'Recipe not found' }
+		self._count(endpoint, status_code)
+		return status_code, body
+
+	def get_stats(self):
+		with self._lock:
+			return { endpoint: dict(endpoint_counters)
+					 for endpoint, endpoint_counters in self.counters.items() }
+
+	def start(self, host='127.0.0.1', port=0):
+		self._server = _ThreadingHTTPServer((host, port), _SimulatorRequestHandler)
+		self._server.simulator = self
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self.get_base_url()
+
+	def get_base_url(self):
+		host, port = self._server.server_address[:2]
+		return 'http://' + host + ':' + str(port)
+
+	def stop(self):
+		if self._server is not None:
+			self._server.shutdown()
+			self._server.server_close()
+			self._thread.join()
+			self._server = None
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+class _SimulatorRequestHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		url = urlparse(self.path)
+		status_code, body = self.server.simulator.handle(url.path, url.query)
+		content = json.dumps(body).encode('utf-8')
+		self.send_response(status_code)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(content)))
+		self.end_headers()
+		self.wfile.write(content)
+
+	def log_message(self, format, *args):
+		pass
+
+
+"""
+Method to run the simulator from the command line until interrupted
+"""
+def main():
+	parser = argparse.ArgumentParser(description='Local simulator of the Yummly API')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8765)
+	parser.add_argument('--corpus', default=DEFAULT_CORPUS_PATH)
+	parser.add_argument('--latency', nargs='+', metavar=('KIND', 'PARAM'),
+						help='one of ' + ', '.join(sorted(LATENCY_DISTRIBUTIONS)) + ' and its parameters in seconds')
+	parser.add_argument('--error-rate', nargs=2, action='append', default=[],
+						metavar=('STATUS', 'RATE'), help='e.g. --error-rate 500 0.02')
+	parser.add_argument('--payload-size', type=int, default=0)
+	parser.add_argument('--seed', type=int)
+	args = parser.parse_args()
+	latency = None
+	if args.latency:
+		latency = tuple([args.latency[0]] + [float(param) for param in args.latency[1:]])
+	error_rates = { int(status_code): float(rate) for status_code, rate in args.error_rate }
+	simulator = YummlySimulator(load_corpus(args.corpus), latency, error_rates, args.payload_size,
+								args.seed)
+	base_url = simulator.start(args.host, args.port)
+	print('Simulating Yummly at ' + base_url + '; run the bot with YUMMLY_BASE_URL=' + base_url)
+	try:
+		while True:
+			time.sleep(3600)
+	except KeyboardInterrupt:
+		simulator.stop()
+
+if __name__ == '__main__':
+	main()